@@ -1,21 +1,52 @@
+import threading
+from typing import List, Union
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 from graph.schema import EcosyncState
 from graph.router import enhanced_router_node
-from agents.eco_chatbot_agent import enhanced_eco_chatbot_agent
-from agents.marine_health_agent import enhanced_marine_health_agent
-from agents.land_health_agent import enhanced_land_health_agent
+from agents.eco_chatbot_agent import enhanced_eco_chatbot_agent, enhanced_eco_chatbot_agent_async
+from agents.marine_health_agent import enhanced_marine_health_agent, enhanced_marine_health_agent_async
+from agents.land_health_agent import enhanced_land_health_agent, enhanced_land_health_agent_async
+from agents.local_kb_agent import local_kb_applies, local_kb_node
+from agents.multi_agent import (
+    BRANCH_AGENTS, marine_branch_node, marine_branch_node_async, land_branch_node, land_branch_node_async,
+    merge_branches_node
+)
+from agents.clinic_lookup_agent import (
+    clinic_lookup_applies, clinic_lookup_node, clinic_lookup_node_async, compose_response_node
+)
 
 def create_enhanced_ecosync_flow():
-    """Create and configure the enhanced Ecosync AI multi-agent flow with health integration"""
+    """
+    Create and configure the enhanced Ecosync AI multi-agent flow with health integration
+    
+    Agent nodes carry both a sync and an async implementation, so the compiled
+    graph supports invoke() from a script thread and ainvoke() from an event
+    loop, where many LLM and clinic requests can be in flight at once.
+    
+    When the query may get clinic suggestions, the router fans out to the
+    agent and clinic_lookup together, so the lookup overlaps the model call;
+    compose_response joins them into the final response and clinic_data.
+    
+    Cross-domain image queries (router agent_branches) fan out to the marine
+    and land branches instead, each bounded by BRANCH_TIMEOUT, and
+    merge_branches combines them before compose_response.
+    """
     
     # Create the state graph
     workflow = StateGraph(EcosyncState)
     
     # Add nodes
     workflow.add_node("enhanced_router", enhanced_router_node)
-    workflow.add_node("eco_chatbot_agent", enhanced_eco_chatbot_agent)
-    workflow.add_node("marine_health_agent", enhanced_marine_health_agent)
-    workflow.add_node("land_health_agent", enhanced_land_health_agent)
+    workflow.add_node("local_kb", local_kb_node)
+    workflow.add_node("eco_chatbot_agent", RunnableLambda(enhanced_eco_chatbot_agent, afunc=enhanced_eco_chatbot_agent_async))
+    workflow.add_node("marine_health_agent", RunnableLambda(enhanced_marine_health_agent, afunc=enhanced_marine_health_agent_async))
+    workflow.add_node("land_health_agent", RunnableLambda(enhanced_land_health_agent, afunc=enhanced_land_health_agent_async))
+    workflow.add_node("clinic_lookup", RunnableLambda(clinic_lookup_node, afunc=clinic_lookup_node_async))
+    workflow.add_node("marine_branch", RunnableLambda(marine_branch_node, afunc=marine_branch_node_async))
+    workflow.add_node("land_branch", RunnableLambda(land_branch_node, afunc=land_branch_node_async))
+    workflow.add_node("merge_branches", merge_branches_node)
+    workflow.add_node("compose_response", compose_response_node)
     
     # Set entry point
     workflow.set_entry_point("enhanced_router")
@@ -30,27 +61,78 @@ def create_enhanced_ecosync_flow():
             # Fallback to eco chatbot
             return "eco_chatbot_agent"
     
+    agent_routes = {
+        "eco_chatbot_agent": "eco_chatbot_agent",
+        "marine_health_agent": "marine_health_agent", 
+        "land_health_agent": "land_health_agent"
+    }
+    
+    def route_from_router(state: EcosyncState) -> Union[str, List[str]]:
+        """Fan out to branches or the clinic lookup; text-only questions try the local knowledge base first"""
+        branches = [BRANCH_AGENTS[agent][1] for agent in state.get("agent_branches") or []]
+        if branches:
+            return branches + (["clinic_lookup"] if clinic_lookup_applies(state) else [])
+        if clinic_lookup_applies(state):
+            return [route_to_agent(state), "clinic_lookup"]
+        if local_kb_applies(state):
+            return "local_kb"
+        return route_to_agent(state)
+    
+    def route_from_clinic_lookup(state: EcosyncState) -> str:
+        """Beside fan-out branches the lookup joins at merge_branches, so compose_response runs after the merge"""
+        return "merge_branches" if state.get("agent_branches") else "compose_response"
+    
+    def route_from_local_kb(state: EcosyncState) -> str:
+        """Finish if the knowledge base answered, otherwise continue to the routed agent"""
+        if (state.get("metadata") or {}).get("answered_by") == "local_kb":
+            return END
+        return route_to_agent(state)
+    
     workflow.add_conditional_edges(
         "enhanced_router",
-        route_to_agent,
-        {
-            "eco_chatbot_agent": "eco_chatbot_agent",
-            "marine_health_agent": "marine_health_agent", 
-            "land_health_agent": "land_health_agent"
-        }
+        route_from_router,
+        {**agent_routes, "local_kb": "local_kb", "clinic_lookup": "clinic_lookup",
+         "marine_branch": "marine_branch", "land_branch": "land_branch"}
+    )
+    workflow.add_conditional_edges(
+        "local_kb",
+        route_from_local_kb,
+        {**agent_routes, END: END}
+    )
+    
+    # Agents and the clinic lookup finish in the same step, then compose_response joins them
+    workflow.add_edge("eco_chatbot_agent", "compose_response")
+    workflow.add_edge("marine_health_agent", "compose_response")
+    workflow.add_edge("land_health_agent", "compose_response")
+    workflow.add_conditional_edges(
+        "clinic_lookup",
+        route_from_clinic_lookup,
+        {"merge_branches": "merge_branches", "compose_response": "compose_response"}
     )
     
-    # All agents end the flow
-    workflow.add_edge("eco_chatbot_agent", END)
-    workflow.add_edge("marine_health_agent", END)
-    workflow.add_edge("land_health_agent", END)
+    # Fan-out branches join at merge_branches, whose combined answer goes through compose_response
+    workflow.add_edge("marine_branch", "merge_branches")
+    workflow.add_edge("land_branch", "merge_branches")
+    workflow.add_edge("merge_branches", "compose_response")
+    workflow.add_edge("compose_response", END)
     
     # Compile the graph
     app = workflow.compile()
     return app
 
-# Create the enhanced app instance
-enhanced_app_flow = create_enhanced_ecosync_flow()
+_app_flow = None
+_app_flow_lock = threading.Lock()
+
+def get_app_flow():
+    """The compiled flow, built on first use and shared by every caller in the process"""
+    global _app_flow
+    with _app_flow_lock:
+        if _app_flow is None:
+            _app_flow = create_enhanced_ecosync_flow()
+    return _app_flow
 
-# For backward compatibility
-app_flow = enhanced_app_flow
\ No newline at end of file
+def __getattr__(name: str):
+    # enhanced_app_flow and app_flow (kept for backward compatibility) compile on first access, not at import
+    if name in ("enhanced_app_flow", "app_flow"):
+        return get_app_flow()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,96 @@
+import time
+import asyncio
+from typing import Dict, Any, List
+from graph.schema import EcosyncState
+from graph.streaming import emit_delta
+from utils.clinic_finder import find_nearby_clinics
+from agents.eco_chatbot_agent import chatbot_clinic_suggestions
+from agents.marine_health_agent import marine_clinic_suggestions
+from agents.land_health_agent import land_clinic_suggestions
+from agents.multi_agent import merged_clinic_suggestions
+
+# Agent -> formatter deciding from its answer whether clinic suggestions belong under it
+CLINIC_SUGGESTION_FORMATTERS = {
+    "eco_chatbot_agent": chatbot_clinic_suggestions,
+    "marine_health_agent": marine_clinic_suggestions,
+    "land_health_agent": land_clinic_suggestions,
+    "multi_agent": merged_clinic_suggestions
+}
+# The chatbot answers text-only marine and land health questions; their concern checks still apply
+CHATBOT_HEALTH_TYPE_FORMATTERS = {
+    "environmental_marine": marine_clinic_suggestions,
+    "environmental_land": land_clinic_suggestions
+}
+
+def clinic_lookup_applies(state: EcosyncState) -> bool:
+    """Health types that may get clinic suggestions, when the user gave a city"""
+    needs_clinics = (state.get("metadata") or {}).get("needs_clinic_suggestions")
+    return bool(needs_clinics and state.get("user_city"))
+
+def clinic_lookup_result(clinics: List[Dict[str, Any]], start: float) -> Dict[str, Any]:
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return {"clinic_candidates": clinics, "clinic_lookup_ms": round(elapsed_ms, 1)}
+
+def clinic_lookup_node(state: EcosyncState) -> Dict[str, Any]:
+    """
+    Speculative clinic lookup, run in parallel with the routed agent
+    
+    The city and health type are known once the router finishes, so the
+    lookup does not wait for the model. compose_response decides whether
+    the candidates are used.
+    """
+    start = time.perf_counter()
+    try:
+        clinics = find_nearby_clinics(state.get("user_city", ""))
+    except Exception as e:
+        print(f"Clinic lookup failed: {e}")
+        clinics = []
+    return clinic_lookup_result(clinics, start)
+
+async def clinic_lookup_node_async(state: EcosyncState) -> Dict[str, Any]:
+    """
+    Async variant of clinic_lookup_node for ainvoke
+    """
+    start = time.perf_counter()
+    try:
+        # Clinic lookup is blocking I/O, so keep it off the event loop
+        clinics = await asyncio.to_thread(find_nearby_clinics, state.get("user_city", ""))
+    except Exception as e:
+        print(f"Clinic lookup failed: {e}")
+        clinics = []
+    return clinic_lookup_result(clinics, start)
+
+def compose_response_node(state: EcosyncState) -> Dict[str, Any]:
+    """
+    Join the agent's answer with the clinic lookup
+    
+    Appends the agent's clinic suggestions to the response and keeps the
+    clinic data they list. Candidates the answer does not call for (no
+    health concern in the analysis, or a failed agent) are discarded.
+    """
+    metadata = dict(state.get("metadata") or {})
+    response = state.get("response", "")
+    candidates = state.get("clinic_candidates") or []
+    formatter = CLINIC_SUGGESTION_FORMATTERS.get(metadata.get("agent_used"))
+    if metadata.get("agent_used") == "eco_chatbot_agent":
+        formatter = CHATBOT_HEALTH_TYPE_FORMATTERS.get(state.get("health_type"), formatter)
+    
+    clinic_suggestions = ""
+    if formatter and metadata.get("success", True):
+        clinic_suggestions = formatter(response, state.get("health_type", ""), state.get("user_city", ""), candidates)
+    # Suggestions listing clinics come from the candidates; the city prompt does not
+    clinic_data = candidates if clinic_suggestions and candidates else []
+    
+    metadata["clinic_suggestions_provided"] = bool(clinic_suggestions)
+    if state.get("clinic_lookup_ms") is not None:
+        metadata["clinic_lookup_ms"] = state["clinic_lookup_ms"]
+        metadata["clinic_lookup_discarded"] = not clinic_data
+    
+    if state.get("stream"):
+        # Clinic suggestions follow once the model stream has finished
+        emit_delta(metadata.get("agent_used", "compose_response"), clinic_suggestions)
+    return {
+        "response": response + clinic_suggestions,
+        "clinic_data": clinic_data,
+        "metadata": metadata
+    }
@@ -1,16 +1,19 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from graph.schema import EcosyncState
-from utils.openrouter import call_text_model
-from utils.clinic_finder import find_nearby_clinics
+from graph.streaming import collect_stream, acollect_stream, emit_delta
+from utils.openrouter import (
+    complete_text, acomplete_text, stream_text, astream_text, completion_metadata
+)
+from utils.model_registry import select_models
+from utils.llm_cache import cache_enabled_for
+from utils.semantic_cache import SEMANTIC_CACHE_ENABLED, chatbot_semantic_cache
 
-def enhanced_eco_chatbot_agent(state: EcosyncState) -> Dict[str, Any]:
-    """
-    Enhanced Eco Chatbot Agent with human health support and clinic suggestions
-    """
-    input_text = state.get("input", "")
-    health_type = state.get("health_type", "environmental")
-    user_city = state.get("user_city", "")
-    
+# Set ECOSYNC_LLM_CACHE_DISABLED_AGENTS=eco_chatbot_agent to opt this agent out of the response cache
+USE_LLM_CACHE = cache_enabled_for("eco_chatbot_agent")
+# Models come from the registry's text pool, healthiest first; override with ECOSYNC_MODELS_ECO_CHATBOT_AGENT
+
+def get_system_prompt(health_type: str) -> str:
+    """System prompt for the chatbot, adjusted to the health type"""
     # Adjust system prompt based on health type
     if health_type == "human":
         system_prompt = """You are an environmental and public health expert. 
@@ -34,55 +37,159 @@ def enhanced_eco_chatbot_agent(state: EcosyncState) -> Dict[str, Any]:
         sustainability, and ecological issues. Provide accurate, helpful information 
         to promote environmental awareness and connect environmental health to human wellbeing."""
     
+    return system_prompt
+
+def chatbot_clinic_suggestions(response: str, health_type: str, user_city: str,
+                               clinic_data: List[Dict[str, Any]]) -> str:
+    """Clinic suggestions appended to human health answers ("" when none apply)"""
+    clinic_suggestions = ""
+    
+    if health_type == "human" and user_city:
+        if clinic_data:
+            clinic_suggestions = f"\n\n🏥 **Healthcare Facilities near {user_city}:**\n\n"
+            for clinic in clinic_data[:3]:  # Show top 3
+                clinic_suggestions += f"**{clinic['name']}**\n"
+                clinic_suggestions += f"📍 {clinic['address']}\n"
+                clinic_suggestions += f"📞 {clinic.get('phone', 'Contact local directory')}\n"
+                if clinic.get('distance') is not None:
+                    clinic_suggestions += f"📏 {clinic['distance']:.1f} km away\n"
+                if clinic.get('rating') != 'N/A':
+                    clinic_suggestions += f"⭐ Rating: {clinic['rating']}/5\n"
+                clinic_suggestions += "---\n"
+            
+            clinic_suggestions += "\n*Please consult with healthcare professionals for proper medical advice.*"
+    
+    elif health_type == "human" and not user_city:
+        clinic_suggestions = "\n\n🏥 **Need medical assistance?** Please specify your city, and I can suggest nearby healthcare facilities."
+    
+    return clinic_suggestions
+
+def build_chatbot_result(response: str, health_type: str) -> Dict[str, Any]:
+    """Node output for a model answer; clinic suggestions are added by the compose_response join"""
+    return {
+        "response": response,
+        "metadata": {
+            "agent_used": "eco_chatbot_agent",
+            "health_type": health_type,
+            "success": True
+        }
+    }
+
+def semantic_cache_namespace(state: EcosyncState) -> Optional[str]:
+    """Scope for sharing answers between similar questions, or None to bypass the cache"""
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    # Health questions of any type and answers given for a user's city are never reused
+    if state.get("user_city") or (state.get("metadata") or {}).get("needs_clinic_suggestions"):
+        return None
+    return state.get("health_type") or "environmental"
+
+def add_answer_metadata(result: Dict[str, Any], completion: Optional[Dict[str, Any]],
+                        cached: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Record which model answered, or that the answer came from the semantic cache"""
+    if completion:
+        result["metadata"].update(completion_metadata(completion))
+    result["metadata"]["semantic_cache_hit"] = cached is not None
+    if cached is not None:
+        result["metadata"]["semantic_similarity"] = round(cached["similarity"], 3)
+    return result
+
+def chatbot_error_result(error: Exception) -> Dict[str, Any]:
+    """Node output for a failed chatbot call"""
+    return {
+        "response": f"I apologize, but I encountered an error: {str(error)}",
+        "metadata": {
+            "agent_used": "eco_chatbot_agent",
+            "success": False,
+            "error": str(error),
+            "error_type": type(error).__name__
+        }
+    }
+
+def enhanced_eco_chatbot_agent(state: EcosyncState) -> Dict[str, Any]:
+    """
+    Enhanced Eco Chatbot Agent with human health support
+    
+    Clinic suggestions are looked up in parallel by the clinic_lookup node and
+    appended by compose_response (chatbot_clinic_suggestions).
+    """
+    input_text = state.get("input", "")
+    health_type = state.get("health_type", "environmental")
+    namespace = semantic_cache_namespace(state)
+    
     try:
-        # Call the model
-        response = call_text_model(
-            model="mistralai/mistral-small-3.2-24b-instruct:free",
-            system_prompt=system_prompt,
-            user_prompt=input_text
-        )
+        # Paraphrases of an already answered question skip the model call
+        cached = chatbot_semantic_cache.lookup(namespace, input_text) if namespace else None
+        completion = None
+        if cached is not None:
+            response = cached["answer"]
+            if state.get("stream"):
+                emit_delta("eco_chatbot_agent", response)
+        # Call the model, forwarding tokens to the UI when streaming
+        elif state.get("stream"):
+            completion = {}
+            response = collect_stream("eco_chatbot_agent", stream_text(
+                select_models("text", agent="eco_chatbot_agent"),
+                system_prompt=get_system_prompt(health_type),
+                user_prompt=input_text,
+                use_cache=USE_LLM_CACHE,
+                outcome=completion
+            ))
+        else:
+            completion = complete_text(
+                select_models("text", agent="eco_chatbot_agent"),
+                system_prompt=get_system_prompt(health_type),
+                user_prompt=input_text,
+                use_cache=USE_LLM_CACHE
+            )
+            response = completion["content"]
         
-        # Add clinic suggestions for human health queries
-        clinic_suggestions = ""
-        clinic_data = []
+        # Model failures raise, so only real answers reach the cache
+        if namespace and cached is None:
+            chatbot_semantic_cache.store(namespace, input_text, response)
         
-        if health_type == "human" and user_city:
-            clinic_data = find_nearby_clinics(user_city)
-            if clinic_data:
-                clinic_suggestions = f"\n\n🏥 **Healthcare Facilities near {user_city}:**\n\n"
-                for clinic in clinic_data[:3]:  # Show top 3
-                    clinic_suggestions += f"**{clinic['name']}**\n"
-                    clinic_suggestions += f"📍 {clinic['address']}\n"
-                    clinic_suggestions += f"📞 {clinic.get('phone', 'Contact local directory')}\n"
-                    if clinic.get('rating') != 'N/A':
-                        clinic_suggestions += f"⭐ Rating: {clinic['rating']}/5\n"
-                    clinic_suggestions += "---\n"
-                
-                clinic_suggestions += "\n*Please consult with healthcare professionals for proper medical advice.*"
-        
-        elif health_type == "human" and not user_city:
-            clinic_suggestions = "\n\n🏥 **Need medical assistance?** Please specify your city, and I can suggest nearby healthcare facilities."
+        return add_answer_metadata(build_chatbot_result(response, health_type), completion, cached)
+    
+    except Exception as e:
+        return chatbot_error_result(e)
+
+async def enhanced_eco_chatbot_agent_async(state: EcosyncState) -> Dict[str, Any]:
+    """
+    Async variant of enhanced_eco_chatbot_agent for ainvoke
+    """
+    input_text = state.get("input", "")
+    health_type = state.get("health_type", "environmental")
+    namespace = semantic_cache_namespace(state)
+    
+    try:
+        cached = chatbot_semantic_cache.lookup(namespace, input_text) if namespace else None
+        completion = None
+        if cached is not None:
+            response = cached["answer"]
+            if state.get("stream"):
+                emit_delta("eco_chatbot_agent", response)
+        elif state.get("stream"):
+            completion = {}
+            response = await acollect_stream("eco_chatbot_agent", astream_text(
+                select_models("text", agent="eco_chatbot_agent"),
+                system_prompt=get_system_prompt(health_type),
+                user_prompt=input_text,
+                use_cache=USE_LLM_CACHE,
+                outcome=completion
+            ))
+        else:
+            completion = await acomplete_text(
+                select_models("text", agent="eco_chatbot_agent"),
+                system_prompt=get_system_prompt(health_type),
+                user_prompt=input_text,
+                use_cache=USE_LLM_CACHE
+            )
+            response = completion["content"]
         
-        full_response = response + clinic_suggestions
+        if namespace and cached is None:
+            chatbot_semantic_cache.store(namespace, input_text, response)
         
-        return {
-            "response": full_response,
-            "clinic_data": clinic_data,
-            "metadata": {
-                "agent_used": "eco_chatbot_agent",
-                "model": "mistralai/mistral-small-3.2-24b-instruct:free",
-                "health_type": health_type,
-                "clinic_suggestions_provided": bool(clinic_suggestions),
-                "success": True
-            }
-        }
+        return add_answer_metadata(build_chatbot_result(response, health_type), completion, cached)
     
     except Exception as e:
-        return {
-            "response": f"I apologize, but I encountered an error: {str(e)}",
-            "metadata": {
-                "agent_used": "eco_chatbot_agent",
-                "success": False,
-                "error": str(e)
-            }
-        }
\ No newline at end of file
+        return chatbot_error_result(e)
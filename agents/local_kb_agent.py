@@ -0,0 +1,43 @@
+from typing import Dict, Any
+from graph.schema import EcosyncState
+from graph.streaming import emit_delta
+from utils.local_kb import get_local_kb
+
+def local_kb_applies(state: EcosyncState) -> bool:
+    """
+    Text-only questions, except health questions that may get clinic suggestions
+
+    Those go to the agent even without a city: compose_response then adds
+    the clinics, or asks for the city, which a KB answer would skip.
+    """
+    if state.get("has_image"):
+        return False
+    return not (state.get("metadata") or {}).get("needs_clinic_suggestions")
+
+def local_kb_node(state: EcosyncState) -> Dict[str, Any]:
+    """
+    Answer stock SDG 3/14/15 questions from the curated knowledge base
+
+    Leaves the state untouched when there is no confident match, so the
+    routed agent answers instead.
+    """
+    kb = get_local_kb()
+    match = kb.answer(state.get("input", "")) if kb else None
+    if match is None:
+        return {}
+    
+    if state.get("stream"):
+        emit_delta("local_kb", match["answer"])
+    return {
+        "response": match["answer"],
+        "clinic_data": [],
+        "metadata": {
+            **(state.get("metadata") or {}),
+            "agent_used": "local_kb",
+            "answered_by": "local_kb",
+            "kb_entry": match["id"],
+            "kb_score": match["score"],
+            "kb_query_coverage": match["query_coverage"],
+            "success": True
+        }
+    }
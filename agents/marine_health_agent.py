@@ -1,23 +1,22 @@
-from typing import Dict, Any
+import asyncio
+from typing import Dict, Any, List
 from graph.schema import EcosyncState
-from utils.openrouter import call_vision_model
-from utils.clinic_finder import find_nearby_clinics
+from graph.streaming import collect_stream, acollect_stream, emit_delta
+from utils.openrouter import (
+    complete_vision, acomplete_vision, stream_vision, astream_vision, completion_metadata
+)
+from utils.model_registry import select_models
+from utils.llm_cache import cache_enabled_for
+from utils.blob_store import ImageExpiredError, get_image
+from utils.vision_cache import find_cached_analysis, store_vision_result, vision_cache_metadata
 
-def enhanced_marine_health_agent(state: EcosyncState) -> Dict[str, Any]:
-    """
-    Enhanced Marine Health Agent with human health impact analysis
-    """
-    input_text = state.get("input", "")
-    image = state.get("image")
-    health_type = state.get("health_type", "marine")
-    user_city = state.get("user_city", "")
-    
-    if not image:
-        return {
-            "response": "I need an image to analyze marine life health. Please upload an image of marine creatures or ocean environment.",
-            "metadata": {"agent_used": "marine_health_agent", "success": False, "error": "No image provided"}
-        }
-    
+# Set ECOSYNC_LLM_CACHE_DISABLED_AGENTS=marine_health_agent to opt this agent out of the response cache
+USE_LLM_CACHE = cache_enabled_for("marine_health_agent")
+# Models come from the registry's vision pool, healthiest first; override with ECOSYNC_MODELS_MARINE_HEALTH_AGENT
+DEFAULT_USER_PROMPT = "Please analyze this marine environment for health indicators and potential human health impacts."
+
+def get_system_prompt(health_type: str) -> str:
+    """System prompt for the marine analysis, adjusted to the health type"""
     # Enhanced system prompt based on health type
     if health_type == "environmental_marine":
         system_prompt = """You are a marine biology and public health expert. 
@@ -47,45 +46,178 @@ def enhanced_marine_health_agent(state: EcosyncState) -> Dict[str, Any]:
         
         Provide detailed, scientific analysis accessible to general audiences."""
     
+    return system_prompt
+
+# A marine analysis mentioning one of these gets clinic suggestions
+MARINE_HEALTH_CONCERN_KEYWORDS = ["contamination", "pollution", "toxic", "harmful", "unsafe", "health risk"]
+
+def marine_health_concern(response: str) -> bool:
+    """Whether the analysis flags a human health concern"""
+    response = response.lower()
+    return any(keyword in response for keyword in MARINE_HEALTH_CONCERN_KEYWORDS)
+
+def marine_clinic_suggestions(response: str, health_type: str, user_city: str,
+                              clinic_data: List[Dict[str, Any]]) -> str:
+    """Clinic suggestions when the analysis flags health concerns ("" otherwise, and the lookup is discarded)"""
+    clinic_suggestions = ""
+    
+    if health_type == "environmental_marine" and user_city and marine_health_concern(response):
+        if clinic_data:
+            clinic_suggestions = f"\n\n⚠️ **Health Precaution - Healthcare Facilities in {user_city}:**\n\n"
+            for clinic in clinic_data[:2]:  # Show top 2 for environmental concerns
+                distance = f" ({clinic['distance']:.1f} km)" if clinic.get('distance') is not None else ""
+                clinic_suggestions += f"**{clinic['name']}**{distance} - {clinic['phone']}\n"
+            clinic_suggestions += "\n*Consult healthcare providers if you experience symptoms related to environmental exposure.*"
+    
+    return clinic_suggestions
+
+def build_marine_result(response: str, health_type: str) -> Dict[str, Any]:
+    """Node output for a model analysis; clinic suggestions are added by the compose_response join"""
+    return {
+        "response": response,
+        "metadata": {
+            "agent_used": "marine_health_agent",
+            "health_type": health_type,
+            "environmental_health_analysis": health_type == "environmental_marine",
+            "success": True
+        }
+    }
+
+def missing_image_result() -> Dict[str, Any]:
+    """Node output when no image was uploaded"""
+    return {
+        "response": "I need an image to analyze marine life health. Please upload an image of marine creatures or ocean environment.",
+        "metadata": {"agent_used": "marine_health_agent", "success": False, "error": "No image provided"}
+    }
+
+def expired_image_result() -> Dict[str, Any]:
+    """Node output when the uploaded image is no longer stored"""
+    return {
+        "response": "Your uploaded image has expired. Please upload it again so I can analyze marine life health.",
+        "metadata": {"agent_used": "marine_health_agent", "success": False, "error": "Image upload expired",
+                     "error_type": "ImageExpiredError"}
+    }
+
+def marine_error_result(error: Exception) -> Dict[str, Any]:
+    """Node output for a failed vision call"""
+    return {
+        "response": f"I encountered an error while analyzing the marine image: {str(error)}",
+        "metadata": {"agent_used": "marine_health_agent", "success": False, "error": str(error),
+                     "error_type": type(error).__name__}
+    }
+
+def enhanced_marine_health_agent(state: EcosyncState) -> Dict[str, Any]:
+    """
+    Enhanced Marine Health Agent with human health impact analysis
+    """
+    input_text = state.get("input", "")
+    # State carries only a ref; the bytes are base64 encoded once, in the OpenRouter request
     try:
-        response = call_vision_model(
-            model="moonshotai/kimi-vl-a3b-thinking:free",
-            system_prompt=system_prompt,
-            user_prompt=input_text or "Please analyze this marine environment for health indicators and potential human health impacts.",
-            image_base64=image
-        )
+        image = get_image(state.get("image_ref"))
+    except ImageExpiredError:
+        return expired_image_result()
+    health_type = state.get("health_type", "marine")
+    
+    if not image:
+        return missing_image_result()
+    
+    try:
+        user_prompt = input_text or DEFAULT_USER_PROMPT
+        # The same photo (or a near-duplicate) with the same question reuses the earlier analysis
+        image_hash, cached = find_cached_analysis("marine_health_agent", health_type, user_prompt, image)
+        completion = None
+        if cached is not None:
+            response = cached["response"]
+            if state.get("stream"):
+                emit_delta("marine_health_agent", response)
+        # Call the model, forwarding tokens to the UI when streaming
+        elif state.get("stream"):
+            completion = {}
+            response = collect_stream("marine_health_agent", stream_vision(
+                select_models("vision", agent="marine_health_agent"),
+                system_prompt=get_system_prompt(health_type),
+                user_prompt=user_prompt,
+                image=image,
+                use_cache=USE_LLM_CACHE,
+                outcome=completion
+            ))
+        else:
+            completion = complete_vision(
+                select_models("vision", agent="marine_health_agent"),
+                system_prompt=get_system_prompt(health_type),
+                user_prompt=user_prompt,
+                image=image,
+                use_cache=USE_LLM_CACHE,
+                cancelled=state.get("cancelled")
+            )
+            response = completion["content"]
         
-        # Add clinic suggestions if environmental health concerns detected
-        clinic_suggestions = ""
-        clinic_data = []
+        if image_hash is not None and cached is None:
+            store_vision_result("marine_health_agent", health_type, user_prompt, image_hash, response, completion.get("model"))
         
-        if health_type == "environmental_marine" and user_city:
-            # Check if response mentions health concerns
-            health_concern_keywords = ["contamination", "pollution", "toxic", "harmful", "unsafe", "health risk"]
-            if any(keyword in response.lower() for keyword in health_concern_keywords):
-                clinic_data = find_nearby_clinics(user_city)
-                if clinic_data:
-                    clinic_suggestions = f"\n\n⚠️ **Health Precaution - Healthcare Facilities in {user_city}:**\n\n"
-                    for clinic in clinic_data[:2]:  # Show top 2 for environmental concerns
-                        clinic_suggestions += f"**{clinic['name']}** - {clinic['phone']}\n"
-                    clinic_suggestions += "\n*Consult healthcare providers if you experience symptoms related to environmental exposure.*"
+        result = build_marine_result(response, health_type)
+        if completion:
+            result["metadata"].update(completion_metadata(completion))
+        result["metadata"].update(vision_cache_metadata(cached))
+        return result
+    
+    except Exception as e:
+        return marine_error_result(e)
+
+async def enhanced_marine_health_agent_async(state: EcosyncState) -> Dict[str, Any]:
+    """
+    Async variant of enhanced_marine_health_agent for ainvoke
+    """
+    input_text = state.get("input", "")
+    try:
+        image = get_image(state.get("image_ref"))
+    except ImageExpiredError:
+        return expired_image_result()
+    health_type = state.get("health_type", "marine")
+    
+    if not image:
+        return missing_image_result()
+    
+    try:
+        user_prompt = input_text or DEFAULT_USER_PROMPT
+        # The same photo (or a near-duplicate) with the same question reuses the earlier analysis
+        image_hash, cached = await asyncio.to_thread(
+            find_cached_analysis, "marine_health_agent", health_type, user_prompt, image
+        )
+        completion = None
+        if cached is not None:
+            response = cached["response"]
+            if state.get("stream"):
+                emit_delta("marine_health_agent", response)
+        elif state.get("stream"):
+            completion = {}
+            response = await acollect_stream("marine_health_agent", astream_vision(
+                select_models("vision", agent="marine_health_agent"),
+                system_prompt=get_system_prompt(health_type),
+                user_prompt=user_prompt,
+                image=image,
+                use_cache=USE_LLM_CACHE,
+                outcome=completion
+            ))
+        else:
+            completion = await acomplete_vision(
+                select_models("vision", agent="marine_health_agent"),
+                system_prompt=get_system_prompt(health_type),
+                user_prompt=user_prompt,
+                image=image,
+                use_cache=USE_LLM_CACHE
+            )
+            response = completion["content"]
         
-        full_response = response + clinic_suggestions
+        if image_hash is not None and cached is None:
+            await asyncio.to_thread(store_vision_result, "marine_health_agent", health_type, user_prompt, image_hash,
+                                    response, completion.get("model"))
         
-        return {
-            "response": full_response,
-            "clinic_data": clinic_data,
-            "metadata": {
-                "agent_used": "marine_health_agent",
-                "model": "moonshotai/kimi-vl-a3b-thinking:free",
-                "health_type": health_type,
-                "environmental_health_analysis": health_type == "environmental_marine",
-                "success": True
-            }
-        }
+        result = build_marine_result(response, health_type)
+        if completion:
+            result["metadata"].update(completion_metadata(completion))
+        result["metadata"].update(vision_cache_metadata(cached))
+        return result
     
     except Exception as e:
-        return {
-            "response": f"I encountered an error while analyzing the marine image: {str(e)}",
-            "metadata": {"agent_used": "marine_health_agent", "success": False, "error": str(e)}
-        }
\ No newline at end of file
+        return marine_error_result(e)
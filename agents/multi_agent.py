@@ -0,0 +1,161 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, List
+from graph.schema import EcosyncState
+from graph.streaming import emit_delta
+from agents.marine_health_agent import (
+    enhanced_marine_health_agent, enhanced_marine_health_agent_async, marine_clinic_suggestions
+)
+from agents.land_health_agent import (
+    enhanced_land_health_agent, enhanced_land_health_agent_async, land_clinic_suggestions
+)
+
+# A branch without an answer after this many seconds is left out of the merged response
+BRANCH_TIMEOUT = float(os.getenv("ECOSYNC_BRANCH_TIMEOUT", 60))
+
+# Agent -> (domain, graph node running it as a fan-out branch)
+BRANCH_AGENTS = {
+    "marine_health_agent": ("marine", "marine_branch"),
+    "land_health_agent": ("land", "land_branch")
+}
+BRANCH_TITLES = {"marine": "🌊 Marine perspective", "land": "🌿 Land perspective"}
+
+def branch_health_type(health_type: str, domain: str) -> str:
+    """The routed health type carried over to a branch's domain ("environmental_marine" -> "environmental_land")"""
+    if health_type and health_type.startswith("environmental"):
+        return f"environmental_{domain}"
+    return domain
+
+def branch_input(state: EcosyncState, agent: str) -> Dict[str, Any]:
+    """
+    Agent input for one branch
+    
+    Branches never stream (merge_branches emits the combined text). The
+    cancelled event is passed to the agent's model call and set when the
+    branch times out, so an abandoned branch stops sending requests.
+    """
+    domain = BRANCH_AGENTS[agent][0]
+    return {
+        **state,
+        "health_type": branch_health_type(state.get("health_type", ""), domain),
+        "stream": False,
+        "cancelled": threading.Event()
+    }
+
+def branch_result(agent: str, health_type: str, output: Dict[str, Any], start: float) -> Dict[str, Any]:
+    metadata = output.get("metadata", {})
+    return {
+        "agent": agent,
+        "health_type": health_type,
+        "response": output.get("response", ""),
+        "success": metadata.get("success", True),
+        "timed_out": False,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        "metadata": metadata
+    }
+
+def branch_timeout_result(agent: str, health_type: str, start: float) -> Dict[str, Any]:
+    return {
+        "agent": agent,
+        "health_type": health_type,
+        "response": "",
+        "success": False,
+        "timed_out": True,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        "metadata": {"agent_used": agent, "success": False, "error": f"No answer within {BRANCH_TIMEOUT:g}s"}
+    }
+
+def run_branch(agent: str, agent_function, state: EcosyncState) -> Dict[str, Any]:
+    """Run one agent as a branch, cancelling it after BRANCH_TIMEOUT"""
+    agent_state = branch_input(state, agent)
+    start = time.perf_counter()
+    # A thread of its own per branch: a stuck branch never holds a worker another request needs
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{agent}-branch")
+    try:
+        future = executor.submit(agent_function, agent_state)
+        output = future.result(timeout=BRANCH_TIMEOUT)
+    except FutureTimeoutError:
+        agent_state["cancelled"].set()  # The model call gives up at its next attempt or backoff
+        print(f"{agent} branch timed out after {BRANCH_TIMEOUT:g}s")
+        return {"branch_results": [branch_timeout_result(agent, agent_state["health_type"], start)]}
+    finally:
+        executor.shutdown(wait=False)
+    return {"branch_results": [branch_result(agent, agent_state["health_type"], output, start)]}
+
+async def arun_branch(agent: str, agent_function, state: EcosyncState) -> Dict[str, Any]:
+    """Async variant of run_branch; a timed out branch is cancelled"""
+    agent_state = branch_input(state, agent)
+    start = time.perf_counter()
+    try:
+        output = await asyncio.wait_for(agent_function(agent_state), timeout=BRANCH_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"{agent} branch timed out after {BRANCH_TIMEOUT:g}s")
+        return {"branch_results": [branch_timeout_result(agent, agent_state["health_type"], start)]}
+    return {"branch_results": [branch_result(agent, agent_state["health_type"], output, start)]}
+
+def marine_branch_node(state: EcosyncState) -> Dict[str, Any]:
+    """Marine health agent as a fan-out branch"""
+    return run_branch("marine_health_agent", enhanced_marine_health_agent, state)
+
+async def marine_branch_node_async(state: EcosyncState) -> Dict[str, Any]:
+    return await arun_branch("marine_health_agent", enhanced_marine_health_agent_async, state)
+
+def land_branch_node(state: EcosyncState) -> Dict[str, Any]:
+    """Land health agent as a fan-out branch"""
+    return run_branch("land_health_agent", enhanced_land_health_agent, state)
+
+async def land_branch_node_async(state: EcosyncState) -> Dict[str, Any]:
+    return await arun_branch("land_health_agent", enhanced_land_health_agent_async, state)
+
+def merge_branches_node(state: EcosyncState) -> Dict[str, Any]:
+    """
+    Combine the fan-out branches into one response
+    
+    Each answered branch becomes a titled section, in BRANCH_AGENTS order;
+    failed or timed out branches are noted briefly. Clinic suggestions are
+    added afterwards by compose_response (merged_clinic_suggestions).
+    """
+    order = list(BRANCH_AGENTS)
+    results = sorted(state.get("branch_results") or [], key=lambda result: order.index(result["agent"]))
+    answered = [result for result in results if result["success"]]
+    
+    sections = []
+    for result in results:
+        title = BRANCH_TITLES[BRANCH_AGENTS[result["agent"]][0]]
+        if result["timed_out"]:
+            sections.append(f"### {title}\n\n*This analysis took longer than {BRANCH_TIMEOUT:g}s and was skipped.*")
+        else:
+            sections.append(f"### {title}\n\n{result['response']}")
+    response = "\n\n".join(sections)
+    
+    metadata = {
+        **(state.get("metadata") or {}),
+        "agent_used": "multi_agent",
+        "agents_used": [result["agent"] for result in answered],
+        "health_type": state.get("health_type"),
+        "branches": {
+            result["agent"]: {
+                "success": result["success"],
+                "timed_out": result["timed_out"],
+                "elapsed_ms": result["elapsed_ms"],
+                "model": result["metadata"].get("model")
+            }
+            for result in results
+        },
+        "success": bool(answered)
+    }
+    if state.get("stream"):
+        emit_delta("multi_agent", response)
+    return {"response": response, "metadata": metadata}
+
+def merged_clinic_suggestions(response: str, health_type: str, user_city: str,
+                              clinic_data: List[Dict[str, Any]]) -> str:
+    """Clinic suggestions for a merged answer, from the first domain whose analysis flags a health concern"""
+    for domain, formatter in (("marine", marine_clinic_suggestions), ("land", land_clinic_suggestions)):
+        clinic_suggestions = formatter(response, branch_health_type(health_type, domain), user_city, clinic_data)
+        if clinic_suggestions:
+            return clinic_suggestions
+    return ""
@@ -1,20 +1,156 @@
 import streamlit as st
-import base64
 import os
-from io import BytesIO
-from PIL import Image
+import hashlib
 from dotenv import load_dotenv
-from agent_flow import enhanced_app_flow  # Updated flow
+from agent_flow import get_app_flow
+from batch_flow import analyze_batch, summarize_batch, BATCH_MAX_IMAGES
+from utils.model_registry import get_model_stats
+from utils.metrics import start_metrics_server
+from utils.image_utils import preprocess_image
+from utils.blob_store import put_image
 
 # Load environment variables
 load_dotenv()
 
-def encode_image_to_base64(image):
-    """Convert PIL image to base64 string"""
-    buffered = BytesIO()
-    image.save(buffered, format="JPEG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    return img_str
+# Serves /metrics when ECOSYNC_METRICS_PORT is set (once per process)
+start_metrics_server()
+
+def load_app_flow():
+    """Compiled LangGraph flow, built once per process and shared by every session"""
+    return get_app_flow()
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def prepare_upload(upload_hash, _data):
+    """
+    Decode and preprocess an upload once per file (keyed by upload_hash)
+
+    Streamlit reruns the script on every widget change; without this each
+    keystroke in the question box re-decoded and re-encoded the image.
+    """
+    return preprocess_image(_data)
+
+def render_analysis(result, user_city, has_image):
+    """Draw a finished analysis (the final graph state) with its details and clinic suggestions"""
+    # Extract response and metadata
+    response = result.get("response", "No response generated.")
+    metadata = result.get("metadata", {})
+    clinic_data = result.get("clinic_data", [])
+    health_type = result.get("health_type", "environmental")
+    agent_used = metadata.get("agent_used", "Unknown")
+    
+    # Results section with full width layout
+    st.success(f"✅ Analysis Complete - **{agent_used.replace('_', ' ').title()}** ({health_type} analysis)")
+    
+    # Two-column results layout
+    result_col1, result_col2 = st.columns([3, 1], gap="large")
+    
+    with result_col1:
+        st.markdown("### 🎯 Analysis Results:")
+        st.markdown(f"""
+        <div style="background-color: #f0f8ff; padding: 1.5rem; border-radius: 10px; border-left: 5px solid #4CAF50;">
+            {response}
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with result_col2:
+        st.markdown("### 📊 Analysis Details")
+        
+        # Health type indicator
+        health_colors = {
+            "human": "🏥",
+            "environmental_marine": "🌊",
+            "environmental_land": "🌿",
+            "marine": "🐠",
+            "land": "🌳",
+            "environmental": "🌍"
+        }
+        
+        st.info(f"**Analysis Type:** {health_colors.get(health_type, '🔍')} {health_type.replace('_', ' ').title()}")
+        
+        # Agent selection info
+        if "routing_reason" in metadata:
+            st.text(metadata["routing_reason"])
+        
+        # Processing details
+        st.markdown("**Processing Info:**")
+        st.write(f"🖼️ Image: {'✅ Yes' if has_image else '❌ No'}")
+        st.write(f"📍 City: {'✅ ' + user_city if user_city else '❌ Not provided'}")
+        st.write(f"🏥 Health Focus: {'✅ Yes' if health_type in ['human', 'environmental_marine', 'environmental_land'] else '❌ No'}")
+        
+        if metadata.get("success") is False and "error" in metadata:
+            st.error(f"⚠️ Error: {metadata['error']}")
+    
+    # Clinic suggestions section (if available)
+    if clinic_data:
+        st.markdown("---")
+        st.markdown("### 🏥 Nearby Healthcare Facilities")
+        
+        clinic_cols = st.columns(min(len(clinic_data), 3))
+        
+        for idx, clinic in enumerate(clinic_data[:3]):
+            with clinic_cols[idx % 3]:
+                st.markdown(f"""
+                <div class="clinic-card">
+                    <h4>🏥 {clinic['name']}</h4>
+                    <p><strong>📍 Address:</strong><br>{clinic['address']}</p>
+                    <p><strong>📞 Phone:</strong> {clinic.get('phone', 'Contact local directory')}</p>
+                    {f"<p><strong>📏 Distance:</strong> {clinic['distance']:.1f} km</p>" if clinic.get('distance') is not None else ""}
+                    {f"<p><strong>⭐ Rating:</strong> {clinic['rating']}/5</p>" if clinic.get('rating') != 'N/A' else ""}
+                    {f"<p><strong>🌐 Website:</strong> <a href='{clinic['website']}' target='_blank'>Visit</a></p>" if clinic.get('website') else ""}
+                </div>
+                """, unsafe_allow_html=True)
+    
+    # Health disclaimer for medical queries
+    if health_type in ["human", "environmental_marine", "environmental_land"]:
+        st.markdown("---")
+        st.warning("""
+        ⚠️ **Medical Disclaimer**: This AI provides educational information only and is not a substitute for professional medical advice, diagnosis, or treatment. Always consult qualified healthcare providers for medical concerns.
+        """)
+
+def render_batch_item(item):
+    """One photo of a batch as a collapsible result"""
+    icon = "✅" if item["success"] else "⚠️"
+    agent = (item["agent_used"] or "failed").replace("_", " ").title()
+    with st.expander(f"{icon} {item['index'] + 1}. {item['name']} - {agent}"):
+        st.markdown(item["response"])
+
+def render_batch_analysis(items, summary):
+    """Draw a finished batch: the survey summary, then each photo in upload order"""
+    failed = sum(1 for item in items if not item["success"])
+    st.success(f"✅ Batch Analysis Complete - **{len(items)} images**" + (f", {failed} failed" if failed else ""))
+    
+    st.markdown("### 🧭 Survey Summary")
+    st.markdown(summary["response"])
+    if summary["metadata"].get("success") is False:
+        st.error(f"⚠️ Error: {summary['metadata']['error']}")
+    
+    st.markdown("### 🖼️ Per-Image Results")
+    for item in sorted(items, key=lambda item: item["index"]):
+        render_batch_item(item)
+    
+    if any(item["health_type"] in ["human", "environmental_marine", "environmental_land"] for item in items):
+        st.markdown("---")
+        st.warning("""
+        ⚠️ **Medical Disclaimer**: This AI provides educational information only and is not a substitute for professional medical advice, diagnosis, or treatment. Always consult qualified healthcare providers for medical concerns.
+        """)
+
+def run_batch_analysis(batch_images, user_input, user_city):
+    """Analyze a photo set, showing each result as it completes, then summarize it"""
+    progress = st.progress(0.0, text=f"Analyzing {len(batch_images)} images...")
+    live_placeholder = st.empty()
+    live = live_placeholder.container()
+    items = []
+    for item in analyze_batch(load_app_flow(), batch_images, user_input, user_city.strip() if user_city else ""):
+        items.append(item)
+        progress.progress(len(items) / len(batch_images), text=f"Analyzed {len(items)} of {len(batch_images)} images")
+        with live:
+            render_batch_item(item)
+    
+    progress.progress(1.0, text="Summarizing the survey...")
+    summary = summarize_batch(user_input, items)
+    progress.empty()
+    live_placeholder.empty()
+    return items, summary
 
 def main():
     # Set wide layout and custom CSS for better laptop experience
@@ -107,6 +243,29 @@ def main():
         • "Forest fire smoke exposure"
         • "I have a rash after beach visit"
         """)
+        
+        st.markdown("---")
+        with st.expander("📈 Model Health"):
+            model_stats = get_model_stats()
+            if model_stats:
+                st.dataframe(
+                    [
+                        {
+                            "Model": row["model"].split("/")[-1],
+                            "State": row["state"],
+                            "Calls": row["requests"],
+                            "429s": row["rate_limited"],
+                            "Errors": f"{row['error_rate']:.0%}",
+                            "p50 (s)": round(row["p50_s"], 1) if row["p50_s"] is not None else None,
+                            "p95 (s)": round(row["p95_s"], 1) if row["p95_s"] is not None else None
+                        }
+                        for row in model_stats
+                    ],
+                    hide_index=True,
+                    use_container_width=True
+                )
+            else:
+                st.caption("No model calls yet in this session.")
     
     # Main content area - wider layout
     main_col1, main_col2 = st.columns([2, 1], gap="large")
@@ -128,11 +287,12 @@ def main():
             help="Providing your city helps us suggest nearby healthcare facilities for health-related queries"
         )
         
-        st.markdown("### 📸 Upload Image (Optional)")
-        uploaded_file = st.file_uploader(
-            "Choose an image for analysis:",
+        st.markdown("### 📸 Upload Images (Optional)")
+        uploaded_files = st.file_uploader(
+            "Choose an image for analysis, or a survey set for batch analysis:",
             type=['png', 'jpg', 'jpeg'],
-            help="Marine life, coral reefs, forests, wildlife, environmental conditions, or health-related images",
+            accept_multiple_files=True,
+            help=f"Marine life, coral reefs, forests, wildlife, environmental conditions, or health-related images. Up to {BATCH_MAX_IMAGES} photos are analyzed in parallel and summarized.",
             key="image_upload"
         )
         
@@ -141,18 +301,36 @@ def main():
     
     with main_col2:
         st.markdown("### 🖼️ Image Preview")
-        img_base64 = None
-        if uploaded_file is not None:
-            image = Image.open(uploaded_file)
-            st.image(image, caption="Uploaded Image", use_column_width=True)
-            img_base64 = encode_image_to_base64(image)
+        image_ref = None
+        batch_images = []
+        if len(uploaded_files) > 1:
+            # Batch mode: each photo is preprocessed once and analyzed in parallel
+            batch_previews = []
+            for batch_file in uploaded_files[:BATCH_MAX_IMAGES]:
+                upload = batch_file.getvalue()
+                batch_prepared = prepare_upload(hashlib.sha256(upload).hexdigest(), upload)
+                batch_images.append((batch_file.name, put_image(batch_prepared["jpeg"])))
+                batch_previews.append(batch_prepared["jpeg"])
+            st.image(batch_previews[:12], width=96)
+            st.markdown(f"""
+            **Survey Set:**
+            - Images: {len(batch_images)}{f" (first {BATCH_MAX_IMAGES} of {len(uploaded_files)})" if len(uploaded_files) > BATCH_MAX_IMAGES else ""}
+            - Sent for analysis: {sum(len(jpeg) for jpeg in batch_previews) / 1024:.0f} KB of JPEG
+            """)
+        elif uploaded_files:
+            # Orient, downsample and compress once; the model gets the same pixels as the preview
+            upload = uploaded_files[0].getvalue()
+            prepared = prepare_upload(hashlib.sha256(upload).hexdigest(), upload)
+            st.image(prepared["jpeg"], caption="Uploaded Image", use_column_width=True)
+            image_ref = put_image(prepared["jpeg"])
             
             # Image info
             st.markdown(f"""
             **Image Details:**
-            - Size: {image.size[0]}x{image.size[1]} pixels
-            - Format: {image.format}
-            - Mode: {image.mode}
+            - Size: {prepared['original_width']}x{prepared['original_height']} pixels
+            - Format: {prepared['original_format']}
+            - Mode: {prepared['original_mode']}
+            - Sent for analysis: {prepared['width']}x{prepared['height']} JPEG, {len(prepared['jpeg']) / 1024:.0f} KB
             """)
         else:
             st.markdown("""
@@ -187,97 +365,60 @@ def main():
         # Full width processing section
         st.markdown("---")
         
-        with st.spinner("🤖 Processing with Health-Aware AI agents..."):
+        if batch_images:
             try:
-                # Invoke the enhanced LangGraph flow
-                result = enhanced_app_flow.invoke({
-                    "input": user_input,
-                    "image": img_base64,
-                    "user_city": user_city.strip() if user_city else ""
-                })
-                
-                # Extract response and metadata
-                response = result.get("response", "No response generated.")
-                metadata = result.get("metadata", {})
-                clinic_data = result.get("clinic_data", [])
-                health_type = result.get("health_type", "environmental")
-                agent_used = metadata.get("agent_used", "Unknown")
-                
-                # Results section with full width layout
-                st.success(f"✅ Analysis Complete - **{agent_used.replace('_', ' ').title()}** ({health_type} analysis)")
-                
-                # Two-column results layout
-                result_col1, result_col2 = st.columns([3, 1], gap="large")
-                
-                with result_col1:
-                    st.markdown("### 🎯 Analysis Results:")
-                    st.markdown(f"""
-                    <div style="background-color: #f0f8ff; padding: 1.5rem; border-radius: 10px; border-left: 5px solid #4CAF50;">
-                        {response}
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with result_col2:
-                    st.markdown("### 📊 Analysis Details")
+                items, summary = run_batch_analysis(batch_images, user_input, user_city)
+                st.session_state.pop("last_analysis", None)
+                st.session_state["last_batch"] = {"items": items, "summary": summary}
+            except Exception as e:
+                st.session_state.pop("last_batch", None)
+                st.error(f"🚨 An error occurred: {str(e)}")
+        
+        else:
+            with st.spinner("🤖 Processing with Health-Aware AI agents..."):
+                try:
+                    # Stream the enhanced LangGraph flow: model tokens arrive as custom
+                    # events, the final state as the last "values" event
+                    stream_placeholder = st.empty()
+                    streamed_text = ""
+                    result = {}
+                    for mode, chunk in load_app_flow().stream({
+                        "input": user_input,
+                        "image_ref": image_ref,
+                        "has_image": image_ref is not None,
+                        "user_city": user_city.strip() if user_city else "",
+                        "stream": True
+                    }, stream_mode=["custom", "values"]):
+                        if mode == "custom" and chunk.get("delta"):
+                            streamed_text += chunk["delta"]
+                            stream_placeholder.markdown(streamed_text + "▌")
+                        elif mode == "values":
+                            result = chunk
+                    stream_placeholder.empty()
                     
-                    # Health type indicator
-                    health_colors = {
-                        "human": "🏥",
-                        "environmental_marine": "🌊",
-                        "environmental_land": "🌿",
-                        "marine": "🐠",
-                        "land": "🌳",
-                        "environmental": "🌍"
+                    # Kept across reruns: widget changes redraw it without touching the graph
+                    st.session_state.pop("last_batch", None)
+                    st.session_state["last_analysis"] = {
+                        "result": result,
+                        "user_city": user_city,
+                        "has_image": image_ref is not None
                     }
                     
-                    st.info(f"**Analysis Type:** {health_colors.get(health_type, '🔍')} {health_type.replace('_', ' ').title()}")
-                    
-                    # Agent selection info
-                    if "routing_reason" in metadata:
-                        st.text(metadata["routing_reason"])
-                    
-                    # Processing details
-                    st.markdown("**Processing Info:**")
-                    st.write(f"🖼️ Image: {'✅ Yes' if img_base64 else '❌ No'}")
-                    st.write(f"📍 City: {'✅ ' + user_city if user_city else '❌ Not provided'}")
-                    st.write(f"🏥 Health Focus: {'✅ Yes' if health_type in ['human', 'environmental_marine', 'environmental_land'] else '❌ No'}")
-                    
-                    if metadata.get("success") is False and "error" in metadata:
-                        st.error(f"⚠️ Error: {metadata['error']}")
-                
-                # Clinic suggestions section (if available)
-                if clinic_data:
-                    st.markdown("---")
-                    st.markdown("### 🏥 Nearby Healthcare Facilities")
+                except Exception as e:
+                    st.session_state.pop("last_analysis", None)
+                    st.error(f"🚨 An error occurred: {str(e)}")
+                    st.error("Please check your configuration and try again.")
                     
-                    clinic_cols = st.columns(min(len(clinic_data), 3))
-                    
-                    for idx, clinic in enumerate(clinic_data[:3]):
-                        with clinic_cols[idx % 3]:
-                            st.markdown(f"""
-                            <div class="clinic-card">
-                                <h4>🏥 {clinic['name']}</h4>
-                                <p><strong>📍 Address:</strong><br>{clinic['address']}</p>
-                                <p><strong>📞 Phone:</strong> {clinic.get('phone', 'Contact local directory')}</p>
-                                {f"<p><strong>⭐ Rating:</strong> {clinic['rating']}/5</p>" if clinic.get('rating') != 'N/A' else ""}
-                                {f"<p><strong>🌐 Website:</strong> <a href='{clinic['website']}' target='_blank'>Visit</a></p>" if clinic.get('website') else ""}
-                            </div>
-                            """, unsafe_allow_html=True)
-                
-                # Health disclaimer for medical queries
-                if health_type in ["human", "environmental_marine", "environmental_land"]:
-                    st.markdown("---")
-                    st.warning("""
-                    ⚠️ **Medical Disclaimer**: This AI provides educational information only and is not a substitute for professional medical advice, diagnosis, or treatment. Always consult qualified healthcare providers for medical concerns.
-                    """)
-                
-            except Exception as e:
-                st.error(f"🚨 An error occurred: {str(e)}")
-                st.error("Please check your configuration and try again.")
-                
-                # Error details in expandable section
-                with st.expander("🔍 View Error Details"):
-                    st.code(str(e))
+                    # Error details in expandable section
+                    with st.expander("🔍 View Error Details"):
+                        st.code(str(e))
+    elif "last_analysis" in st.session_state or "last_batch" in st.session_state:
+        st.markdown("---")
+    
+    if "last_analysis" in st.session_state:
+        render_analysis(**st.session_state["last_analysis"])
+    elif "last_batch" in st.session_state:
+        render_batch_analysis(**st.session_state["last_batch"])
     
     # Footer section with full width
     st.markdown("---")
@@ -0,0 +1,163 @@
+"""
+Batch analysis of survey photo sets
+
+Each image runs through the normal Ecosync flow (router, image triage, vision
+agent, caches), at most BATCH_CONCURRENCY at a time, and results are yielded
+as they complete. A final text pass summarizes the whole set.
+"""
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, AsyncIterator, Dict, Iterator, List, Sequence, Tuple
+
+from utils.openrouter import complete_text, acomplete_text, completion_metadata
+from utils.model_registry import select_models
+
+BATCH_CONCURRENCY = int(os.getenv("ECOSYNC_BATCH_CONCURRENCY", 4))   # Vision calls in flight per process
+BATCH_MAX_IMAGES = int(os.getenv("ECOSYNC_BATCH_MAX_IMAGES", 50))
+SUMMARY_CHARS_PER_IMAGE = 1200   # Keeps a 50 photo summary prompt within the text models' context
+
+# Shared by every session, so concurrent batches together stay within the free-tier rate limits
+batch_pool = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="batch")
+
+SUMMARY_SYSTEM_PROMPT = """You are an environmental survey analyst.
+You receive individual analyses of photos taken during one field survey.
+Write a concise survey summary:
+- Overall ecosystem condition across the set
+- Recurring issues and how many photos show them
+- Photos that need urgent follow-up, by name
+- Human health risks, if any were raised
+- Recommended next steps for the field team"""
+
+def batch_input(question: str, image_ref: str, user_city: str) -> Dict[str, Any]:
+    """Initial graph state for one photo of a batch"""
+    return {
+        "input": question,
+        "image_ref": image_ref,
+        "has_image": True,
+        "user_city": user_city
+    }
+
+def batch_item(index: int, name: str, state: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-image entry of a batch from the final graph state"""
+    metadata = state.get("metadata", {})
+    return {
+        "index": index,
+        "name": name,
+        "agent_used": metadata.get("agent_used", state.get("agent_decision")),
+        "health_type": state.get("health_type"),
+        "response": state.get("response", ""),
+        "success": metadata.get("success", True),
+        "metadata": metadata
+    }
+
+def batch_error_item(index: int, name: str, error: Exception) -> Dict[str, Any]:
+    """Per-image entry for a photo whose analysis raised"""
+    return {
+        "index": index,
+        "name": name,
+        "agent_used": None,
+        "health_type": None,
+        "response": f"Analysis failed: {error}",
+        "success": False,
+        "metadata": {"error": str(error), "error_type": type(error).__name__}
+    }
+
+def analyze_batch(flow, images: Sequence[Tuple[str, str]], question: str,
+                  user_city: str = "") -> Iterator[Dict[str, Any]]:
+    """
+    Analyze many images concurrently, yielding each result as it completes
+
+    Args:
+        flow: Compiled Ecosync graph
+        images: (name, image_ref) pairs, image refs from utils.blob_store
+        question: Question asked about every image
+        user_city: City for clinic suggestions
+
+    Yields:
+        batch_item dicts in completion order (index gives the upload order)
+    """
+    if len(images) > BATCH_MAX_IMAGES:
+        raise ValueError(f"A batch holds at most {BATCH_MAX_IMAGES} images, got {len(images)}")
+    futures = {
+        batch_pool.submit(flow.invoke, batch_input(question, image_ref, user_city)): (index, name)
+        for index, (name, image_ref) in enumerate(images)
+    }
+    for future in as_completed(futures):
+        index, name = futures[future]
+        try:
+            yield batch_item(index, name, future.result())
+        except Exception as e:
+            yield batch_error_item(index, name, e)
+
+async def aanalyze_batch(flow, images: Sequence[Tuple[str, str]], question: str,
+                         user_city: str = "") -> AsyncIterator[Dict[str, Any]]:
+    """Async variant of analyze_batch, using flow.ainvoke under a semaphore"""
+    if len(images) > BATCH_MAX_IMAGES:
+        raise ValueError(f"A batch holds at most {BATCH_MAX_IMAGES} images, got {len(images)}")
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(index: int, name: str, image_ref: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return batch_item(index, name, await flow.ainvoke(batch_input(question, image_ref, user_city)))
+            except Exception as e:
+                return batch_error_item(index, name, e)
+
+    tasks = [asyncio.create_task(run(index, name, image_ref)) for index, (name, image_ref) in enumerate(images)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def summary_prompt(question: str, items: List[Dict[str, Any]]) -> str:
+    """User prompt listing each photo's analysis, in upload order"""
+    sections = [f"Survey question: {question}", f"Photos analyzed: {len(items)}"]
+    for item in sorted(items, key=lambda item: item["index"]):
+        response = item["response"]
+        if len(response) > SUMMARY_CHARS_PER_IMAGE:
+            response = response[:SUMMARY_CHARS_PER_IMAGE] + " ..."
+        status = item["health_type"] or "failed"
+        sections.append(f"### Photo {item['index'] + 1}: {item['name']} ({status})\n{response}")
+    return "\n\n".join(sections)
+
+def summary_result(completion: Dict[str, Any], items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    metadata = {
+        "images": len(items),
+        "failed_images": sum(1 for item in items if not item["success"]),
+        "success": True
+    }
+    metadata.update(completion_metadata(completion))
+    return {"response": completion["content"], "metadata": metadata}
+
+def summary_error_result(error: Exception, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "response": f"Could not summarize the survey: {error}",
+        "metadata": {"images": len(items), "success": False, "error": str(error), "error_type": type(error).__name__}
+    }
+
+def summarize_batch(question: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregated survey summary of a finished batch (text model pass)"""
+    try:
+        completion = complete_text(
+            select_models("text", agent="batch_summary"),
+            system_prompt=SUMMARY_SYSTEM_PROMPT,
+            user_prompt=summary_prompt(question, items)
+        )
+        return summary_result(completion, items)
+    except Exception as e:
+        return summary_error_result(e, items)
+
+async def asummarize_batch(question: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Async variant of summarize_batch"""
+    try:
+        completion = await acomplete_text(
+            select_models("text", agent="batch_summary"),
+            system_prompt=SUMMARY_SYSTEM_PROMPT,
+            user_prompt=summary_prompt(question, items)
+        )
+        return summary_result(completion, items)
+    except Exception as e:
+        return summary_error_result(e, items)
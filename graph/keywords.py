@@ -0,0 +1,134 @@
+"""
+Router vocabularies and a single-pass keyword matcher
+
+The input is tokenized once into words and each position is looked up in a
+phrase table built at import time, longest phrase first. Cost depends on the
+input length and the longest phrase (in words), not on how many terms the
+vocabularies hold, and terms only match whole words ("seal" does not match
+"sealed", "land" does not match "island"). Plural forms are indexed with
+their terms, so "corals" and "animals" still count.
+
+Benchmark against the old substring scan:
+    python -m graph.keywords
+"""
+import re
+import time
+from typing import Dict, Iterable, List, Tuple
+
+ROUTER_VOCABULARIES: Dict[str, List[str]] = {
+    "human_health": [
+        # Physical symptoms
+        "fever", "pain", "headache", "cough", "cold", "flu", "sick", "illness", "injury",
+        "rash", "skin condition", "cut", "wound", "bleeding", "swelling", "infection",
+        "chest pain", "breathing", "asthma", "allergy", "nausea", "vomiting", "diarrhea",
+
+        # Medical terms
+        "doctor", "clinic", "hospital", "medical", "treatment", "prescription", "medicine",
+        "diagnosis", "symptoms", "health checkup", "vaccination", "emergency",
+
+        # Mental health
+        "stress", "anxiety", "depression", "mental health", "therapy", "counseling",
+
+        # Body parts (when mentioned with health context)
+        "stomach ache", "back pain", "joint pain", "muscle pain", "sore throat"
+    ],
+    "marine": [
+        "ocean", "sea", "marine", "fish", "coral", "whale", "dolphin", "shark",
+        "reef", "algae", "seaweed", "jellyfish", "turtle", "seal", "water pollution",
+        "oil spill", "marine ecosystem", "aquatic", "underwater", "beach pollution"
+    ],
+    "land": [
+        "forest", "land", "animal", "wildlife", "bird", "mammal", "tree", "plant",
+        "elephant", "tiger", "lion", "deer", "monkey", "bear", "wolf", "fox",
+        "deforestation", "habitat loss", "poaching", "endangered species", "conservation"
+    ]
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; punctuation and hyphens separate words"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def plural_forms(term: str) -> List[str]:
+    """The term plus simple English plurals of its last word"""
+    words = term.split()
+    last = words[-1]
+    forms = [last, last + "s", last + "es"]
+    if last.endswith("y") and len(last) > 1 and last[-2] not in "aeiou":
+        forms.append(last[:-1] + "ies")
+    return [" ".join(words[:-1] + [form]) for form in forms]
+
+class KeywordMatcher:
+    """Phrase table compiled from category vocabularies, matched in one pass over the input"""
+
+    def __init__(self, vocabularies: Dict[str, Iterable[str]], match_plurals: bool = True):
+        self.categories = list(vocabularies)
+        self._phrases: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        for category, terms in vocabularies.items():
+            for term in terms:
+                for form in plural_forms(term) if match_plurals else [term]:
+                    key = tuple(tokenize(form))
+                    if key and category not in self._phrases.get(key, ()):
+                        self._phrases[key] = self._phrases.get(key, ()) + (category,)
+        # First word -> phrase lengths starting with it, longest first; most tokens miss here in one lookup
+        self._sizes: Dict[str, Tuple[int, ...]] = {}
+        for key in self._phrases:
+            self._sizes[key[0]] = tuple(sorted(set(self._sizes.get(key[0], ())) | {len(key)}, reverse=True))
+
+    def __len__(self) -> int:
+        return len(self._phrases)
+
+    def scan(self, text: str) -> List[Tuple[str, Tuple[str, ...]]]:
+        """Matched phrases in order as (phrase, categories); the longest phrase wins at each position"""
+        tokens = tokenize(text)
+        found = []
+        position = 0
+        while position < len(tokens):
+            for size in self._sizes.get(tokens[position], ()):
+                phrase = tuple(tokens[position:position + size])
+                categories = self._phrases.get(phrase)
+                if categories:
+                    found.append((" ".join(phrase), categories))
+                    position += size
+                    break
+            else:
+                position += 1
+        return found
+
+    def count(self, text: str) -> Dict[str, int]:
+        """Hits per category (every category present, zero if unmatched)"""
+        counts = dict.fromkeys(self.categories, 0)
+        for _, categories in self.scan(text):
+            for category in categories:
+                counts[category] += 1
+        return counts
+
+router_keywords = KeywordMatcher(ROUTER_VOCABULARIES)
+
+def benchmark_keyword_matcher(repeats: int = 200) -> None:
+    """Compare the old per-call substring scan with KeywordMatcher as vocabularies and inputs grow"""
+    # No vocabulary term appears, even inside a word, so the substring scan checks every term
+    sentence = "Our team walked past the old harbour and recorded notes about visitors. "
+    for vocabulary_size in (sum(len(terms) for terms in ROUTER_VOCABULARIES.values()), 5000):
+        vocabularies = {category: list(terms) for category, terms in ROUTER_VOCABULARIES.items()}
+        filler = vocabulary_size - sum(len(terms) for terms in vocabularies.values())
+        vocabularies["land"] += [f"species{index} habitat" for index in range(max(filler, 0))]
+        matcher = KeywordMatcher(vocabularies)
+        for text in (sentence, sentence * 100):
+            lowered = text.lower()
+            start = time.perf_counter()
+            for _ in range(repeats):
+                for terms in vocabularies.values():
+                    any(term in lowered for term in terms)
+            substring_us = (time.perf_counter() - start) * 1e6 / repeats
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                matcher.count(text)
+            matcher_us = (time.perf_counter() - start) * 1e6 / repeats
+            print(f"{sum(len(terms) for terms in vocabularies.values()):5d} terms, {len(text):5d} chars: "
+                  f"substring scan {substring_us:9.1f} us, matcher {matcher_us:7.1f} us")
+
+if __name__ == "__main__":
+    benchmark_keyword_matcher()
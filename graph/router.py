@@ -1,101 +1,180 @@
-import base64
-from typing import Dict, Any
+import os
+from typing import Dict, Any, List, Optional, Tuple
 from graph.schema import EcosyncState
+from graph.keywords import router_keywords
+from graph.router_model import get_router_model
+from utils.blob_store import ImageExpiredError, get_image
+from utils.image_triage import IMAGE_TRIAGE_ROUTING, triage_image
 
-def enhanced_router_node(state: EcosyncState) -> Dict[str, Any]:
-    """
-    Enhanced router that detects human health queries and routes appropriately
-    """
-    input_text = state.get("input", "").lower()
-    image = state.get("image")
-    
-    # Human health keywords
-    human_health_keywords = [
-        # Physical symptoms
-        "fever", "pain", "headache", "cough", "cold", "flu", "sick", "illness", "injury",
-        "rash", "skin condition", "cut", "wound", "bleeding", "swelling", "infection",
-        "chest pain", "breathing", "asthma", "allergy", "nausea", "vomiting", "diarrhea",
-        
-        # Medical terms
-        "doctor", "clinic", "hospital", "medical", "treatment", "prescription", "medicine",
-        "diagnosis", "symptoms", "health checkup", "vaccination", "emergency",
-        
-        # Mental health
-        "stress", "anxiety", "depression", "mental health", "therapy", "counseling",
-        
-        # Body parts (when mentioned with health context)
-        "stomach ache", "back pain", "joint pain", "muscle pain", "sore throat"
-    ]
-    
-    # Marine health keywords
-    marine_keywords = [
-        "ocean", "sea", "marine", "fish", "coral", "whale", "dolphin", "shark", 
-        "reef", "algae", "seaweed", "jellyfish", "turtle", "seal", "water pollution",
-        "oil spill", "marine ecosystem", "aquatic", "underwater", "beach pollution"
-    ]
-    
-    # Land/wildlife health keywords  
-    land_keywords = [
-        "forest", "land", "animal", "wildlife", "bird", "mammal", "tree", "plant",
-        "elephant", "tiger", "lion", "deer", "monkey", "bear", "wolf", "fox",
-        "deforestation", "habitat loss", "poaching", "endangered species", "conservation"
-    ]
-    
-    # Determine health type and agent
-    is_human_health = any(keyword in input_text for keyword in human_health_keywords)
-    is_marine_related = any(keyword in input_text for keyword in marine_keywords)
-    is_land_related = any(keyword in input_text for keyword in land_keywords)
+# Agent that handles each health type
+HEALTH_TYPE_AGENTS = {
+    "human": "eco_chatbot_agent",
+    "environmental": "eco_chatbot_agent",
+    "environmental_marine": "marine_health_agent",
+    "environmental_land": "land_health_agent",
+    "marine": "marine_health_agent",
+    "land": "land_health_agent"
+}
+# These need an image; text-only questions of their health types go to the chatbot
+VISION_AGENTS = {"marine_health_agent", "land_health_agent"}
+
+# Below this model confidence the low-confidence policy decides:
+#   keywords - the keyword rules (and image triage, when enabled) below
+#   chatbot  - text-only queries go to the eco chatbot as general environmental questions
+#   model    - trust the model's best guess anyway
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ECOSYNC_ROUTER_MIN_CONFIDENCE", 0.7))
+ROUTER_LOW_CONFIDENCE_POLICY = os.getenv("ECOSYNC_ROUTER_LOW_CONFIDENCE", "keywords")
+
+# Image queries touching both marine and land run both vision agents in parallel and merge their answers.
+# A domain counts when its keywords match or the model gives it (plain + environmental) this much probability;
+# the class priors alone put each domain near 0.29 and generic words ("analyze", "healthy") up to about 0.5,
+# so at least one domain must also have keyword hits (see cross_domain_branches).
+ROUTER_FAN_OUT = os.getenv("ECOSYNC_ROUTER_FAN_OUT", "1") != "0"
+FAN_OUT_MIN_PROBABILITY = float(os.getenv("ECOSYNC_ROUTER_FAN_OUT_MIN_PROBABILITY", 0.6))
+FAN_OUT_AGENTS = ["marine_health_agent", "land_health_agent"]
+
+def keyword_route(state: EcosyncState, keyword_hits: Dict[str, int]) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Rule-based health type from keyword hits; returns (health_type, image_triage)"""
+    is_human_health = keyword_hits["human_health"] > 0
+    is_marine_related = keyword_hits["marine"] > 0
+    is_land_related = keyword_hits["land"] > 0
     
-    # Decision logic
     if is_human_health:
         # Human health query - check if it's environmental health related
         if is_marine_related:
-            agent_decision = "marine_health_agent"  # e.g., "water pollution making me sick"
-            health_type = "environmental_marine"
-        elif is_land_related:
-            agent_decision = "land_health_agent"    # e.g., "air pollution from deforestation"
-            health_type = "environmental_land"
-        else:
-            # Pure human health - use eco_chatbot but flag for clinic suggestions
-            agent_decision = "eco_chatbot_agent"
-            health_type = "human"
+            return "environmental_marine", None  # e.g., "water pollution making me sick"
+        if is_land_related:
+            return "environmental_land", None    # e.g., "air pollution from deforestation"
+        # Pure human health - use eco_chatbot but flag for clinic suggestions
+        return "human", None
     
-    elif image:
+    if state.get("has_image"):
         # Image analysis - determine marine vs land
         if is_marine_related:
-            agent_decision = "marine_health_agent"
-            health_type = "marine"
-        elif is_land_related:
-            agent_decision = "land_health_agent"
-            health_type = "land"
-        else:
-            # Ambiguous image - try to determine from visual cues
-            # Default to marine for water-related images, land for others
-            agent_decision = "marine_health_agent"  # Can be changed based on image analysis
-            health_type = "marine"
+            return "marine", None
+        if is_land_related:
+            return "land", None
+        if not IMAGE_TRIAGE_ROUTING:
+            return "marine", None
+        # Ambiguous image - let the local CPU triage classifier decide from colour and texture
+        try:
+            image = get_image(state.get("image_ref"))
+        except ImageExpiredError:
+            image = None  # The vision agent tells the user to upload it again
+        image_triage = triage_image(image)
+        if image_triage and image_triage["confident"] and image_triage["label"] == "land":
+            return "land", image_triage
+        # Marine remains the default when the classifier is unsure
+        return "marine", image_triage
     
+    # Text-only environmental query
+    if is_marine_related:
+        return "marine", None
+    if is_land_related:
+        return "land", None
+    return "environmental", None
+
+def select_agent(health_type: str, has_image: bool) -> str:
+    """Agent for a health type; the health type itself is kept for clinic suggestions"""
+    agent = HEALTH_TYPE_AGENTS[health_type]
+    if agent in VISION_AGENTS and not has_image:
+        return "eco_chatbot_agent"
+    return agent
+
+def cross_domain_branches(health_type: str, has_image: bool, keyword_hits: Dict[str, int],
+                          prediction: Optional[Dict[str, Any]]) -> List[str]:
+    """
+    Agents to fan out to when a marine or land image query also scores highly in the other domain
+    
+    Both domains need evidence from the query's words: a keyword hit for at
+    least one, and a keyword hit or FAN_OUT_MIN_PROBABILITY for the other.
+    Prompts without domain terms ("what is this", "is this healthy?", none at
+    all) stay with the single routed agent (marine, or image triage's pick).
+    """
+    if not (ROUTER_FAN_OUT and has_image) or HEALTH_TYPE_AGENTS[health_type] not in FAN_OUT_AGENTS:
+        return []
+    if not (prediction and prediction["known_features"]):
+        return []
+    if not (keyword_hits["marine"] or keyword_hits["land"]):
+        return []
+    probabilities = prediction["probabilities"]
+    for domain in ("marine", "land"):
+        probability = probabilities.get(domain, 0) + probabilities.get(f"environmental_{domain}", 0)
+        if not (keyword_hits[domain] > 0 or probability >= FAN_OUT_MIN_PROBABILITY):
+            return []
+    return list(FAN_OUT_AGENTS)
+
+def enhanced_router_node(state: EcosyncState) -> Dict[str, Any]:
+    """
+    Enhanced router that detects human health queries and routes appropriately
+    
+    The Naive Bayes query model (graph.router_model) scores every health type;
+    confident predictions are used directly, the rest go through
+    ROUTER_LOW_CONFIDENCE_POLICY. Image queries spanning marine and land
+    also get agent_branches, running both vision agents in parallel.
+    """
+    input_text = state.get("input", "")
+    has_image = bool(state.get("has_image"))
+    image_triage = None
+    
+    keyword_hits = router_keywords.count(input_text)
+    model = get_router_model()
+    prediction = model.predict(input_text) if model else None
+    confident = bool(prediction and prediction["known_features"] and prediction["confidence"] >= ROUTER_MIN_CONFIDENCE)
+    
+    if confident:
+        health_type = prediction["health_type"]
+        routed_by = "model"
+    elif ROUTER_LOW_CONFIDENCE_POLICY == "model" and prediction and prediction["known_features"]:
+        health_type = prediction["health_type"]
+        routed_by = "model_low_confidence"
+    elif ROUTER_LOW_CONFIDENCE_POLICY == "chatbot" and not has_image:
+        health_type = "environmental"
+        routed_by = "low_confidence_chatbot"
     else:
-        # Text-only environmental query
-        if is_marine_related:
-            agent_decision = "marine_health_agent"
-            health_type = "marine"
-        elif is_land_related:
-            agent_decision = "land_health_agent"
-            health_type = "land"
-        else:
-            agent_decision = "eco_chatbot_agent"
-            health_type = "environmental"
+        health_type, image_triage = keyword_route(state, keyword_hits)
+        routed_by = "keywords"
+    agent_decision = select_agent(health_type, has_image)
+    agent_branches = cross_domain_branches(health_type, has_image, keyword_hits, prediction)
     
     # Determine if we should ask for city (for human health cases)
     needs_city = health_type in ["human", "environmental_marine", "environmental_land"]
     
     return {
         "agent_decision": agent_decision,
+        "agent_branches": agent_branches,
         "health_type": health_type,
         "metadata": {
             "routing_reason": f"Selected {agent_decision} for {health_type} health query",
-            "has_image": image is not None,
+            "routed_by": routed_by,
+            "router_confidence": prediction["confidence"] if prediction else None,
+            "router_probabilities": prediction["probabilities"] if prediction else None,
+            "has_image": has_image,
             "needs_clinic_suggestions": needs_city,
-            "health_keywords_detected": is_human_health
+            "health_keywords_detected": keyword_hits["human_health"] > 0,
+            "keyword_hits": keyword_hits,
+            "image_triage": image_triage,
+            "agent_branches": agent_branches
         }
-    }
\ No newline at end of file
+    }
+
+def check_text_only_routing(queries: Optional[List[str]] = None) -> None:
+    """Regression check: text-only questions (the app's sidebar examples) never reach a vision agent"""
+    queries = queries or [
+        "Is this water safe to swim in?",
+        "Air pollution effects on health",
+        "Coral bleaching health impacts",
+        "Forest fire smoke exposure",
+        "I have a rash after beach visit"
+    ]
+    misrouted = []
+    for query in queries:
+        result = enhanced_router_node({"input": query, "has_image": False})
+        print(f"{result['agent_decision']:<20} {result['health_type']:<22} {query}")
+        if result["agent_decision"] in VISION_AGENTS:
+            misrouted.append(query)
+    if misrouted:
+        raise AssertionError(f"Text-only queries routed to a vision agent: {misrouted}")
+
+if __name__ == "__main__":
+    check_text_only_routing()
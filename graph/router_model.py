@@ -0,0 +1,179 @@
+"""
+Multinomial Naive Bayes query classifier for the router
+
+Scores every health type at once from the words and word pairs of the
+query. Trained offline on data/router_training.jsonl plus the router keyword
+vocabularies, and shipped as data/router_weights.json. The weights are
+stored sparsely: each feature only lists the classes where it was seen, as a
+log-probability offset from that class's unseen-feature value. At load they
+become a dense (features x classes) matrix, so scoring a query is one
+row-gather and sum.
+
+Retrain and benchmark:
+    python -m graph.router_model train
+    python -m graph.router_model benchmark
+"""
+import os
+import sys
+import json
+import math
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from graph.keywords import ROUTER_VOCABULARIES, tokenize
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+ROUTER_TRAINING_PATH = os.path.join(DATA_DIR, "router_training.jsonl")
+ROUTER_WEIGHTS_PATH = os.getenv("ECOSYNC_ROUTER_WEIGHTS", os.path.join(DATA_DIR, "router_weights.json"))
+
+# Keyword vocabulary -> health type its terms are added to the training set as
+VOCABULARY_HEALTH_TYPES = {"human_health": "human", "marine": "marine", "land": "land"}
+
+STOP_WORDS = frozenset(
+    "a an and are as at be can do does for from how i in is it me my of on or so that the this to was what "
+    "when where which who why will with you your".split()
+)
+
+def normalize_token(token: str) -> str:
+    """Crude singular form, so "corals" and "coral" share a feature"""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def query_features(text: str) -> List[str]:
+    """Unigrams and adjacent word pairs of a query, stop words dropped"""
+    words = [None if token in STOP_WORDS else normalize_token(token) for token in tokenize(text)]
+    unigrams = [word for word in words if word]
+    bigrams = [f"{first} {second}" for first, second in zip(words, words[1:]) if first and second]
+    return unigrams + bigrams
+
+class RouterModel:
+    """Naive Bayes scorer loaded from the sparse weights file"""
+
+    def __init__(self, classes: List[str], log_prior: List[float], unseen: List[float],
+                 features: Dict[str, Dict[str, float]]):
+        self.classes = list(classes)
+        class_index = {name: index for index, name in enumerate(self.classes)}
+        self._base = np.asarray(log_prior, dtype=np.float64)
+        self._unseen = np.asarray(unseen, dtype=np.float64)
+        self._feature_index = {feature: index for index, feature in enumerate(features)}
+        # Offsets from the unseen value; zero where a feature never occurred with a class
+        self._weights = np.zeros((len(features), len(self.classes)))
+        for row, offsets in enumerate(features.values()):
+            for name, offset in offsets.items():
+                self._weights[row, class_index[name]] = offset
+
+    @classmethod
+    def load(cls, path: str = ROUTER_WEIGHTS_PATH) -> "RouterModel":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["classes"], data["log_prior"], data["unseen"], data["features"])
+
+    def predict(self, text: str) -> Dict[str, Any]:
+        """
+        Probability of every class for a query
+
+        Returns:
+            Dict with health_type (best class), confidence (its probability),
+            probabilities (class -> probability) and known_features (features
+            of the query the model has weights for; 0 means no evidence)
+        """
+        rows = [self._feature_index[feature] for feature in query_features(text) if feature in self._feature_index]
+        scores = self._base + len(rows) * self._unseen + self._weights[rows].sum(axis=0)
+        probabilities = np.exp(scores - scores.max())
+        probabilities /= probabilities.sum()
+        best = int(probabilities.argmax())
+        return {
+            "health_type": self.classes[best],
+            "confidence": round(float(probabilities[best]), 3),
+            "probabilities": {name: round(float(p), 3) for name, p in zip(self.classes, probabilities)},
+            "known_features": len(rows)
+        }
+
+_model: Optional[RouterModel] = None
+_model_error: Optional[str] = None
+
+def get_router_model() -> Optional[RouterModel]:
+    """Shipped model, loaded on first use; None (logged once) if the weights file is unusable"""
+    global _model, _model_error
+    if _model is None and _model_error is None:
+        try:
+            _model = RouterModel.load()
+        except (OSError, ValueError, KeyError) as e:
+            _model_error = str(e)
+            print(f"Router model disabled, could not load {ROUTER_WEIGHTS_PATH}: {e}")
+    return _model
+
+def load_training_examples(path: str = ROUTER_TRAINING_PATH) -> List[Dict[str, str]]:
+    """Labeled queries plus every router keyword as a one-term example of its health type"""
+    examples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                examples.append(json.loads(line))
+    for vocabulary, health_type in VOCABULARY_HEALTH_TYPES.items():
+        examples.extend({"text": term, "health_type": health_type} for term in ROUTER_VOCABULARIES[vocabulary])
+    return examples
+
+def train_router_model(examples: Iterable[Dict[str, str]], alpha: float = 0.5) -> Dict[str, Any]:
+    """Weights file contents for a multinomial Naive Bayes model with additive smoothing alpha"""
+    documents: Counter = Counter()
+    feature_counts: Dict[str, Counter] = {}
+    for example in examples:
+        health_type = example["health_type"]
+        documents[health_type] += 1
+        feature_counts.setdefault(health_type, Counter()).update(query_features(example["text"]))
+
+    classes = sorted(documents)
+    vocabulary = sorted({feature for counts in feature_counts.values() for feature in counts})
+    total_documents = sum(documents.values())
+    log_prior, unseen = [], []
+    features: Dict[str, Dict[str, float]] = {feature: {} for feature in vocabulary}
+    for name in classes:
+        counts = feature_counts[name]
+        denominator = sum(counts.values()) + alpha * len(vocabulary)
+        log_prior.append(round(math.log(documents[name] / total_documents), 5))
+        unseen.append(round(math.log(alpha / denominator), 5))
+        for feature, count in counts.items():
+            features[feature][name] = round(math.log((count + alpha) / alpha), 5)
+    return {"classes": classes, "log_prior": log_prior, "unseen": unseen, "features": features}
+
+def write_router_weights(path: str = ROUTER_WEIGHTS_PATH) -> None:
+    """Train on the shipped examples and write the compact weights file"""
+    examples = load_training_examples()
+    weights = train_router_model(examples)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(weights, f, separators=(",", ":"), sort_keys=True)
+
+    model = RouterModel(weights["classes"], weights["log_prior"], weights["unseen"], weights["features"])
+    correct = sum(model.predict(example["text"])["health_type"] == example["health_type"] for example in examples)
+    print(f"Trained on {len(examples)} examples, {len(weights['features'])} features, "
+          f"training accuracy {correct / len(examples):.1%}; wrote {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+
+def benchmark_router_model(repeats: int = 2000) -> None:
+    """Per-query prediction latency"""
+    model = get_router_model()
+    queries = [
+        "Is this coral reef showing signs of bleaching?",
+        "I swam in the sea and now I have a rash",
+        "Smoke from the forest fire is making it hard to breathe, should I see a doctor?" * 3
+    ]
+    for query in queries:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            prediction = model.predict(query)
+        elapsed_us = (time.perf_counter() - start) * 1e6 / repeats
+        print(f"{elapsed_us:6.1f} us  {prediction['health_type']:<22} {prediction['confidence']:.2f}  {query[:60]}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "train":
+        write_router_weights()
+    elif len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        benchmark_router_model()
+    else:
+        print(__doc__)
@@ -1,13 +1,24 @@
-from typing import TypedDict, Optional, Any, Dict, List
+import operator
+from typing import TypedDict, Optional, Any, Dict, List, Annotated
 from langgraph.graph import MessagesState
 
+def merge_dicts(left: Optional[Dict[str, Any]], right: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """State reducer: later nodes add to and override keys instead of replacing the whole dict"""
+    return {**(left or {}), **(right or {})}
+
 class EcosyncState(TypedDict):
     """Enhanced State schema for Ecosync AI multi-agent system with health support"""
     input: str                           # User input text
-    image: Optional[str]                 # Base64 encoded image (if any)
+    image_ref: Optional[str]             # Blob store ref of the preprocessed JPEG (utils.blob_store)
+    has_image: Optional[bool]            # Whether an image was uploaded (all the router needs)
     user_city: Optional[str]             # User's city for clinic suggestions
     agent_decision: Optional[str]        # Which agent to use
+    agent_branches: Optional[List[str]]  # Agents run in parallel for cross-domain queries (empty otherwise)
+    branch_results: Annotated[List[Dict[str, Any]], operator.add]  # One entry per finished fan-out branch
     response: Optional[str]              # Final response from selected agent
     clinic_data: Optional[List[Dict]]    # Nearby clinic information
+    clinic_candidates: Optional[List[Dict]]  # Speculative clinic lookup, kept only if the answer calls for it
+    clinic_lookup_ms: Optional[float]    # Duration of the parallel clinic lookup
     health_type: Optional[str]           # Type: 'human', 'marine', 'land', 'environmental'
-    metadata: Optional[Dict[str, Any]]   # Additional metadata
\ No newline at end of file
+    metadata: Annotated[Dict[str, Any], merge_dicts]  # Router, agent and join metadata, merged across nodes
+    stream: Optional[bool]               # Stream model tokens to stream_mode="custom" consumers
\ No newline at end of file
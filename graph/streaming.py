@@ -0,0 +1,32 @@
+from typing import AsyncIterable, Iterable
+from langgraph.config import get_stream_writer
+
+def emit_delta(agent: str, text: str) -> None:
+    """
+    Send a piece of response text to graph.stream(..., stream_mode="custom") consumers
+
+    Does nothing when the node is not running inside a streaming graph run.
+    """
+    if not text:
+        return
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return  # Called outside a graph run (e.g. agent invoked directly)
+    writer({"agent": agent, "delta": text})
+
+def collect_stream(agent: str, deltas: Iterable[str]) -> str:
+    """Forward each model delta to the stream writer and return the full text"""
+    parts = []
+    for delta in deltas:
+        parts.append(delta)
+        emit_delta(agent, delta)
+    return "".join(parts).strip()
+
+async def acollect_stream(agent: str, deltas: AsyncIterable[str]) -> str:
+    """Async variant of collect_stream"""
+    parts = []
+    async for delta in deltas:
+        parts.append(delta)
+        emit_delta(agent, delta)
+    return "".join(parts).strip()
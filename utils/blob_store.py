@@ -0,0 +1,102 @@
+# utils/blob_store.py - In-process store for image bytes referenced from graph state
+"""
+Graph state holds a short content hash (image_ref) instead of the image.
+LangGraph copies state between nodes and for every streamed "values" event,
+so a multi-megabyte base64 string in state meant several copies per request;
+a 64 character ref costs nothing to copy. The bytes are stored once here and
+encoded to base64 only when the OpenRouter request body is built.
+
+The store is bounded, so a ref can outlive its bytes; get_image then raises
+ImageExpiredError and the agents ask the user to upload the image again.
+
+Eviction check:
+    python -m utils.blob_store
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+BLOB_STORE_MAX_BYTES = int(os.getenv("ECOSYNC_BLOB_STORE_MAX_BYTES", 256 * 1024 * 1024))
+
+class ImageExpiredError(LookupError):
+    """An image_ref whose bytes were evicted (or never stored in this process)"""
+
+class BlobStore:
+    """
+    Content-addressed, thread-safe bytes store bounded by total size
+
+    Identical uploads share one entry. Least recently used blobs are dropped
+    beyond max_bytes, so a ref can expire; get() then returns None.
+    """
+
+    def __init__(self, max_bytes: int = BLOB_STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._blobs: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(self, data: bytes) -> str:
+        """Store data and return its ref (sha256 hex digest)"""
+        data = bytes(data)  # No copy for bytes; snapshots bytearray/memoryview input
+        ref = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if ref in self._blobs:
+                self._blobs.move_to_end(ref)
+                return ref
+            self._blobs[ref] = data
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._blobs) > 1:
+                _, evicted = self._blobs.popitem(last=False)
+                self._size -= len(evicted)
+        return ref
+
+    def get(self, ref: Optional[str]) -> Optional[bytes]:
+        """The bytes behind ref, or None if unknown or evicted"""
+        if not ref:
+            return None
+        with self._lock:
+            data = self._blobs.get(ref)
+            if data is not None:
+                self._blobs.move_to_end(ref)
+            return data
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._blobs), "bytes": self._size}
+
+# Shared by the app and every agent in this process
+image_blob_store = BlobStore()
+
+def put_image(data: bytes) -> str:
+    """Store preprocessed image bytes; put the returned ref in EcosyncState.image_ref"""
+    return image_blob_store.put(data)
+
+def get_image(ref: Optional[str]) -> Optional[bytes]:
+    """Image bytes for an image_ref, or None without a ref; raises ImageExpiredError if they were evicted"""
+    data = image_blob_store.get(ref)
+    if ref and data is None:
+        raise ImageExpiredError(f"Image {ref[:12]} is no longer stored, it has to be uploaded again")
+    return data
+
+def check_eviction() -> None:
+    """Raise AssertionError unless evicted refs read as expired rather than as no image"""
+    store = BlobStore(max_bytes=16)
+    first = store.put(b"first image")
+    second = store.put(b"second image")
+    assert store.get(first) is None, "least recently used blob was not evicted"
+    assert store.get(second) == b"second image"
+    assert store.stats() == {"entries": 1, "bytes": len(b"second image")}
+
+    assert get_image(None) is None
+    try:
+        get_image(first)  # Evicted from its store, so unknown to the shared one too
+    except ImageExpiredError:
+        pass
+    else:
+        raise AssertionError("an evicted ref read as no image")
+    print("Blob store eviction check passed")
+
+if __name__ == "__main__":
+    check_eviction()
@@ -1,12 +1,77 @@
 # utils/clinic_finder.py - Complete Clinic Finding Utilities
+import os
 import requests
 import json
-from typing import List, Dict, Any, Optional
-import time
+from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from utils.disk_cache import DiskCache
+from utils.clinic_index import get_clinic_index
+from utils.geo import haversine_km
+from utils.overpass_stream import iter_array_items, closest_k
+from utils.rate_limiter import get_rate_limiter
+from utils.result_cache import StaleWhileRevalidateCache
+
+NOMINATIM_HOST = "nominatim.openstreetmap.org"
+NOMINATIM_SEARCH_URL = f"https://{NOMINATIM_HOST}/search"
+OVERPASS_HOST = "overpass-api.de"
+OSM_HEADERS = {"User-Agent": "EcosyncAI/1.0 (healthcare finder; educational use)"}
+
+# City coordinates barely change, so geocodes are kept for a month (unknown cities for a day)
+GEOCODE_TTL = float(os.getenv("ECOSYNC_GEOCODE_TTL", 30 * 24 * 3600))
+GEOCODE_MISS_TTL = float(os.getenv("ECOSYNC_GEOCODE_MISS_TTL", 24 * 3600))
+geocode_cache = DiskCache("geocode", ttl=GEOCODE_TTL, max_entries=5000)
+
+# Clinic results per city: fresh for 6 hours, then served stale for up to a week while refreshing
+CLINIC_CACHE_TTL = float(os.getenv("ECOSYNC_CLINIC_CACHE_TTL", 6 * 3600))
+CLINIC_CACHE_STALE_TTL = float(os.getenv("ECOSYNC_CLINIC_CACHE_STALE_TTL", 7 * 24 * 3600))
+clinic_result_cache = StaleWhileRevalidateCache(
+    "clinic_results", ttl=CLINIC_CACHE_TTL, stale_ttl=CLINIC_CACHE_STALE_TTL, max_entries=512
+)
+
+# Small shared pool for fanning out Nominatim searches
+nominatim_search_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="nominatim")
+
+SEARCH_RADIUS_KM = 15.0
+# With this many indexed facilities we skip the live Overpass/Nominatim APIs
+MIN_INDEX_RESULTS = 3
 
 def find_nearby_clinics(city: str, country: str = "India") -> List[Dict[str, Any]]:
     """
-    Find nearby clinics and hospitals using free APIs
+    Find nearby clinics and hospitals, served from the city-keyed result cache
+    
+    Fresh results are returned directly, stale ones are returned immediately
+    while a background refresh runs, and concurrent misses for the same city
+    share a single upstream lookup.
+    
+    Args:
+        city: City name to search in
+        country: Country name (default: India)
+    
+    Returns:
+        List of clinic/hospital information dictionaries
+    """
+    key = normalize_location_key(city, country)
+    clinics = clinic_result_cache.get(key, lambda: fetch_nearby_clinics(city, country), cacheable=has_live_results)
+    # Hand out copies so callers cannot modify the cached entries
+    return [dict(clinic) for clinic in clinics]
+
+def has_live_results(clinics: List[Dict[str, Any]]) -> bool:
+    """
+    Whether a lookup found anything beyond the get_default_clinics placeholders
+
+    Placeholder-only results mean the index and the live APIs came up empty
+    (often an upstream timeout), so they are not cached and the next request
+    retries the live sources.
+    """
+    return any(not clinic.get("placeholder") for clinic in clinics)
+
+def get_clinic_cache_stats() -> Dict[str, Any]:
+    """Hit/miss/refresh counters of the clinic result cache (for sizing the TTL)"""
+    return clinic_result_cache.stats()
+
+def fetch_nearby_clinics(city: str, country: str = "India") -> List[Dict[str, Any]]:
+    """
+    Find nearby clinics and hospitals using free APIs (uncached)
     
     Args:
         city: City name to search in
@@ -19,15 +84,25 @@ def find_nearby_clinics(city: str, country: str = "India") -> List[Dict[str, Any
     
     print(f"Searching for clinics in {city}, {country}...")
     
-    # Try multiple free APIs for comprehensive results
-    
-    # 1. Try Overpass API (OpenStreetMap data) - Completely free
+    # 0. Try the offline clinic index (no API calls beyond a cached geocode)
     try:
-        clinics.extend(get_clinics_from_overpass(city, country))
+        clinics.extend(get_clinics_from_index(city, country))
         if clinics:
-            print(f"Found {len(clinics)} clinics from OpenStreetMap")
+            print(f"Found {len(clinics)} clinics in the offline index")
     except Exception as e:
-        print(f"Overpass API error: {e}")
+        print(f"Clinic index error: {e}")
+    
+    # Fall back to multiple free APIs for comprehensive results
+    
+    # 1. Try Overpass API (OpenStreetMap data) - Completely free
+    if len(clinics) < MIN_INDEX_RESULTS:
+        try:
+            overpass_clinics = get_clinics_from_overpass(city, country)
+            clinics.extend(overpass_clinics)
+            if overpass_clinics:
+                print(f"Found {len(overpass_clinics)} clinics from OpenStreetMap")
+        except Exception as e:
+            print(f"Overpass API error: {e}")
     
     # 2. Try Nominatim search (Free backup)
     if len(clinics) < 3:
@@ -40,7 +115,7 @@ def find_nearby_clinics(city: str, country: str = "India") -> List[Dict[str, Any
     
     # 3. Add default/known clinics for major cities (fallback)
     if len(clinics) < 2:
-        default_clinics = get_default_clinics(city)
+        default_clinics = get_default_clinics(city, country)
         clinics.extend(default_clinics)
         print(f"Added {len(default_clinics)} default clinics")
     
@@ -55,34 +130,35 @@ def find_nearby_clinics(city: str, country: str = "India") -> List[Dict[str, Any
     
     return unique_clinics[:8]  # Return max 8 clinics
 
+def get_clinics_from_index(city: str, country: str, k: int = 10, radius_km: float = SEARCH_RADIUS_KM) -> List[Dict[str, Any]]:
+    """Nearest-k facilities around the city centre from the offline clinic index"""
+    index = get_clinic_index()
+    if index is None:
+        return []
+    
+    coordinates = get_city_coordinates(city, country)
+    if coordinates is None:
+        return []
+    
+    clinics = index.nearest(coordinates[0], coordinates[1], k=k, radius_km=radius_km)
+    for clinic in clinics:
+        if clinic["address"] == "Address not listed":
+            clinic["address"] = f"Near {city} city center"
+    return clinics
+
 def get_clinics_from_overpass(city: str, country: str) -> List[Dict[str, Any]]:
     """Get clinics from OpenStreetMap via Overpass API (completely free)"""
     try:
-        # First get city coordinates
-        nominatim_url = "https://nominatim.openstreetmap.org/search"
-        nominatim_params = {
-            "q": f"{city}, {country}",
-            "format": "json",
-            "limit": 1
-        }
-        
-        headers = {"User-Agent": "EcosyncAI/1.0 (healthcare finder; educational use)"}
-        
-        # Get city coordinates with rate limiting
-        time.sleep(1)  # Rate limiting
-        response = requests.get(nominatim_url, params=nominatim_params, headers=headers, timeout=10)
-        if response.status_code != 200:
-            return []
-        
-        locations = response.json()
-        if not locations:
+        # First get city coordinates (served from the geocode cache when possible)
+        coordinates = get_city_coordinates(city, country)
+        if coordinates is None:
             return []
         
-        lat = float(locations[0]["lat"])
-        lon = float(locations[0]["lon"])
+        lat, lon = coordinates
+        headers = OSM_HEADERS
         
         # Query Overpass API for hospitals and clinics
-        overpass_url = "https://overpass-api.de/api/interpreter"
+        overpass_url = f"https://{OVERPASS_HOST}/api/interpreter"
         
         # Search in a 15km radius around the city center
         overpass_query = f"""
@@ -100,77 +176,129 @@ def get_clinics_from_overpass(city: str, country: str) -> List[Dict[str, Any]]:
         out center meta;
         """
         
-        time.sleep(2)  # Rate limiting for Overpass API
-        response = requests.post(overpass_url, data=overpass_query, headers=headers, timeout=30)
+        get_rate_limiter(OVERPASS_HOST).acquire()  # Shared Overpass rate limit
+        response = requests.post(overpass_url, data=overpass_query, headers=headers, timeout=30, stream=True)
         
-        if response.status_code != 200:
-            return []
+        with response:
+            if response.status_code != 200:
+                return []
+            
+            # Parse the elements incrementally, keeping only the closest candidates
+            elements = iter_array_items(response.iter_content(chunk_size=65536), "elements")
+            ranked = closest_k(elements, lat, lon, 10, overpass_candidate)
         
-        data = response.json()
         clinics = []
-        
-        for element in data.get("elements", []):
-            tags = element.get("tags", {})
-            
-            # Get coordinates
-            if element["type"] == "node":
-                clinic_lat = element["lat"]
-                clinic_lon = element["lon"]
-            elif element["type"] == "way" and "center" in element:
-                clinic_lat = element["center"]["lat"]
-                clinic_lon = element["center"]["lon"]
-            else:
-                continue
-            
-            # Extract clinic information
-            name = tags.get("name", "")
-            if not name:
-                continue  # Skip facilities without names
-            
-            # Skip if name is too generic
-            generic_names = ["hospital", "clinic", "medical center", "healthcare"]
-            if name.lower() in generic_names:
-                continue
-            
-            # Get address information
-            address = format_address(tags, city)
-            
-            # Get phone number
-            phone = tags.get("phone", tags.get("contact:phone", "Contact local directory"))
-            
-            # Get website
-            website = tags.get("website", tags.get("contact:website", ""))
-            
-            # Determine facility type
-            facility_type = "Hospital"
-            if tags.get("amenity") == "clinic" or tags.get("healthcare") == "clinic":
-                facility_type = "Clinic"
-            elif tags.get("amenity") == "doctors":
-                facility_type = "Doctor's Office"
-            
-            clinic_info = {
-                "name": name,
-                "address": address,
-                "phone": clean_phone_number(phone),
-                "website": website,
-                "type": facility_type,
-                "latitude": clinic_lat,
-                "longitude": clinic_lon,
-                "rating": "N/A",  # OSM doesn't have ratings
-                "distance": calculate_distance(lat, lon, clinic_lat, clinic_lon)
-            }
-            
+        for distance, element, clinic_lat, clinic_lon in ranked:
+            clinic_info = build_clinic_record(element.get("tags", {}), clinic_lat, clinic_lon, city)
+            clinic_info["distance"] = round(distance, 2)
             clinics.append(clinic_info)
         
-        # Sort by distance (closest first)
-        clinics = sorted(clinics, key=lambda x: x["distance"])
-        
-        return clinics[:10]  # Return top 10
+        return clinics  # Top 10, closest first
         
     except Exception as e:
         print(f"Error fetching from Overpass API: {e}")
         return []
 
+def overpass_candidate(element: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """Coordinates of a named Overpass facility element, or None if it should be skipped"""
+    # Get coordinates
+    if element.get("type") == "node" and "lat" in element:
+        point = (element["lat"], element["lon"])
+    elif element.get("type") == "way" and "center" in element:
+        point = (element["center"]["lat"], element["center"]["lon"])
+    else:
+        return None
+    
+    if not has_usable_name(element.get("tags", {})):
+        return None
+    return point
+
+def has_usable_name(tags: dict) -> bool:
+    """True if the facility has a name that is not just a generic label"""
+    name = tags.get("name", "")
+    if not name:
+        return False  # Skip facilities without names
+    
+    # Skip if name is too generic
+    generic_names = ["hospital", "clinic", "medical center", "healthcare"]
+    return name.lower() not in generic_names
+
+def build_clinic_record(tags: dict, lat: float, lon: float, city: str) -> Optional[Dict[str, Any]]:
+    """
+    Turn OSM tags for a healthcare facility into a clinic dictionary
+    
+    Returns:
+        Clinic dictionary, or None for unnamed or generically named facilities
+    """
+    if not has_usable_name(tags):
+        return None
+    name = tags["name"]
+    
+    # Get phone number and website
+    phone = tags.get("phone", tags.get("contact:phone", "Contact local directory"))
+    website = tags.get("website", tags.get("contact:website", ""))
+    
+    # Determine facility type
+    facility_type = "Hospital"
+    if tags.get("amenity") == "clinic" or tags.get("healthcare") == "clinic":
+        facility_type = "Clinic"
+    elif tags.get("amenity") == "doctors":
+        facility_type = "Doctor's Office"
+    
+    return {
+        "name": name,
+        "address": format_address(tags, city),
+        "phone": clean_phone_number(phone),
+        "website": website,
+        "type": facility_type,
+        "latitude": lat,
+        "longitude": lon,
+        "rating": "N/A"  # OSM doesn't have ratings
+    }
+
+def normalize_location_key(city: str, country: str) -> str:
+    """Normalize city and country into a cache key ("  New  Delhi" -> "new delhi|india")"""
+    city_key = " ".join(city.lower().split())
+    country_key = " ".join(country.lower().split())
+    return f"{city_key}|{country_key}"
+
+def get_city_coordinates(city: str, country: str) -> Optional[Tuple[float, float]]:
+    """
+    Geocode a city with Nominatim, using the shared on-disk geocode cache
+    
+    Returns:
+        (latitude, longitude) tuple, or None if the city could not be found
+    """
+    key = normalize_location_key(city, country)
+    cached = geocode_cache.get(key)
+    if cached is not None:
+        if cached.get("lat") is None:
+            return None
+        return cached["lat"], cached["lon"]
+    
+    params = {
+        "q": f"{city}, {country}",
+        "format": "json",
+        "limit": 1
+    }
+    
+    # Only wait on the rate limiter when we actually hit Nominatim
+    get_rate_limiter(NOMINATIM_HOST).acquire()
+    response = requests.get(NOMINATIM_SEARCH_URL, params=params, headers=OSM_HEADERS, timeout=10)
+    if response.status_code != 200:
+        return None
+    
+    locations = response.json()
+    if not locations:
+        # Remember unknown cities too, but not for as long
+        geocode_cache.set(key, {"lat": None, "lon": None}, ttl=GEOCODE_MISS_TTL)
+        return None
+    
+    lat = float(locations[0]["lat"])
+    lon = float(locations[0]["lon"])
+    geocode_cache.set(key, {"lat": lat, "lon": lon})
+    return lat, lon
+
 def get_clinics_from_nominatim(city: str, country: str) -> List[Dict[str, Any]]:
     """Fallback method using Nominatim search"""
     try:
@@ -181,44 +309,18 @@ def get_clinics_from_nominatim(city: str, country: str) -> List[Dict[str, Any]]:
             f"healthcare {city} {country}"
         ]
         
-        clinics = []
-        headers = {"User-Agent": "EcosyncAI/1.0 (healthcare finder; educational use)"}
+        # Dispatch the searches concurrently; the shared Nominatim bucket paces them
+        futures = [
+            nominatim_search_pool.submit(search_nominatim_facilities, term, country)
+            for term in search_terms
+        ]
         
-        for term in search_terms:
-            time.sleep(1)  # Rate limiting
-            url = "https://nominatim.openstreetmap.org/search"
-            params = {
-                "q": term,
-                "format": "json",
-                "limit": 3,
-                "countrycodes": get_country_code(country),
-                "addressdetails": 1
-            }
-            
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                results = response.json()
-                
-                for result in results:
-                    display_name = result.get("display_name", "")
-                    
-                    # Filter for healthcare facilities
-                    if any(word in display_name.lower() for word in ["hospital", "clinic", "medical", "health"]):
-                        name = display_name.split(",")[0]
-                        
-                        # Skip generic names
-                        if len(name.strip()) > 3 and not any(generic in name.lower() for generic in ["hospital", "clinic"]):
-                            clinics.append({
-                                "name": name,
-                                "address": display_name,
-                                "phone": "Contact local directory",
-                                "website": "",
-                                "latitude": float(result["lat"]),
-                                "longitude": float(result["lon"]),
-                                "rating": "N/A",
-                                "type": "Healthcare Facility"
-                            })
+        clinics = []
+        for future in futures:  # Keep results in search-term order
+            try:
+                clinics.extend(future.result())
+            except Exception as e:
+                print(f"Nominatim search error: {e}")
         
         return clinics[:5]  # Return top 5
         
@@ -226,43 +328,81 @@ def get_clinics_from_nominatim(city: str, country: str) -> List[Dict[str, Any]]:
         print(f"Error fetching from Nominatim: {e}")
         return []
 
-def get_default_clinics(city: str) -> List[Dict[str, Any]]:
+def search_nominatim_facilities(term: str, country: str) -> List[Dict[str, Any]]:
+    """Run one Nominatim search and keep the results that look like healthcare facilities"""
+    params = {
+        "q": term,
+        "format": "json",
+        "limit": 3,
+        "countrycodes": get_country_code(country),
+        "addressdetails": 1
+    }
+    
+    get_rate_limiter(NOMINATIM_HOST).acquire()
+    response = requests.get(NOMINATIM_SEARCH_URL, params=params, headers=OSM_HEADERS, timeout=10)
+    if response.status_code != 200:
+        return []
+    
+    clinics = []
+    for result in response.json():
+        display_name = result.get("display_name", "")
+        
+        # Filter for healthcare facilities
+        if any(word in display_name.lower() for word in ["hospital", "clinic", "medical", "health"]):
+            name = display_name.split(",")[0]
+            
+            # Skip generic names
+            if len(name.strip()) > 3 and not any(generic in name.lower() for generic in ["hospital", "clinic"]):
+                clinics.append({
+                    "name": name,
+                    "address": display_name,
+                    "phone": "Contact local directory",
+                    "website": "",
+                    "latitude": float(result["lat"]),
+                    "longitude": float(result["lon"]),
+                    "rating": "N/A",
+                    "type": "Healthcare Facility"
+                })
+    
+    return clinics
+
+def get_default_clinics(city: str, country: str = "India") -> List[Dict[str, Any]]:
     """Provide default clinic suggestions for major cities"""
     
     default_clinics = {
         "delhi": [
-            {"name": "All India Institute of Medical Sciences (AIIMS)", "address": "Ansari Nagar, New Delhi - 110029", "phone": "011-26588500", "type": "Government Hospital"},
-            {"name": "Apollo Hospital", "address": "Sarita Vihar, New Delhi - 110076", "phone": "011-26925801", "type": "Private Hospital"},
-            {"name": "Max Super Speciality Hospital", "address": "1, Press Enclave Road, Saket, New Delhi - 110017", "phone": "011-26515050", "type": "Private Hospital"},
-            {"name": "Fortis Hospital", "address": "Sector B, Pocket 1, Aruna Asaf Ali Marg, Vasant Kunj, New Delhi - 110070", "phone": "011-42776222", "type": "Private Hospital"},
+            {"name": "All India Institute of Medical Sciences (AIIMS)", "address": "Ansari Nagar, New Delhi - 110029", "phone": "011-26588500", "type": "Government Hospital", "latitude": 28.5672, "longitude": 77.21},
+            {"name": "Apollo Hospital", "address": "Sarita Vihar, New Delhi - 110076", "phone": "011-26925801", "type": "Private Hospital", "latitude": 28.5402, "longitude": 77.2834},
+            {"name": "Max Super Speciality Hospital", "address": "1, Press Enclave Road, Saket, New Delhi - 110017", "phone": "011-26515050", "type": "Private Hospital", "latitude": 28.5275, "longitude": 77.2117},
+            {"name": "Fortis Hospital", "address": "Sector B, Pocket 1, Aruna Asaf Ali Marg, Vasant Kunj, New Delhi - 110070", "phone": "011-42776222", "type": "Private Hospital", "latitude": 28.5203, "longitude": 77.1588},
         ],
         "mumbai": [
-            {"name": "Tata Memorial Hospital", "address": "Dr E Borges Rd, Parel, Mumbai - 400012", "phone": "022-24177000", "type": "Government Hospital"},
-            {"name": "Kokilaben Dhirubhai Ambani Hospital", "address": "Rao Saheb Achutrao Patwardhan Marg, Four Bunglows, Andheri West, Mumbai - 400053", "phone": "022-42696969", "type": "Private Hospital"},
-            {"name": "Lilavati Hospital", "address": "A-791, Bandra Reclamation, Bandra West, Mumbai - 400050", "phone": "022-26567777", "type": "Private Hospital"},
-            {"name": "Hinduja Hospital", "address": "Veer Savarkar Marg, Mahim, Mumbai - 400016", "phone": "022-24447000", "type": "Private Hospital"},
+            {"name": "Tata Memorial Hospital", "address": "Dr E Borges Rd, Parel, Mumbai - 400012", "phone": "022-24177000", "type": "Government Hospital", "latitude": 19.0045, "longitude": 72.8434},
+            {"name": "Kokilaben Dhirubhai Ambani Hospital", "address": "Rao Saheb Achutrao Patwardhan Marg, Four Bunglows, Andheri West, Mumbai - 400053", "phone": "022-42696969", "type": "Private Hospital", "latitude": 19.1313, "longitude": 72.8252},
+            {"name": "Lilavati Hospital", "address": "A-791, Bandra Reclamation, Bandra West, Mumbai - 400050", "phone": "022-26567777", "type": "Private Hospital", "latitude": 19.051, "longitude": 72.8287},
+            {"name": "Hinduja Hospital", "address": "Veer Savarkar Marg, Mahim, Mumbai - 400016", "phone": "022-24447000", "type": "Private Hospital", "latitude": 19.0335, "longitude": 72.8384},
         ],
         "bangalore": [
-            {"name": "Manipal Hospital", "address": "98, HAL Airport Road, Kodihalli, Bengaluru - 560017", "phone": "080-25023030", "type": "Private Hospital"},
-            {"name": "Fortis Hospital", "address": "154/9, Bannerghatta Road, Opposite IIM, Bengaluru - 560076", "phone": "080-66214444", "type": "Private Hospital"},
-            {"name": "Apollo Hospital", "address": "154/11, Bannerghatta Road, Bengaluru - 560076", "phone": "080-26304050", "type": "Private Hospital"},
-            {"name": "Narayana Health", "address": "258/A, Bommasandra Industrial Area, Anekal Taluk, Bengaluru - 560099", "phone": "080-71222222", "type": "Private Hospital"},
+            {"name": "Manipal Hospital", "address": "98, HAL Airport Road, Kodihalli, Bengaluru - 560017", "phone": "080-25023030", "type": "Private Hospital", "latitude": 12.9592, "longitude": 77.6487},
+            {"name": "Fortis Hospital", "address": "154/9, Bannerghatta Road, Opposite IIM, Bengaluru - 560076", "phone": "080-66214444", "type": "Private Hospital", "latitude": 12.895, "longitude": 77.5981},
+            {"name": "Apollo Hospital", "address": "154/11, Bannerghatta Road, Bengaluru - 560076", "phone": "080-26304050", "type": "Private Hospital", "latitude": 12.8958, "longitude": 77.5989},
+            {"name": "Narayana Health", "address": "258/A, Bommasandra Industrial Area, Anekal Taluk, Bengaluru - 560099", "phone": "080-71222222", "type": "Private Hospital", "latitude": 12.8106, "longitude": 77.6946},
         ],
         "gurugram": [
-            {"name": "Medanta - The Medicity", "address": "Sector 38, Gurugram - 122001", "phone": "0124-4141414", "type": "Private Hospital"},
-            {"name": "Artemis Hospital", "address": "Sector 51, Gurugram - 122001", "phone": "0124-4511111", "type": "Private Hospital"},
-            {"name": "Fortis Memorial Research Institute", "address": "Sector 44, Gurugram - 122002", "phone": "0124-4962200", "type": "Private Hospital"},
-            {"name": "Max Hospital", "address": "Block B, Sushant Lok Phase I, Sector 43, Gurugram - 122002", "phone": "0124-4566666", "type": "Private Hospital"},
+            {"name": "Medanta - The Medicity", "address": "Sector 38, Gurugram - 122001", "phone": "0124-4141414", "type": "Private Hospital", "latitude": 28.4393, "longitude": 77.041},
+            {"name": "Artemis Hospital", "address": "Sector 51, Gurugram - 122001", "phone": "0124-4511111", "type": "Private Hospital", "latitude": 28.4313, "longitude": 77.0722},
+            {"name": "Fortis Memorial Research Institute", "address": "Sector 44, Gurugram - 122002", "phone": "0124-4962200", "type": "Private Hospital", "latitude": 28.4526, "longitude": 77.0722},
+            {"name": "Max Hospital", "address": "Block B, Sushant Lok Phase I, Sector 43, Gurugram - 122002", "phone": "0124-4566666", "type": "Private Hospital", "latitude": 28.4672, "longitude": 77.0795},
         ],
         "chennai": [
-            {"name": "Apollo Hospital", "address": "21, Greams Lane, Off Greams Road, Chennai - 600006", "phone": "044-28290200", "type": "Private Hospital"},
-            {"name": "Fortis Malar Hospital", "address": "52, 1st Main Road, Gandhi Nagar, Adyar, Chennai - 600020", "phone": "044-42894289", "type": "Private Hospital"},
-            {"name": "MIOT International", "address": "4/112, Mount Poonamalle Road, Manapakkam, Chennai - 600089", "phone": "044-42002000", "type": "Private Hospital"},
+            {"name": "Apollo Hospital", "address": "21, Greams Lane, Off Greams Road, Chennai - 600006", "phone": "044-28290200", "type": "Private Hospital", "latitude": 13.0633, "longitude": 80.2512},
+            {"name": "Fortis Malar Hospital", "address": "52, 1st Main Road, Gandhi Nagar, Adyar, Chennai - 600020", "phone": "044-42894289", "type": "Private Hospital", "latitude": 13.0086, "longitude": 80.2571},
+            {"name": "MIOT International", "address": "4/112, Mount Poonamalle Road, Manapakkam, Chennai - 600089", "phone": "044-42002000", "type": "Private Hospital", "latitude": 13.0214, "longitude": 80.186},
         ],
         "hyderabad": [
-            {"name": "Apollo Hospital", "address": "Jubilee Hills, Hyderabad - 500033", "phone": "040-23607777", "type": "Private Hospital"},
-            {"name": "CARE Hospital", "address": "Road No. 1, Banjara Hills, Hyderabad - 500034", "phone": "040-61651000", "type": "Private Hospital"},
-            {"name": "Continental Hospital", "address": "IT Park Rd, Nanakramguda, Gachibowli, Hyderabad - 500032", "phone": "040-67000000", "type": "Private Hospital"},
+            {"name": "Apollo Hospital", "address": "Jubilee Hills, Hyderabad - 500033", "phone": "040-23607777", "type": "Private Hospital", "latitude": 17.4155, "longitude": 78.4128},
+            {"name": "CARE Hospital", "address": "Road No. 1, Banjara Hills, Hyderabad - 500034", "phone": "040-61651000", "type": "Private Hospital", "latitude": 17.413, "longitude": 78.4478},
+            {"name": "Continental Hospital", "address": "IT Park Rd, Nanakramguda, Gachibowli, Hyderabad - 500032", "phone": "040-67000000", "type": "Private Hospital", "latitude": 17.4177, "longitude": 78.3396},
         ]
     }
     
@@ -273,13 +413,15 @@ def get_default_clinics(city: str) -> List[Dict[str, Any]]:
                 **clinic,
                 "website": "",
                 "rating": "4.2",  # Average rating for known hospitals
-                "latitude": 0,
-                "longitude": 0
+                "placeholder": True
             }
             for clinic in default_clinics[city_lower]
         ]
     
-    # Generic suggestions for unknown cities
+    # Generic suggestions for unknown cities, placed at the city centre if we have geocoded it
+    cached = geocode_cache.get(normalize_location_key(city, country)) or {}
+    center_lat = cached.get("lat") or 0
+    center_lon = cached.get("lon") or 0
     return [
         {
             "name": f"City General Hospital - {city}",
@@ -288,8 +430,9 @@ def get_default_clinics(city: str) -> List[Dict[str, Any]]:
             "website": "",
             "rating": "N/A",
             "type": "General Hospital",
-            "latitude": 0,
-            "longitude": 0
+            "latitude": center_lat,
+            "longitude": center_lon,
+            "placeholder": True
         },
         {
             "name": f"Primary Health Centre - {city}",
@@ -298,8 +441,9 @@ def get_default_clinics(city: str) -> List[Dict[str, Any]]:
             "website": "",
             "rating": "N/A", 
             "type": "Primary Health Centre",
-            "latitude": 0,
-            "longitude": 0
+            "latitude": center_lat,
+            "longitude": center_lon,
+            "placeholder": True
         }
     ]
 
@@ -322,8 +466,10 @@ def format_address(tags: dict, city: str) -> str:
         return ", ".join(address_parts)
     elif tags.get("addr:full"):
         return tags["addr:full"]
-    else:
+    elif city:
         return f"Near {city} city center"
+    else:
+        return "Address not listed"
 
 def clean_phone_number(phone: str) -> str:
     """Clean and format phone numbers"""
@@ -346,8 +492,8 @@ def get_country_code(country: str) -> str:
     return country_codes.get(country.lower(), "")
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate approximate distance between two points (simplified)"""
-    return abs(lat1 - lat2) + abs(lon1 - lon2)
+    """Great-circle distance between two points in kilometres"""
+    return float(haversine_km(lat1, lon1, lat2, lon2))
 
 # Test function
 def test_clinic_finder():
@@ -0,0 +1,309 @@
+# utils/clinic_index.py - Offline spatial index of healthcare facilities
+"""
+Build and query a compact on-disk index of hospitals, clinics and doctors.
+
+The index is a directory holding:
+    manifest.json      - format version, facility count and grid cell size
+    coords.f32         - float32 (lat, lon) pairs, memory-mapped, sorted by grid cell
+    cells.npz          - sorted grid cell ids and the offset where each cell starts
+    facilities.jsonl   - one JSON record (name, address, phone, ...) per facility
+    offsets.u64        - byte offset of each record in facilities.jsonl
+
+Because coordinates are sorted by grid cell, every row of cells covered by a
+search radius maps to one contiguous slice of coords.f32, so a nearest-k query
+touches only a few small slices and reads just the k winning records.
+
+Build from Overpass JSON dumps or OSM XML extracts:
+    python -m utils.clinic_index build data/clinic_index dumps/*.json extracts/*.osm
+"""
+import os
+import json
+import math
+import time
+import argparse
+import threading
+import xml.etree.ElementTree as ET
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+import numpy as np
+
+from utils.geo import haversine_km, top_k_indices
+
+INDEX_VERSION = 1
+DEFAULT_CELL_SIZE = 0.1  # degrees (~11km of latitude)
+DEFAULT_INDEX_DIR = os.getenv(
+    "ECOSYNC_CLINIC_INDEX",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "clinic_index")
+)
+
+HEALTHCARE_TAGS = {
+    "amenity": {"hospital", "clinic", "doctors"},
+    "healthcare": {"hospital", "clinic"}
+}
+
+def is_healthcare_facility(tags: Dict[str, str]) -> bool:
+    """True if the OSM tags describe a hospital, clinic or doctor's office"""
+    return any(tags.get(key) in values for key, values in HEALTHCARE_TAGS.items())
+
+class ClinicIndex:
+    """Read-only, memory-mapped nearest-k index over healthcare facilities"""
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported clinic index version: {manifest.get('version')}")
+
+        self.index_dir = index_dir
+        self.count = manifest["count"]
+        self.cell_size = manifest["cell_size"]
+        self.n_cols = int(math.ceil(360.0 / self.cell_size))
+
+        if self.count:
+            self.coords = np.memmap(os.path.join(index_dir, "coords.f32"), dtype=np.float32,
+                                    mode="r", shape=(self.count, 2))
+            self.offsets = np.memmap(os.path.join(index_dir, "offsets.u64"), dtype=np.uint64,
+                                     mode="r", shape=(self.count,))
+        else:
+            self.coords = np.empty((0, 2), dtype=np.float32)
+            self.offsets = np.empty(0, dtype=np.uint64)
+
+        cells = np.load(os.path.join(index_dir, "cells.npz"))
+        self.cell_keys = cells["keys"]
+        self.cell_starts = cells["starts"]
+
+        self._records_path = os.path.join(index_dir, "facilities.jsonl")
+        self._records_lock = threading.Lock()
+        self._records_file = open(self._records_path, "rb")
+
+    def _cell_row_col(self, lat: float, lon: float) -> Tuple[int, int]:
+        row = int(math.floor((lat + 90.0) / self.cell_size))
+        col = int(math.floor((lon + 180.0) / self.cell_size))
+        return row, col
+
+    def _candidate_indices(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Indices of facilities in the grid cells overlapping the search radius"""
+        dlat = radius_km / 111.0
+        dlon = radius_km / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+
+        row_min, col_min = self._cell_row_col(lat - dlat, lon - dlon)
+        row_max, col_max = self._cell_row_col(lat + dlat, lon + dlon)
+        col_min = max(col_min, 0)
+        col_max = min(col_max, self.n_cols - 1)
+
+        slices = []
+        for row in range(row_min, row_max + 1):
+            first_key = row * self.n_cols + col_min
+            last_key = row * self.n_cols + col_max
+            lo = np.searchsorted(self.cell_keys, first_key, side="left")
+            hi = np.searchsorted(self.cell_keys, last_key, side="right")
+            if lo < hi:
+                slices.append(np.arange(self.cell_starts[lo], self.cell_starts[hi]))
+        if not slices:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate(slices)
+
+    def nearest(self, lat: float, lon: float, k: int = 10, radius_km: float = 15.0) -> List[Dict[str, Any]]:
+        """
+        Return up to k facilities within radius_km of (lat, lon), closest first
+
+        Each record carries a "distance" in kilometres.
+        """
+        candidates = self._candidate_indices(lat, lon, radius_km)
+        if len(candidates) == 0:
+            return []
+
+        points = self.coords[candidates]
+        distances = haversine_km(lat, lon, points[:, 0], points[:, 1])
+        within = distances <= radius_km
+        candidates = candidates[within]
+        distances = distances[within]
+
+        results = []
+        for i in top_k_indices(distances, k):
+            record = self._read_record(int(candidates[i]))
+            record["distance"] = round(float(distances[i]), 2)
+            results.append(record)
+        return results
+
+    def _read_record(self, position: int) -> Dict[str, Any]:
+        """Read a single facility record without loading the whole file"""
+        with self._records_lock:
+            self._records_file.seek(int(self.offsets[position]))
+            line = self._records_file.readline()
+        return json.loads(line)
+
+_index = None
+_index_checked = False
+_index_lock = threading.Lock()
+
+def get_clinic_index(index_dir: Optional[str] = None) -> Optional[ClinicIndex]:
+    """
+    Return the shared clinic index, or None if no index has been built
+
+    The default index is opened once per process and reused.
+    """
+    global _index, _index_checked
+    if index_dir is not None:
+        return ClinicIndex(index_dir)
+
+    with _index_lock:
+        if not _index_checked:
+            _index_checked = True
+            if os.path.exists(os.path.join(DEFAULT_INDEX_DIR, "manifest.json")):
+                try:
+                    _index = ClinicIndex(DEFAULT_INDEX_DIR)
+                    print(f"Loaded clinic index with {_index.count} facilities")
+                except Exception as e:
+                    print(f"Could not load clinic index: {e}")
+    return _index
+
+# ---------------------------------------------------------------------------
+# Offline build step
+# ---------------------------------------------------------------------------
+
+def iter_overpass_elements(path: str) -> Iterator[Tuple[Dict[str, str], float, float]]:
+    """Yield (tags, lat, lon) for healthcare elements in an Overpass JSON dump"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    for element in data.get("elements", []):
+        tags = element.get("tags", {})
+        if not is_healthcare_facility(tags):
+            continue
+        if element.get("type") == "node" and "lat" in element:
+            yield tags, element["lat"], element["lon"]
+        elif "center" in element:
+            yield tags, element["center"]["lat"], element["center"]["lon"]
+
+def iter_osm_xml_elements(path: str) -> Iterator[Tuple[Dict[str, str], float, float]]:
+    """
+    Yield (tags, lat, lon) for healthcare nodes and ways in an OSM XML extract
+
+    Ways are placed at the mean of their node coordinates, so node positions
+    are kept in memory while streaming the file.
+    """
+    node_coords: Dict[str, Tuple[float, float]] = {}
+
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if elem.tag == "node":
+            lat, lon = float(elem.get("lat")), float(elem.get("lon"))
+            node_coords[elem.get("id")] = (lat, lon)
+            tags = {tag.get("k"): tag.get("v") for tag in elem.findall("tag")}
+            if is_healthcare_facility(tags):
+                yield tags, lat, lon
+            elem.clear()
+        elif elem.tag == "way":
+            tags = {tag.get("k"): tag.get("v") for tag in elem.findall("tag")}
+            if is_healthcare_facility(tags):
+                points = [node_coords[nd.get("ref")] for nd in elem.findall("nd")
+                          if nd.get("ref") in node_coords]
+                if points:
+                    yield (tags,
+                           sum(p[0] for p in points) / len(points),
+                           sum(p[1] for p in points) / len(points))
+            elem.clear()
+        elif elem.tag == "relation":
+            elem.clear()
+
+def build_clinic_index(sources: List[str], index_dir: str = DEFAULT_INDEX_DIR,
+                       cell_size: float = DEFAULT_CELL_SIZE) -> int:
+    """
+    Build the on-disk clinic index from Overpass JSON dumps and/or OSM XML files
+
+    Args:
+        sources: Paths to *.json (Overpass output) or *.osm (OSM XML) files
+        index_dir: Output directory
+        cell_size: Grid cell size in degrees
+
+    Returns:
+        Number of facilities indexed
+    """
+    # Imported here to keep the query path free of the clinic finder module
+    from utils.clinic_finder import build_clinic_record
+
+    records = []
+    seen = set()
+    for path in sources:
+        if path.endswith(".json"):
+            elements = iter_overpass_elements(path)
+        else:
+            elements = iter_osm_xml_elements(path)
+
+        for tags, lat, lon in elements:
+            record = build_clinic_record(tags, lat, lon, tags.get("addr:city", ""))
+            if record is None:
+                continue
+            # Same facility from overlapping dumps
+            dedupe_key = (record["name"].lower(), round(lat, 4), round(lon, 4))
+            if dedupe_key in seen:
+                continue
+            seen.add(dedupe_key)
+            records.append(record)
+        print(f"Read {path}: {len(records)} facilities so far")
+
+    os.makedirs(index_dir, exist_ok=True)
+    n_cols = int(math.ceil(360.0 / cell_size))
+
+    lats = np.array([r["latitude"] for r in records], dtype=np.float64)
+    lons = np.array([r["longitude"] for r in records], dtype=np.float64)
+    rows = np.floor((lats + 90.0) / cell_size).astype(np.int64)
+    cols = np.floor((lons + 180.0) / cell_size).astype(np.int64)
+    cell_ids = rows * n_cols + cols
+    order = np.argsort(cell_ids, kind="stable")
+
+    coords = np.column_stack([lats[order], lons[order]]).astype(np.float32)
+    coords.tofile(os.path.join(index_dir, "coords.f32"))
+
+    sorted_ids = cell_ids[order]
+    keys, starts = np.unique(sorted_ids, return_index=True)
+    # Trailing sentinel so cell i spans starts[i]:starts[i + 1]
+    starts = np.append(starts, len(records)).astype(np.int64)
+    np.savez(os.path.join(index_dir, "cells.npz"), keys=keys, starts=starts)
+
+    offsets = np.zeros(len(records), dtype=np.uint64)
+    with open(os.path.join(index_dir, "facilities.jsonl"), "wb") as f:
+        for position, record_index in enumerate(order):
+            offsets[position] = f.tell()
+            f.write(json.dumps(records[record_index], ensure_ascii=False).encode("utf-8") + b"\n")
+    offsets.tofile(os.path.join(index_dir, "offsets.u64"))
+
+    with open(os.path.join(index_dir, "manifest.json"), "w") as f:
+        json.dump({
+            "version": INDEX_VERSION,
+            "count": len(records),
+            "cell_size": cell_size,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "sources": [os.path.basename(p) for p in sources]
+        }, f, indent=2)
+
+    print(f"Built clinic index with {len(records)} facilities in {index_dir}")
+    return len(records)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the offline clinic index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build the index from OSM data")
+    build_parser.add_argument("index_dir")
+    build_parser.add_argument("sources", nargs="+", help="Overpass *.json dumps or *.osm extracts")
+    build_parser.add_argument("--cell-size", type=float, default=DEFAULT_CELL_SIZE)
+
+    query_parser = subparsers.add_parser("query", help="Query an existing index")
+    query_parser.add_argument("index_dir")
+    query_parser.add_argument("lat", type=float)
+    query_parser.add_argument("lon", type=float)
+    query_parser.add_argument("-k", type=int, default=10)
+    query_parser.add_argument("--radius", type=float, default=15.0)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        build_clinic_index(args.sources, args.index_dir, args.cell_size)
+    else:
+        index = get_clinic_index(args.index_dir)
+        start = time.perf_counter()
+        results = index.nearest(args.lat, args.lon, k=args.k, radius_km=args.radius)
+        elapsed_us = (time.perf_counter() - start) * 1e6
+        for clinic in results:
+            print(f"- {clinic['name']} ({clinic['distance']} km): {clinic['phone']}")
+        print(f"{len(results)} results in {elapsed_us:.0f} µs")
@@ -0,0 +1,143 @@
+# utils/disk_cache.py - Small SQLite-backed cache shared across sessions and processes
+import os
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# All on-disk caches live under one directory so they are easy to wipe or mount
+CACHE_DIR = os.getenv(
+    "ECOSYNC_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+)
+
+class DiskCache:
+    """
+    Key/value cache stored in a SQLite file with per-entry TTL and LRU eviction.
+
+    SQLite handles locking between processes, so every Streamlit session and
+    worker process pointing at the same file shares the same entries. Values
+    must be JSON serializable.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int, path: Optional[str] = None):
+        """
+        Args:
+            name: Cache name, used as the table name and default file name
+            ttl: Default time-to-live for entries in seconds
+            max_entries: Entries kept before least recently used ones are evicted
+            path: SQLite file path (default: CACHE_DIR/<name>.sqlite3)
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path or os.path.join(CACHE_DIR, f"{name}.sqlite3")
+        self._local = threading.local()
+        self._hits = 0
+        self._misses = 0
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS {self.name} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.name}_last_access ON {self.name} (last_access)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection (sqlite3 connections are not thread-safe)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    f"SELECT value, expires_at FROM {self.name} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self._misses += 1
+                    return None
+                if row[1] <= now:
+                    conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+                    self._misses += 1
+                    return None
+                conn.execute(
+                    f"UPDATE {self.name} SET last_access = ? WHERE key = ?", (now, key)
+                )
+            self._hits += 1
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            print(f"{self.name} cache read error: {e}")
+            self._misses += 1
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value under key, evicting least recently used entries when full"""
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.name} (key, value, expires_at, last_access) "
+                    f"VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), expires_at, now)
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"{self.name} cache write error: {e}")
+
+    def delete(self, key: str) -> None:
+        """Remove a single entry"""
+        try:
+            with self._connect() as conn:
+                conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            print(f"{self.name} cache delete error: {e}")
+
+    def clear(self) -> None:
+        """Remove every entry"""
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.name}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop expired entries, then the least recently used ones above max_entries"""
+        count = conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        conn.execute(f"DELETE FROM {self.name} WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            f"""DELETE FROM {self.name} WHERE key IN (
+                SELECT key FROM {self.name} ORDER BY last_access ASC
+                LIMIT MAX(0, (SELECT COUNT(*) FROM {self.name}) - ?)
+            )""",
+            (self.max_entries,)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus the current entry count"""
+        try:
+            entries = self._connect().execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "entries": entries
+        }
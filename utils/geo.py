@@ -0,0 +1,39 @@
+# utils/geo.py - Vectorized geographic helpers shared by the clinic finder and index
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+def haversine_km(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """
+    Great-circle distance in kilometres from one point to many points
+
+    Args:
+        lat, lon: Origin coordinates in degrees
+        lats, lons: Array-likes of destination coordinates in degrees
+
+    Returns:
+        float64 array of distances, same shape as lats/lons
+    """
+    lat1 = np.radians(lat)
+    lon1 = np.radians(lon)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lons, dtype=np.float64))
+
+    a = (np.sin((lat2 - lat1) / 2.0) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2)
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def top_k_indices(distances: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k smallest distances, closest first
+
+    Uses argpartition so only the k winners are sorted, not the whole array.
+    """
+    n = len(distances)
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        candidates = np.argpartition(distances, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    return candidates[np.argsort(distances[candidates], kind="stable")]
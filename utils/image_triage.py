@@ -0,0 +1,223 @@
+# utils/image_triage.py - Fast CPU marine/land triage for images the router cannot place from text
+"""
+Colour and texture histograms of a small thumbnail scored by a logistic
+model. A preprocessed upload is classified in a few milliseconds, so the
+router can pick the right vision agent before spending a vision call.
+
+Features (FEATURE_NAMES): a 12-bin hue histogram of the colourful pixels,
+3 saturation and 3 brightness bins, and horizontal/vertical gradient energy
+of the grayscale thumbnail. The model is stored in data/triage_weights.json
+as standardization mean/scale, weights and bias; a positive score means
+marine.
+
+The shipped weights are hand-set colour priors, so routing ignores triage
+unless ECOSYNC_IMAGE_TRIAGE=1; turn it on once weights fitted on labeled
+photos are installed.
+
+Refit on labeled photos and measure latency:
+    python -m utils.image_triage train <marine_dir> <land_dir>
+    python -m utils.image_triage benchmark [photo.jpg ...]
+"""
+import os
+import sys
+import json
+import time
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+TRIAGE_WEIGHTS_PATH = os.getenv(
+    "ECOSYNC_TRIAGE_WEIGHTS",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "triage_weights.json")
+)
+# Off until data/triage_weights.json holds fitted weights rather than the colour priors
+IMAGE_TRIAGE_ROUTING = os.getenv("ECOSYNC_IMAGE_TRIAGE", "0") == "1"
+TRIAGE_MIN_CONFIDENCE = float(os.getenv("ECOSYNC_TRIAGE_MIN_CONFIDENCE", 0.6))
+TRIAGE_BUDGET_MS = float(os.getenv("ECOSYNC_TRIAGE_BUDGET_MS", 10))
+THUMBNAIL_SIDE = 64
+HUE_BINS = 12
+
+FEATURE_NAMES = (
+    [f"hue_{bin * 360 // HUE_BINS}" for bin in range(HUE_BINS)]
+    + ["saturation_low", "saturation_mid", "saturation_high"]
+    + ["value_low", "value_mid", "value_high"]
+    + ["gradient_x", "gradient_y"]
+)
+
+def image_features(image_bytes: bytes) -> np.ndarray:
+    """Feature vector (see FEATURE_NAMES) of an encoded image"""
+    image = Image.open(BytesIO(image_bytes))
+    image.draft("RGB", (THUMBNAIL_SIDE, THUMBNAIL_SIDE))  # JPEG: decode at 1/2-1/8 scale
+    image = image.convert("RGB")
+    image.thumbnail((THUMBNAIL_SIDE, THUMBNAIL_SIDE), Image.Resampling.BILINEAR)
+
+    hsv = np.asarray(image.convert("HSV"), dtype=np.float32) / 255.0
+    hue, saturation, value = hsv[..., 0].ravel(), hsv[..., 1].ravel(), hsv[..., 2].ravel()
+    pixels = hue.size
+
+    # Hue only means something for saturated, reasonably bright pixels
+    colourful = (saturation > 0.2) & (value > 0.15)
+    hue_bins = np.minimum((hue[colourful] * HUE_BINS).astype(np.int64), HUE_BINS - 1)
+    hue_hist = np.bincount(hue_bins, minlength=HUE_BINS) / pixels
+    saturation_hist = np.histogram(saturation, bins=3, range=(0, 1))[0] / pixels
+    value_hist = np.histogram(value, bins=3, range=(0, 1))[0] / pixels
+
+    gray = np.asarray(image.convert("L"), dtype=np.float32) / 255.0
+    gradient_x = np.abs(np.diff(gray, axis=1)).mean() if gray.shape[1] > 1 else 0.0
+    gradient_y = np.abs(np.diff(gray, axis=0)).mean() if gray.shape[0] > 1 else 0.0
+
+    return np.concatenate([hue_hist, saturation_hist, value_hist, [gradient_x, gradient_y]]).astype(np.float32)
+
+class TriageModel:
+    """Standardized logistic regression over image_features"""
+
+    def __init__(self, mean, scale, weights, bias: float, labels=("land", "marine")):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = float(bias)
+        self.labels = tuple(labels)
+        if not (len(self.mean) == len(self.scale) == len(self.weights) == len(FEATURE_NAMES)):
+            raise ValueError(f"Triage model needs {len(FEATURE_NAMES)} features, got {len(self.weights)}")
+
+    @classmethod
+    def load(cls, path: str = TRIAGE_WEIGHTS_PATH) -> "TriageModel":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["mean"], data["scale"], data["weights"], data["bias"], data.get("labels", ("land", "marine")))
+
+    def save(self, path: str, notes: Optional[str] = None) -> None:
+        data = {
+            "features": FEATURE_NAMES,
+            "labels": list(self.labels),
+            "mean": [round(float(x), 6) for x in self.mean],
+            "scale": [round(float(x), 6) for x in self.scale],
+            "weights": [round(float(x), 6) for x in self.weights],
+            "bias": round(self.bias, 6)
+        }
+        if notes:
+            data["notes"] = notes
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+    def probability(self, features: np.ndarray) -> np.ndarray:
+        """P(labels[1]) for one feature vector or a matrix of them"""
+        score = ((features - self.mean) / self.scale) @ self.weights + self.bias
+        return 1.0 / (1.0 + np.exp(-score))
+
+_model: Optional[TriageModel] = None
+_model_error: Optional[str] = None
+
+def get_triage_model() -> Optional[TriageModel]:
+    """Shipped model, loaded on first use; None (logged once) if the weights file is unusable"""
+    global _model, _model_error
+    if _model is None and _model_error is None:
+        try:
+            _model = TriageModel.load()
+        except (OSError, ValueError, KeyError) as e:
+            _model_error = str(e)
+            print(f"Image triage disabled, could not load {TRIAGE_WEIGHTS_PATH}: {e}")
+    return _model
+
+def triage_image(image_bytes: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    """
+    Classify an image as marine or land
+
+    Returns:
+        Dict with label, confidence (probability of that label), confident
+        (confidence >= TRIAGE_MIN_CONFIDENCE) and elapsed_ms; None when there
+        is no image, it cannot be decoded or no model is available
+    """
+    model = get_triage_model()
+    if model is None or not image_bytes:
+        return None
+    start = time.perf_counter()
+    try:
+        features = image_features(image_bytes)
+    except Exception as e:
+        print(f"Image triage could not read the image: {e}")
+        return None
+    probability = float(model.probability(features))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if elapsed_ms > TRIAGE_BUDGET_MS:
+        print(f"Image triage took {elapsed_ms:.1f} ms (budget {TRIAGE_BUDGET_MS:.0f} ms)")
+
+    label = model.labels[1] if probability >= 0.5 else model.labels[0]
+    confidence = probability if probability >= 0.5 else 1.0 - probability
+    return {
+        "label": label,
+        "confidence": round(confidence, 3),
+        "confident": confidence >= TRIAGE_MIN_CONFIDENCE,
+        "elapsed_ms": round(elapsed_ms, 2)
+    }
+
+def _image_paths(directory: str) -> List[str]:
+    extensions = (".jpg", ".jpeg", ".png", ".webp")
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith(extensions)
+    )
+
+def train_triage_model(marine_dir: str, land_dir: str, path: str = TRIAGE_WEIGHTS_PATH,
+                       l2: float = 1e-2, epochs: int = 2000, learning_rate: float = 0.1) -> TriageModel:
+    """Fit the logistic model on two folders of labeled photos and write the weights file"""
+    rows, targets = [], []
+    for directory, target in ((marine_dir, 1.0), (land_dir, 0.0)):
+        for image_path in _image_paths(directory):
+            with open(image_path, "rb") as f:
+                rows.append(image_features(f.read()))
+            targets.append(target)
+    if not rows or min(targets) == max(targets):
+        raise ValueError("Need labeled images in both folders")
+    x = np.stack(rows).astype(np.float64)
+    y = np.array(targets)
+
+    mean = x.mean(axis=0)
+    scale = x.std(axis=0) + 1e-6
+    z = (x - mean) / scale
+    weights = np.zeros(z.shape[1])
+    bias = 0.0
+    for _ in range(epochs):  # Full-batch gradient descent; a few hundred samples train in seconds
+        error = 1.0 / (1.0 + np.exp(-(z @ weights + bias))) - y
+        weights -= learning_rate * (z.T @ error / len(y) + l2 * weights)
+        bias -= learning_rate * error.mean()
+
+    model = TriageModel(mean, scale, weights, bias)
+    accuracy = float(((model.probability(x.astype(np.float32)) >= 0.5) == (y == 1.0)).mean())
+    print(f"Trained on {int(y.sum())} marine and {int(len(y) - y.sum())} land images, "
+          f"training accuracy {accuracy:.1%}")
+    model.save(path, notes=f"Trained on {marine_dir} and {land_dir}")
+    return model
+
+def benchmark_triage(paths: Optional[List[str]] = None, repeats: int = 50) -> None:
+    """Per-image triage latency on photos (or a synthetic preprocessed upload)"""
+    if paths:
+        images = []
+        for image_path in paths:
+            with open(image_path, "rb") as f:
+                images.append((image_path, f.read()))
+    else:
+        from utils.image_utils import preprocess_image
+        rng = np.random.default_rng(0)
+        pixels = rng.integers(0, 255, (3000, 4000, 3), dtype=np.uint8)
+        buffered = BytesIO()
+        Image.fromarray(pixels).save(buffered, format="JPEG", quality=90)
+        images = [("synthetic 12MP upload, preprocessed", preprocess_image(buffered.getvalue())["jpeg"])]
+
+    for name, data in images:
+        triage_image(data)  # Warm-up: model load
+        start = time.perf_counter()
+        for _ in range(repeats):
+            result = triage_image(data)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / repeats
+        print(f"{name}: {result['label'] if result else None} "
+              f"({result['confidence'] if result else '-'}) in {elapsed_ms:.2f} ms")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "train":
+        train_triage_model(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) >= 2 and sys.argv[1] == "benchmark":
+        benchmark_triage(sys.argv[2:] or None)
+    else:
+        print(__doc__)
@@ -1,4 +1,145 @@
 # Image processing tools
+"""
+Uploads are shrunk before they reach a vision model. The models downscale
+anything larger than about VISION_MAX_SIDE pixels themselves, so sending a
+12MP photo only costs upload time, base64 memory and request latency.
+
+Benchmark against the old full-resolution re-encode:
+    python -m utils.image_utils [photo.jpg]
+"""
+import os
+import sys
+import time
+import base64
+from io import BytesIO
+from typing import Any, Dict, Optional
+
+from PIL import Image, ImageOps
+
+VISION_MAX_SIDE = int(os.getenv("ECOSYNC_VISION_MAX_SIDE", 1024))           # Pixels, longest side
+VISION_BYTE_BUDGET = int(os.getenv("ECOSYNC_VISION_BYTE_BUDGET", 200_000))  # Bytes of JPEG
+MAX_QUALITY = 90
+MIN_QUALITY = 40
+
 async def read_image_as_bytes(upload_file):
     contents = await upload_file.read()
     return contents
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    """Flatten transparency onto white and convert any mode JPEG cannot store"""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    return image
+
+def _encode_jpeg(image: Image.Image, quality: int) -> bytes:
+    buffered = BytesIO()
+    image.save(buffered, format="JPEG", quality=quality, optimize=True)
+    return buffered.getvalue()
+
+def _encode_within_budget(image: Image.Image, byte_budget: int):
+    """Highest JPEG quality that fits the budget (binary search), or None if none does"""
+    data = _encode_jpeg(image, MAX_QUALITY)
+    if len(data) <= byte_budget:
+        return data, MAX_QUALITY  # Common case once downsampled: one encode
+    low, high = MIN_QUALITY, MAX_QUALITY - 1
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        data = _encode_jpeg(image, quality)
+        if len(data) <= byte_budget:
+            best = (data, quality)
+            low = quality + 1
+        else:
+            high = quality - 1
+    return best
+
+def preprocess_image(data: bytes, max_side: int = VISION_MAX_SIDE,
+                     byte_budget: int = VISION_BYTE_BUDGET) -> Dict[str, Any]:
+    """
+    Prepare uploaded image bytes for a vision model
+
+    Applies the EXIF orientation, converts to RGB (flattening transparency),
+    downsamples to max_side and encodes as JPEG at the highest quality that
+    fits byte_budget. JPEG sources are decoded with draft(), which lets the
+    decoder scale by 1/2, 1/4 or 1/8 so the full-resolution bitmap is never
+    built.
+
+    Returns:
+        Dict with jpeg (bytes), width, height, quality and the original
+        width/height/format/mode
+    """
+    image = Image.open(BytesIO(data))
+    original = {
+        "original_width": image.size[0],
+        "original_height": image.size[1],
+        "original_format": image.format,
+        "original_mode": image.mode
+    }
+
+    if image.format == "JPEG":
+        image.draft("RGB", (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    image = _to_rgb(image)
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    encoded = _encode_within_budget(image, byte_budget)
+    while encoded is None and max(image.size) > 256:
+        # Even the lowest quality is too big: shrink further
+        image = image.resize((image.size[0] * 3 // 4, image.size[1] * 3 // 4), Image.Resampling.LANCZOS)
+        encoded = _encode_within_budget(image, byte_budget)
+    jpeg, quality = encoded if encoded else (_encode_jpeg(image, MIN_QUALITY), MIN_QUALITY)
+
+    return {
+        "jpeg": jpeg,
+        "width": image.size[0],
+        "height": image.size[1],
+        "quality": quality,
+        **original
+    }
+
+def image_to_base64(data: bytes) -> str:
+    """Base64 text of (already preprocessed) image bytes for a data: URL"""
+    return base64.b64encode(data).decode("ascii")
+
+def benchmark_preprocessing(path: Optional[str] = None) -> None:
+    """Compare payload size and time of a full-resolution re-encode with preprocess_image"""
+    if path:
+        with open(path, "rb") as f:
+            data = f.read()
+    else:
+        # 12MP synthetic photo with enough texture to compress like a real one
+        import numpy as np
+        rng = np.random.default_rng(0)
+        yy, xx = np.mgrid[0:3000, 0:4000]
+        pixels = np.stack([(xx // 7) % 256, (yy // 5) % 256, (xx + yy) // 30 % 256], axis=-1)
+        pixels = (pixels + rng.integers(0, 40, pixels.shape)).clip(0, 255).astype(np.uint8)
+        buffered = BytesIO()
+        Image.fromarray(pixels).save(buffered, format="JPEG", quality=92)
+        data = buffered.getvalue()
+
+    start = time.perf_counter()
+    image = Image.open(BytesIO(data))
+    buffered = BytesIO()
+    image.convert("RGB").save(buffered, format="JPEG")
+    full_b64 = base64.b64encode(buffered.getvalue())
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prepared = preprocess_image(data)
+    small_b64 = image_to_base64(prepared["jpeg"])
+    small_time = time.perf_counter() - start
+
+    print(f"Source: {prepared['original_width']}x{prepared['original_height']} {prepared['original_format']}, "
+          f"{len(data) / 1e6:.2f} MB")
+    print(f"Full re-encode:   {len(full_b64) / 1e6:6.2f} MB base64 in {full_time * 1000:6.0f} ms")
+    print(f"preprocess_image: {len(small_b64) / 1e6:6.2f} MB base64 in {small_time * 1000:6.0f} ms "
+          f"({prepared['width']}x{prepared['height']}, quality {prepared['quality']})")
+
+if __name__ == "__main__":
+    benchmark_preprocessing(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,47 @@
+# utils/latency.py - Rolling per-model latency history
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+WINDOW_SIZE = 200
+
+class LatencyWindow:
+    """The last WINDOW_SIZE latency samples (seconds) of one model and phase"""
+
+    def __init__(self, size: int = WINDOW_SIZE):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q-th percentile (0-100) of the window, or None while it is empty"""
+        with self._lock:
+            if not self._samples:
+                return None
+            samples = np.fromiter(self._samples, dtype=np.float64, count=len(self._samples))
+        return float(np.percentile(samples, q))
+
+# (model, phase) -> window; phase is "response" for whole completions, "first_token" for streams
+_windows: Dict[Tuple[str, str], LatencyWindow] = {}
+_windows_lock = threading.Lock()
+
+def latency_window(model: str, phase: str) -> LatencyWindow:
+    """Shared window for a model and phase, created on first use"""
+    key = (model, phase)
+    window = _windows.get(key)
+    if window is None:
+        with _windows_lock:
+            window = _windows.setdefault(key, LatencyWindow())
+    return window
+
+def record_latency(model: str, phase: str, seconds: float) -> None:
+    """Add one latency sample for a model"""
+    latency_window(model, phase).record(seconds)
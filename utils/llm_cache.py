@@ -0,0 +1,68 @@
+# utils/llm_cache.py - Disk-backed cache of successful LLM responses
+import os
+import json
+import base64
+import hashlib
+from typing import Any, Dict, Optional, Union
+from utils.disk_cache import DiskCache
+
+LLM_CACHE_ENABLED = os.getenv("ECOSYNC_LLM_CACHE", "1") != "0"
+LLM_CACHE_TTL = float(os.getenv("ECOSYNC_LLM_CACHE_TTL", 7 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("ECOSYNC_LLM_CACHE_MAX_ENTRIES", 5000))
+
+# Comma-separated agent names that must never be served from the cache
+DISABLED_AGENTS = {
+    name.strip() for name in os.getenv("ECOSYNC_LLM_CACHE_DISABLED_AGENTS", "").split(",") if name.strip()
+}
+
+llm_cache = DiskCache("llm_responses", ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES)
+
+def cache_enabled_for(agent: str) -> bool:
+    """Whether an agent may use the response cache (global switch plus per-agent opt-out)"""
+    return LLM_CACHE_ENABLED and agent not in DISABLED_AGENTS
+
+def response_cache_key(payload: Dict[str, Any], image: Optional[Union[bytes, str]] = None) -> str:
+    """
+    Hash of everything that determines a completion
+
+    Covers the model, system and user prompts and sampling parameters from the
+    chat payload, plus the image bytes (raw or base64) for vision requests.
+    """
+    messages = []
+    for message in payload["messages"]:
+        content = message["content"]
+        if isinstance(content, list):
+            # Vision messages: keep the text parts, the image is hashed separately
+            content = [part.get("text", "") for part in content if part.get("type") == "text"]
+        messages.append({"role": message["role"], "content": content})
+
+    fields = {
+        "model": payload["model"],
+        "messages": messages,
+        "temperature": payload.get("temperature"),
+        "max_tokens": payload.get("max_tokens"),
+        "top_p": payload.get("top_p")
+    }
+    hasher = hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8"))
+    if image:
+        hasher.update(b"\0image\0")
+        # Base64 input hashes like the bytes it encodes
+        hasher.update(base64.b64decode(image) if isinstance(image, str) else image)
+    return hasher.hexdigest()
+
+def get_cached_response(key: Optional[str]) -> Optional[str]:
+    """Cached completion text for key (None when caching is off for this call)"""
+    if key is None:
+        return None
+    cached = llm_cache.get(key)
+    return cached.get("content") if cached else None
+
+def store_response(key: Optional[str], content: str) -> None:
+    """Remember a successful completion; callers must never pass error messages"""
+    if key is None or not content:
+        return
+    llm_cache.set(key, {"content": content})
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and entry count of the LLM response cache"""
+    return llm_cache.stats()
@@ -0,0 +1,157 @@
+# utils/local_kb.py - BM25 index over curated SDG 3/14/15 answers
+"""
+Stock questions ("What is SDG 14?", "What is ocean acidification?") are
+answered from data/sdg_kb.json without an LLM call. Every curated question
+and alias is indexed as its own short document; a query is answered only if
+its best document covers most of the query's terms and most of the
+document's terms, each weighted by IDF. A longer or more specific question
+("... in the Gulf of Mannar since 2020?") leaves unmatched terms and goes to
+the model.
+
+Benchmark:
+    python -m utils.local_kb
+"""
+import os
+import re
+import json
+import math
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+LOCAL_KB_ENABLED = os.getenv("ECOSYNC_LOCAL_KB", "1") != "0"
+LOCAL_KB_PATH = os.getenv(
+    "ECOSYNC_LOCAL_KB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sdg_kb.json")
+)
+MIN_QUERY_COVERAGE = float(os.getenv("ECOSYNC_LOCAL_KB_MIN_QUERY_COVERAGE", 0.75))
+MIN_DOC_COVERAGE = float(os.getenv("ECOSYNC_LOCAL_KB_MIN_DOC_COVERAGE", 0.6))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOP_WORDS = frozenset(
+    "a about an and are as at be can could do does explain for from how i in is it its me of on or please tell "
+    "that the their there these this to us we what whats which who why with you".split()
+)
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def kb_terms(text: str) -> List[str]:
+    """Lowercase terms without stop words, crude plurals folded ("corals" -> "coral")"""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOP_WORDS:
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+class LocalKnowledgeBase:
+    """BM25 inverted index of curated questions, each pointing at its entry's answer"""
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        self.entries = entries
+        self._doc_entry: List[int] = []
+        self._doc_terms: List[Counter] = []
+        for entry_index, entry in enumerate(entries):
+            for question in [entry["question"]] + entry.get("aliases", []):
+                terms = Counter(kb_terms(question))
+                if terms:
+                    self._doc_entry.append(entry_index)
+                    self._doc_terms.append(terms)
+
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for doc, terms in enumerate(self._doc_terms):
+            for term, count in terms.items():
+                self._postings[term].append((doc, count))
+        documents = len(self._doc_terms)
+        self._doc_length = [sum(terms.values()) for terms in self._doc_terms]
+        self._average_length = sum(self._doc_length) / max(documents, 1)
+        self._idf = {
+            term: math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+        # Terms the corpus never uses count as maximally specific
+        self._unseen_idf = math.log(1 + (documents + 0.5) / 0.5)
+        self._doc_weight = [sum(self._idf[term] for term in terms) for terms in self._doc_terms]
+
+    @classmethod
+    def load(cls, path: str = LOCAL_KB_PATH) -> "LocalKnowledgeBase":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def search(self, query: str) -> Optional[Dict[str, Any]]:
+        """Best entry by BM25 with its score and coverages, or None if no term matches"""
+        terms = kb_terms(query)
+        if not terms:
+            return None
+        scores: Dict[int, float] = defaultdict(float)
+        matched_weight: Dict[int, float] = defaultdict(float)
+        for term in set(terms):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc, count in self._postings[term]:
+                length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_length[doc] / self._average_length)
+                scores[doc] += idf * count * (BM25_K1 + 1) / (count + length_norm)
+                matched_weight[doc] += idf
+        if not scores:
+            return None
+
+        best = max(scores, key=lambda doc: (scores[doc], -self._doc_length[doc]))
+        query_weight = sum(self._idf.get(term, self._unseen_idf) for term in set(terms))
+        entry = self.entries[self._doc_entry[best]]
+        return {
+            "entry": entry,
+            "score": scores[best],
+            "query_coverage": matched_weight[best] / query_weight,
+            "doc_coverage": matched_weight[best] / self._doc_weight[best]
+        }
+
+    def answer(self, query: str) -> Optional[Dict[str, Any]]:
+        """Curated answer when the best match covers the query and the question well enough"""
+        match = self.search(query)
+        if match is None or match["query_coverage"] < MIN_QUERY_COVERAGE or match["doc_coverage"] < MIN_DOC_COVERAGE:
+            return None
+        return {
+            "id": match["entry"]["id"],
+            "question": match["entry"]["question"],
+            "answer": match["entry"]["answer"],
+            "sdgs": match["entry"].get("sdgs", []),
+            "score": round(match["score"], 3),
+            "query_coverage": round(match["query_coverage"], 3),
+            "doc_coverage": round(match["doc_coverage"], 3)
+        }
+
+_kb: Optional[LocalKnowledgeBase] = None
+_kb_error: Optional[str] = None
+
+def get_local_kb() -> Optional[LocalKnowledgeBase]:
+    """Shipped knowledge base, indexed on first use; None (logged once) if disabled or unreadable"""
+    global _kb, _kb_error
+    if not LOCAL_KB_ENABLED:
+        return None
+    if _kb is None and _kb_error is None:
+        try:
+            _kb = LocalKnowledgeBase.load()
+        except (OSError, ValueError, KeyError) as e:
+            _kb_error = str(e)
+            print(f"Local knowledge base disabled, could not load {LOCAL_KB_PATH}: {e}")
+    return _kb
+
+def benchmark_local_kb(repeats: int = 2000) -> None:
+    """Index build time and per-query lookup latency"""
+    start = time.perf_counter()
+    kb = LocalKnowledgeBase.load()
+    print(f"Indexed {len(kb.entries)} entries in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for query in ["What is SDG 14?", "what causes ocean acidification", "How do mangroves protect coastal villages in Kerala?"]:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            result = kb.answer(query)
+        elapsed_us = (time.perf_counter() - start) * 1e6 / repeats
+        print(f"{elapsed_us:6.1f} us  {result['id'] if result else 'LLM':<20} {query}")
+
+if __name__ == "__main__":
+    benchmark_local_kb()
@@ -0,0 +1,111 @@
+# utils/metrics.py - Optional HTTP endpoint exposing model health and cache counters
+"""
+Set ECOSYNC_METRICS_PORT to serve, from a background thread of the app process:
+    GET /metrics       Prometheus text format
+    GET /metrics.json  The same data as JSON
+"""
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from utils.model_registry import get_model_stats
+
+METRICS_HOST = os.getenv("ECOSYNC_METRICS_HOST", "127.0.0.1")
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+MODEL_GAUGES = [
+    ("requests", "ecosync_model_requests_total", "counter", "OpenRouter requests sent to the model"),
+    ("errors", "ecosync_model_errors_total", "counter", "Failed requests"),
+    ("rate_limited", "ecosync_model_rate_limited_total", "counter", "HTTP 429 responses"),
+    ("timeouts", "ecosync_model_timeouts_total", "counter", "Requests that timed out"),
+    ("error_rate", "ecosync_model_recent_error_rate", "gauge", "Error rate over the recent outcome window"),
+    ("p50_s", "ecosync_model_latency_p50_seconds", "gauge", "Median response latency"),
+    ("p95_s", "ecosync_model_latency_p95_seconds", "gauge", "95th percentile response latency"),
+    ("p99_s", "ecosync_model_latency_p99_seconds", "gauge", "99th percentile response latency"),
+    ("first_token_p50_s", "ecosync_model_first_token_p50_seconds", "gauge", "Median time to first streamed token")
+]
+
+def collect_metrics() -> Dict[str, Any]:
+    """Snapshot of model health and cache counters"""
+    # Imported here so the endpoint never forces optional caches to initialize early
+    from utils.llm_cache import get_llm_cache_stats
+    from utils.semantic_cache import get_semantic_cache_stats
+    from utils.vision_cache import get_vision_cache_stats
+
+    return {
+        "models": get_model_stats(),
+        "caches": {
+            "llm_responses": get_llm_cache_stats(),
+            "chatbot_semantic": get_semantic_cache_stats(),
+            "vision_results": get_vision_cache_stats()
+        }
+    }
+
+def render_prometheus(snapshot: Dict[str, Any]) -> str:
+    """Prometheus exposition text for a collect_metrics() snapshot"""
+    lines: List[str] = []
+    models = snapshot["models"]
+    for field, name, kind, help_text in MODEL_GAUGES:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for row in models:
+            if row[field] is not None:
+                lines.append(f'{name}{{model="{row["model"]}"}} {row[field]}')
+
+    lines.append("# HELP ecosync_model_circuit_open Circuit breaker state (0 closed, 0.5 half-open, 1 open)")
+    lines.append("# TYPE ecosync_model_circuit_open gauge")
+    state_values = {"closed": 0, "half_open": 0.5, "open": 1}
+    for row in models:
+        lines.append(f'ecosync_model_circuit_open{{model="{row["model"]}"}} {state_values[row["state"]]}')
+
+    for cache, stats in snapshot["caches"].items():
+        for key in ("hits", "misses", "entries"):
+            if key in stats:
+                lines.append(f'ecosync_cache_{key}{{cache="{cache}"}} {stats[key]}')
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = render_prometheus(collect_metrics()).encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body = json.dumps(collect_metrics()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise flood the Streamlit console
+
+def start_metrics_server(port: Optional[int] = None) -> Optional[ThreadingHTTPServer]:
+    """
+    Start the endpoint once per process (Streamlit reruns call this repeatedly)
+
+    Does nothing unless a port is given or ECOSYNC_METRICS_PORT is set.
+    """
+    global _server
+    # Read at call time so a .env loaded after import still applies
+    port = port or int(os.getenv("ECOSYNC_METRICS_PORT", 0))
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((METRICS_HOST, port), _MetricsHandler)
+            except OSError as e:
+                print(f"Metrics endpoint not started on port {port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, daemon=True, name="metrics-server").start()
+            print(f"Metrics endpoint on http://{METRICS_HOST}:{port}/metrics")
+    return _server
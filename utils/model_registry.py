@@ -0,0 +1,230 @@
+# utils/model_registry.py - Per-model health tracking, circuit breakers and model selection
+"""
+Agents ask for a capability ("text" or "vision") instead of naming a model.
+The registry returns that capability's pool ordered by expected time to a
+good answer: recent median latency divided by recent success rate. Models
+whose circuit breaker is open are left out until their cooldown ends.
+
+A breaker opens after BREAKER_FAILURES consecutive failures, or when at least
+half of the last OUTCOME_WINDOW calls failed. After BREAKER_COOLDOWN seconds
+one probe request is let through (half-open); its outcome closes or re-opens
+the breaker.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+from utils.latency import latency_window, record_latency
+
+# Default pools, best first; override with comma-separated ECOSYNC_TEXT_MODELS / ECOSYNC_VISION_MODELS
+DEFAULT_POOLS = {
+    "text": [
+        "mistralai/mistral-small-3.2-24b-instruct:free",
+        "meta-llama/llama-3.3-70b-instruct:free",
+        "google/gemma-3-27b-it:free"
+    ],
+    "vision": [
+        "moonshotai/kimi-vl-a3b-thinking:free",
+        "qwen/qwen2.5-vl-72b-instruct:free",
+        "google/gemma-3-27b-it:free",
+        "mistralai/mistral-small-3.2-24b-instruct:free"
+    ]
+}
+
+BREAKER_FAILURES = int(os.getenv("ECOSYNC_BREAKER_FAILURES", 3))
+BREAKER_ERROR_RATE = float(os.getenv("ECOSYNC_BREAKER_ERROR_RATE", 0.5))
+BREAKER_COOLDOWN = float(os.getenv("ECOSYNC_BREAKER_COOLDOWN", 60))   # Seconds
+OUTCOME_WINDOW = 20
+MIN_OUTCOMES_FOR_RATE = 10
+
+def _parse_models(value: str) -> List[str]:
+    return [model.strip() for model in value.split(",") if model.strip()]
+
+def capability_pool(capability: str) -> List[str]:
+    """Configured models for a capability, best first"""
+    configured = _parse_models(os.getenv(f"ECOSYNC_{capability.upper()}_MODELS", ""))
+    return configured or list(DEFAULT_POOLS[capability])
+
+def model_chain(agent: str, default: Sequence[str]) -> List[str]:
+    """
+    Models an agent may use, before health ordering
+
+    Override with a comma-separated ECOSYNC_MODELS_<AGENT> variable, e.g.
+    ECOSYNC_MODELS_ECO_CHATBOT_AGENT="mistralai/mistral-small-3.2-24b-instruct:free,google/gemma-3-27b-it:free"
+    """
+    return _parse_models(os.getenv(f"ECOSYNC_MODELS_{agent.upper()}", "")) or list(default)
+
+class ModelHealth:
+    """Counters and breaker state of one model"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.timeouts = 0
+        self.consecutive_failures = 0
+        self.recent: Deque[bool] = deque(maxlen=OUTCOME_WINDOW)   # True = success
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def recent_error_rate(self) -> float:
+        if not self.recent:
+            return 0.0
+        return 1 - sum(self.recent) / len(self.recent)
+
+class ModelRegistry:
+    """Thread-safe health registry shared by every OpenRouter call in the process"""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, error_rate_threshold: float = BREAKER_ERROR_RATE,
+                 cooldown: float = BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.cooldown = cooldown
+        self._models: Dict[str, ModelHealth] = {}
+        self._lock = threading.Lock()
+
+    def _health(self, model: str) -> ModelHealth:
+        health = self._models.get(model)
+        if health is None:
+            health = self._models[model] = ModelHealth()
+        return health
+
+    def record_success(self, model: str, phase: str, seconds: float) -> None:
+        """A completed request and its latency ("response" or "first_token")"""
+        record_latency(model, phase, seconds)
+        with self._lock:
+            health = self._health(model)
+            health.requests += 1
+            health.consecutive_failures = 0
+            health.recent.append(True)
+            health.probe_in_flight = False
+            if health.state != "closed":
+                print(f"Circuit closed for {model}")
+            health.state = "closed"
+
+    def record_first_token(self, model: str, seconds: float) -> None:
+        """Time to first token of a stream (the stream's outcome is recorded separately)"""
+        record_latency(model, "first_token", seconds)
+
+    def record_failure(self, model: str, phase: str, seconds: float,
+                       rate_limited: bool = False, timed_out: bool = False) -> None:
+        """A failed request; timeouts also count as latency samples"""
+        if timed_out:
+            record_latency(model, phase, seconds)
+        with self._lock:
+            health = self._health(model)
+            health.requests += 1
+            health.errors += 1
+            health.rate_limited += rate_limited
+            health.timeouts += timed_out
+            health.consecutive_failures += 1
+            health.recent.append(False)
+            health.probe_in_flight = False
+            if health.state == "half_open" or self._should_trip(health):
+                if health.state != "open":
+                    print(f"Circuit opened for {model} after {health.consecutive_failures} consecutive failures")
+                health.state = "open"
+                health.opened_at = time.monotonic()
+
+    def release_probe(self, model: str) -> None:
+        """Free a claimed half-open probe slot without an outcome (the caller abandoned the request)"""
+        with self._lock:
+            self._health(model).probe_in_flight = False
+
+    def _should_trip(self, health: ModelHealth) -> bool:
+        if health.consecutive_failures >= self.failure_threshold:
+            return True
+        return (len(health.recent) >= MIN_OUTCOMES_FOR_RATE
+                and health.recent_error_rate() >= self.error_rate_threshold)
+
+    def _available(self, health: ModelHealth, claim_probe: bool) -> bool:
+        if health.state == "closed":
+            return True
+        if health.state == "open" and time.monotonic() - health.opened_at >= self.cooldown:
+            health.state = "half_open"
+        if health.state == "half_open" and not health.probe_in_flight:
+            if claim_probe:
+                health.probe_in_flight = True
+            return True
+        return False
+
+    def allow_request(self, model: str, claim_probe: bool = True) -> bool:
+        """
+        Whether a request may go to model now
+
+        With claim_probe (the default) a half-open model's single probe slot is
+        taken, so call it only right before sending; record_success or
+        record_failure releases it.
+        """
+        with self._lock:
+            return self._available(self._health(model), claim_probe=claim_probe)
+
+    def state(self, model: str) -> str:
+        with self._lock:
+            return self._health(model).state
+
+    def _expected_seconds(self, model: str, health: ModelHealth) -> Optional[float]:
+        p50 = latency_window(model, "response").percentile(50)
+        if p50 is None:
+            return None
+        return p50 / max(1 - health.recent_error_rate(), 0.05)
+
+    def rank(self, models: Sequence[str]) -> List[str]:
+        """
+        Models ordered by expected time to a successful answer
+
+        Models without samples keep their configured order after the measured
+        ones; models with an open breaker are dropped. If every model is open
+        the configured order is returned and the call layer fails fast.
+        """
+        with self._lock:
+            usable = [(index, model) for index, model in enumerate(models)
+                      if self._available(self._health(model), claim_probe=False)]
+            if not usable:
+                return list(models)
+            scored = [(self._expected_seconds(model, self._health(model)), index, model) for index, model in usable]
+        scored.sort(key=lambda item: (item[0] is None, item[0] or 0.0, item[1]))
+        return [model for _, _, model in scored]
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """One row per model seen so far, for the UI and the metrics endpoint"""
+        with self._lock:
+            models = {model: health for model, health in self._models.items()}
+            rows = []
+            for model, health in sorted(models.items()):
+                self._available(health, claim_probe=False)  # Refresh open -> half_open
+                response = latency_window(model, "response")
+                rows.append({
+                    "model": model,
+                    "state": health.state,
+                    "requests": health.requests,
+                    "errors": health.errors,
+                    "rate_limited": health.rate_limited,
+                    "timeouts": health.timeouts,
+                    "error_rate": round(health.recent_error_rate(), 3),
+                    "p50_s": response.percentile(50),
+                    "p95_s": response.percentile(95),
+                    "p99_s": response.percentile(99),
+                    "first_token_p50_s": latency_window(model, "first_token").percentile(50)
+                })
+        return rows
+
+# Shared by every OpenRouter call in this process
+model_registry = ModelRegistry()
+
+def select_models(capability: str, agent: Optional[str] = None) -> List[str]:
+    """
+    Model chain for one call: the capability pool (or the agent's override),
+    fastest healthy model first
+    """
+    pool = capability_pool(capability)
+    if agent:
+        pool = model_chain(agent, pool)
+    return model_registry.rank(pool)
+
+def get_model_stats() -> List[Dict[str, Any]]:
+    """Per-model health rows (see ModelRegistry.stats)"""
+    return model_registry.stats()
@@ -1,19 +1,15 @@
-from utils.openrouter import OpenRouterClient
-
-client = OpenRouterClient(api_key="your-api-key")
-
-def query_openrouter(prompt: str) -> str:
-    response = client.chat.completions.create(
-        model="google/gemini-2.5-flash",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return response.choices[0].message.content
+from utils.image_triage import IMAGE_TRIAGE_ROUTING, triage_image
 
 def classify_image_clip(image_bytes: bytes, domain="marine") -> str:
-    # Replace with real CLIP or ResNet call later
-    if b"coral" in image_bytes[:100]:
-        return "Detected Coral Bleaching - Marine Health Issue"
-    elif domain == "land":
-        return "Detected Land Animal Health Issue"
+    # Local CPU triage (utils.image_triage); domain is the answer when it is unsure
+    triage = triage_image(image_bytes) if IMAGE_TRIAGE_ROUTING else None
+    if triage is None or not triage["confident"]:
+        label = domain
+    else:
+        label = triage["label"]
+    if label == "marine":
+        return "Detected Marine Scene - Marine Health Analysis"
+    elif label == "land":
+        return "Detected Land Scene - Land Health Analysis"
     else:
         return "Unknown issue"
@@ -1,7 +1,23 @@
 import os
+import time
+import base64
+import queue
+import asyncio
+import threading
+import weakref
 import requests
+import httpx
 import json
-from typing import Optional
+from typing import Optional, Dict, Any, Iterator, AsyncIterator, Callable, List, Sequence, Union
+from requests.adapters import HTTPAdapter
+from utils.llm_cache import response_cache_key, get_cached_response, store_response
+from utils.latency import latency_window
+from utils.model_registry import model_registry
+# Error types are re-exported so callers can catch them from this module
+from utils.openrouter_retry import (
+    OpenRouterError, RateLimitError, ModelTimeoutError, EmptyResponseError, AllModelsFailedError, CircuitOpenError,
+    RequestCancelledError, FallbackChain, as_openrouter_error, check_body, check_response, error_from_status
+)
 
 # Get API key from environment variable
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
@@ -9,28 +25,127 @@ OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 if not OPENROUTER_API_KEY:
     raise ValueError("OPENROUTER_API_KEY environment variable is not set")
 
-def call_text_model(model: str, system_prompt: str, user_prompt: str) -> str:
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+CONNECT_TIMEOUT = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", 5))
+POOL_SIZE = int(os.getenv("OPENROUTER_POOL_SIZE", 16))
+
+class OpenRouterClient:
     """
-    Call a text-only model via OpenRouter API
+    Keep-alive HTTP client for the OpenRouter API
     
-    Args:
-        model: Model identifier (e.g., "mistralai/mistral-small-3.2-24b-instruct:free")
-        system_prompt: System instruction for the model
-        user_prompt: User's input text
+    Owns one pooled requests.Session so repeated calls reuse the DNS lookup,
+    TCP connection and TLS session to openrouter.ai, and builds the
+    authentication headers once instead of on every call.
+    """
     
-    Returns:
-        Model's response text
+    def __init__(self, api_key: Optional[str] = None, base_url: str = OPENROUTER_BASE_URL,
+                 pool_size: int = POOL_SIZE, connect_timeout: float = CONNECT_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key or OPENROUTER_API_KEY}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "http://localhost:8501",  # For Streamlit local dev
+            "X-Title": "Ecosync AI Multi-Agent System",
+            "Connection": "keep-alive"
+        })
+    
+    def post(self, path: str, payload: Dict[str, Any], read_timeout: float, **kwargs) -> requests.Response:
+        """POST JSON to an API path with separate connect and read timeouts"""
+        return self.session.post(
+            f"{self.base_url}{path}",
+            json=payload,
+            timeout=(self.connect_timeout, read_timeout),
+            **kwargs
+        )
+    
+    def get(self, path: str, read_timeout: float, **kwargs) -> requests.Response:
+        """GET an API path with separate connect and read timeouts"""
+        return self.session.get(
+            f"{self.base_url}{path}",
+            timeout=(self.connect_timeout, read_timeout),
+            **kwargs
+        )
+    
+    def close(self) -> None:
+        """Close all pooled connections"""
+        self.session.close()
+
+class AsyncOpenRouterClient:
     """
-    url = "https://openrouter.ai/api/v1/chat/completions"
+    Async counterpart of OpenRouterClient built on httpx.AsyncClient
     
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "http://localhost:8501",  # For Streamlit local dev
-        "X-Title": "Ecosync AI Multi-Agent System"
-    }
+    One worker can keep many OpenRouter requests in flight on a single event
+    loop instead of blocking a thread per request.
+    """
+    
+    def __init__(self, api_key: Optional[str] = None, base_url: str = OPENROUTER_BASE_URL,
+                 pool_size: int = POOL_SIZE, connect_timeout: float = CONNECT_TIMEOUT):
+        self.connect_timeout = connect_timeout
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers={
+                "Authorization": f"Bearer {api_key or OPENROUTER_API_KEY}",
+                "Content-Type": "application/json",
+                "HTTP-Referer": "http://localhost:8501",
+                "X-Title": "Ecosync AI Multi-Agent System"
+            },
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+    
+    def _timeout(self, read_timeout: float) -> httpx.Timeout:
+        return httpx.Timeout(read_timeout, connect=self.connect_timeout)
     
-    payload = {
+    async def post(self, path: str, payload: Dict[str, Any], read_timeout: float) -> httpx.Response:
+        """POST JSON to an API path with separate connect and read timeouts"""
+        return await self.client.post(path, json=payload, timeout=self._timeout(read_timeout))
+    
+    async def get(self, path: str, read_timeout: float) -> httpx.Response:
+        """GET an API path with separate connect and read timeouts"""
+        return await self.client.get(path, timeout=self._timeout(read_timeout))
+    
+    def stream(self, path: str, payload: Dict[str, Any], read_timeout: float):
+        """Streaming POST; use as `async with client.stream(...) as response`"""
+        return self.client.stream("POST", path, json=payload, timeout=self._timeout(read_timeout))
+    
+    async def aclose(self) -> None:
+        """Close all pooled connections"""
+        await self.client.aclose()
+
+# Shared client used by every call in this module
+client = OpenRouterClient()
+
+# httpx connections belong to the event loop that opened them, so keep one async client per loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenRouterClient]" = weakref.WeakKeyDictionary()
+
+def get_async_client() -> AsyncOpenRouterClient:
+    """Return the shared async client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    async_client = _async_clients.get(loop)
+    if async_client is None:
+        async_client = AsyncOpenRouterClient()
+        _async_clients[loop] = async_client
+    return async_client
+
+EMPTY_MESSAGE = "The model returned no content"
+
+def completion_metadata(completion: Dict[str, Any]) -> Dict[str, Any]:
+    """Agent metadata fields describing which model answered and how"""
+    return {
+        "model": completion.get("model"),
+        "attempts": completion.get("attempts", 0),
+        "fallback_used": completion.get("fallback_used", False),
+        "llm_cache_hit": completion.get("cached", False),
+        "hedge_fired": completion.get("hedge_fired", False)
+    }
+
+def build_text_payload(model: str, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+    """Chat completion payload for a text-only request"""
+    return {
         "model": model,
         "messages": [
             {
@@ -46,47 +161,16 @@ def call_text_model(model: str, system_prompt: str, user_prompt: str) -> str:
         "max_tokens": 1500,
         "top_p": 0.9
     }
-    
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        
-        result = response.json()
-        
-        if 'choices' in result and len(result['choices']) > 0:
-            return result['choices'][0]['message']['content'].strip()
-        else:
-            return "I apologize, but I couldn't generate a response. Please try again."
-            
-    except requests.exceptions.RequestException as e:
-        return f"Network error occurred: {str(e)}"
-    except json.JSONDecodeError:
-        return "Error: Invalid response format from the API."
-    except Exception as e:
-        return f"An unexpected error occurred: {str(e)}"
 
-def call_vision_model(model: str, system_prompt: str, user_prompt: str, image_base64: str) -> str:
-    """
-    Call a vision-capable model via OpenRouter API
-    
-    Args:
-        model: Model identifier (e.g., "moonshotai/kimi-vl-a3b-thinking:free")
-        system_prompt: System instruction for the model
-        user_prompt: User's input text
-        image_base64: Base64 encoded image string
-    
-    Returns:
-        Model's response text analyzing the image
-    """
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "http://localhost:8501",
-        "X-Title": "Ecosync AI Multi-Agent System"
-    }
-    
+def image_data_url(image: Union[bytes, str]) -> str:
+    """JPEG data: URL for image bytes; a str is taken as already base64 encoded"""
+    if isinstance(image, str):
+        return f"data:image/jpeg;base64,{image}"
+    # Prefix joined before decoding, so at most two copies of the encoded image exist at once
+    return (b"data:image/jpeg;base64," + base64.b64encode(image)).decode("ascii")
+
+def build_vision_payload(model: str, system_prompt: str, user_prompt: str, image_url: str) -> Dict[str, Any]:
+    """Chat completion payload for a text + image request (image_url from image_data_url)"""
     # Construct the message with both text and image
     user_message = {
         "role": "user",
@@ -98,13 +182,13 @@ def call_vision_model(model: str, system_prompt: str, user_prompt: str, image_ba
             {
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:image/jpeg;base64,{image_base64}"
+                    "url": image_url
                 }
             }
         ]
     }
     
-    payload = {
+    return {
         "model": model,
         "messages": [
             {
@@ -117,24 +201,592 @@ def call_vision_model(model: str, system_prompt: str, user_prompt: str, image_ba
         "max_tokens": 2000,
         "top_p": 0.9
     }
+
+def extract_content(result: Dict[str, Any], model: str) -> str:
+    """Message text of the first choice; raises a typed error for error bodies and empty answers"""
+    check_body(result, model)
+    if 'choices' in result and len(result['choices']) > 0:
+        content = (result['choices'][0]['message'].get('content') or "").strip()
+        if content:
+            return content
+    raise EmptyResponseError(EMPTY_MESSAGE, model=model)
+
+def _record_failure(error: Exception, model: str, phase: str, started: float) -> None:
+    error = as_openrouter_error(error, model)
+    model_registry.record_failure(model, phase, time.monotonic() - started,
+                                  rate_limited=isinstance(error, RateLimitError),
+                                  timed_out=isinstance(error, ModelTimeoutError))
+
+def _complete(models: Sequence[str], build_payload: Callable[[str], Dict[str, Any]],
+              cache_key_for: Callable[[Dict[str, Any]], Optional[str]], read_timeout: float,
+              cancelled: Optional[threading.Event] = None) -> Dict[str, Any]:
+    chain = FallbackChain(models, read_timeout, cancelled=cancelled)
+    for model in chain.models:
+        payload = build_payload(model)
+        cache_key = cache_key_for(payload)
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            return chain.result(cached, model, cached=True)
+        
+        for attempt in chain.tries(model):
+            started = time.monotonic()
+            try:
+                response = client.post("/chat/completions", payload, read_timeout=chain.read_timeout())
+                check_response(response, model)
+                content = extract_content(response.json(), model)
+            except Exception as e:
+                if chain.is_cancelled():
+                    raise chain.abandon(model) from e
+                _record_failure(e, model, "response", started)
+                delay = chain.failed(e, model, attempt)
+                if delay is None:
+                    break
+                chain.wait(delay)
+                continue
+            if chain.is_cancelled():
+                raise chain.abandon(model)  # An answer nobody is waiting for is neither recorded nor cached
+            model_registry.record_success(model, "response", time.monotonic() - started)
+            store_response(cache_key, content)  # Only successful answers are cached
+            return chain.result(content, model)
+    raise chain.failure()
+
+async def _acomplete(models: Sequence[str], build_payload: Callable[[str], Dict[str, Any]],
+                     cache_key_for: Callable[[Dict[str, Any]], Optional[str]], read_timeout: float) -> Dict[str, Any]:
+    chain = FallbackChain(models, read_timeout)
+    for model in chain.models:
+        payload = build_payload(model)
+        cache_key = cache_key_for(payload)
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            return chain.result(cached, model, cached=True)
+        
+        for attempt in chain.tries(model):
+            started = time.monotonic()
+            try:
+                response = await get_async_client().post("/chat/completions", payload, read_timeout=chain.read_timeout())
+                check_response(response, model)
+                content = extract_content(response.json(), model)
+                model_registry.record_success(model, "response", time.monotonic() - started)
+                store_response(cache_key, content)
+                return chain.result(content, model)
+            except asyncio.CancelledError:
+                model_registry.release_probe(model)  # A cancelled task (losing hedge leg) records nothing
+                raise
+            except Exception as e:
+                _record_failure(e, model, "response", started)
+                delay = chain.failed(e, model, attempt)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+    raise chain.failure()
+
+def _text_request(system_prompt: str, user_prompt: str, use_cache: bool):
+    build_payload = lambda model: build_text_payload(model, system_prompt, user_prompt)
+    cache_key_for = lambda payload: response_cache_key(payload) if use_cache else None
+    return build_payload, cache_key_for
+
+def _vision_request(system_prompt: str, user_prompt: str, image: Union[bytes, str], use_cache: bool):
+    # Base64 is built once per call, here at the HTTP boundary; every model attempt reuses it
+    image_url = image_data_url(image)
+    build_payload = lambda model: build_vision_payload(model, system_prompt, user_prompt, image_url)
+    cache_key_for = lambda payload: response_cache_key(payload, image) if use_cache else None
+    return build_payload, cache_key_for
+
+def complete_text(models: Sequence[str], system_prompt: str, user_prompt: str,
+                  use_cache: bool = True, hedge: Optional[bool] = None,
+                  cancelled: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    Text completion with retries and an ordered model fallback chain
+    
+    Each model is retried with jittered exponential backoff on 429s (honouring
+    Retry-After) and transient 5xx/network errors; timeouts, empty answers and
+    other failures move on to the next model.
+    
+    Args:
+        models: Models to try in order, e.g. select_models("text", agent="eco_chatbot_agent")
+        system_prompt: System instruction for the model
+        user_prompt: User's input text
+        use_cache: Serve and store the answer in the disk response cache
+        hedge: Send a backup request to the remaining models when the first is
+            slower than its usual tail latency (default: OPENROUTER_HEDGE)
+        cancelled: Set by a caller that stopped waiting; no further attempt
+            is sent and the abandoned call raises RequestCancelledError
     
+    Returns:
+        Dict with content, model (the one that answered), attempts, cached,
+        fallback_used and, for hedged calls, hedge_fired
+    
+    Raises:
+        OpenRouterError: RateLimitError, ModelTimeoutError, ... for a single
+        model, AllModelsFailedError when a whole chain failed
+    """
+    build_payload, cache_key_for = _text_request(system_prompt, user_prompt, use_cache)
+    if _should_hedge(models, hedge):
+        return _hedged_complete(models, build_payload, cache_key_for, read_timeout=30, cancelled=cancelled)
+    return _complete(models, build_payload, cache_key_for, read_timeout=30, cancelled=cancelled)
+
+def complete_vision(models: Sequence[str], system_prompt: str, user_prompt: str, image: Union[bytes, str],
+                    use_cache: bool = True, hedge: Optional[bool] = None,
+                    cancelled: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    Vision completion with retries and model fallback (see complete_text)
+    
+    Args:
+        image: JPEG bytes (e.g. get_image(state["image_ref"])) or an already base64 encoded string
+    """
+    build_payload, cache_key_for = _vision_request(system_prompt, user_prompt, image, use_cache)
+    if _should_hedge(models, hedge):
+        return _hedged_complete(models, build_payload, cache_key_for, read_timeout=45, cancelled=cancelled)
+    return _complete(models, build_payload, cache_key_for, read_timeout=45, cancelled=cancelled)
+
+async def acomplete_text(models: Sequence[str], system_prompt: str, user_prompt: str,
+                         use_cache: bool = True, hedge: Optional[bool] = None) -> Dict[str, Any]:
+    """Async variant of complete_text"""
+    build_payload, cache_key_for = _text_request(system_prompt, user_prompt, use_cache)
+    if _should_hedge(models, hedge):
+        return await _ahedged_complete(models, build_payload, cache_key_for, read_timeout=30)
+    return await _acomplete(models, build_payload, cache_key_for, read_timeout=30)
+
+async def acomplete_vision(models: Sequence[str], system_prompt: str, user_prompt: str, image: Union[bytes, str],
+                           use_cache: bool = True, hedge: Optional[bool] = None) -> Dict[str, Any]:
+    """Async variant of complete_vision"""
+    build_payload, cache_key_for = _vision_request(system_prompt, user_prompt, image, use_cache)
+    if _should_hedge(models, hedge):
+        return await _ahedged_complete(models, build_payload, cache_key_for, read_timeout=45)
+    return await _acomplete(models, build_payload, cache_key_for, read_timeout=45)
+
+def call_text_model(model: str, system_prompt: str, user_prompt: str, use_cache: bool = True) -> str:
+    """
+    Call a text-only model via OpenRouter API
+    
+    Args:
+        model: Model identifier (e.g., "mistralai/mistral-small-3.2-24b-instruct:free")
+        system_prompt: System instruction for the model
+        user_prompt: User's input text
+        use_cache: Serve and store the answer in the disk response cache
+    
+    Returns:
+        Model's response text
+    
+    Raises:
+        OpenRouterError: After retries are exhausted
+    """
+    return complete_text([model], system_prompt, user_prompt, use_cache)["content"]
+
+def call_vision_model(model: str, system_prompt: str, user_prompt: str, image: Union[bytes, str],
+                      use_cache: bool = True) -> str:
+    """
+    Call a vision-capable model via OpenRouter API
+    
+    Args:
+        model: Model identifier (e.g., "moonshotai/kimi-vl-a3b-thinking:free")
+        system_prompt: System instruction for the model
+        user_prompt: User's input text
+        image: JPEG bytes (e.g. get_image(state["image_ref"])) or an already base64 encoded string
+        use_cache: Serve and store the answer in the disk response cache
+    
+    Returns:
+        Model's response text analyzing the image
+    
+    Raises:
+        OpenRouterError: After retries are exhausted
+    """
+    return complete_vision([model], system_prompt, user_prompt, image, use_cache)["content"]
+
+async def acall_text_model(model: str, system_prompt: str, user_prompt: str, use_cache: bool = True) -> str:
+    """
+    Async variant of call_text_model (same arguments and errors)
+    """
+    return (await acomplete_text([model], system_prompt, user_prompt, use_cache))["content"]
+
+async def acall_vision_model(model: str, system_prompt: str, user_prompt: str, image: Union[bytes, str],
+                             use_cache: bool = True) -> str:
+    """
+    Async variant of call_vision_model (same arguments and errors)
+    """
+    return (await acomplete_vision([model], system_prompt, user_prompt, image, use_cache))["content"]
+
+def parse_sse_line(line: str) -> Optional[str]:
+    """
+    Text delta carried by one server-sent event line of a streamed completion
+    
+    Returns None for keep-alive comments, blank lines, the [DONE] marker and
+    events without content. Raises a typed error for mid-stream error events.
+    """
+    if not line or not line.startswith("data:"):
+        return None  # Blank separator or ": OPENROUTER PROCESSING" comment
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return None
+    event = json.loads(data)
+    if "error" in event:
+        code = event["error"].get("code")
+        raise error_from_status(code if isinstance(code, int) else 502,
+                                event["error"].get("message", "Streaming error"))
+    choices = event.get("choices") or []
+    if not choices:
+        return None
+    return choices[0].get("delta", {}).get("content") or None
+
+def _stream(models: Sequence[str], build_payload: Callable[[str], Dict[str, Any]],
+            cache_key_for: Callable[[Dict[str, Any]], Optional[str]], read_timeout: float,
+            outcome: Optional[Dict[str, Any]]) -> Iterator[str]:
+    chain = FallbackChain(models, read_timeout)
+    outcome = outcome if outcome is not None else {}
+    for model in chain.models:
+        payload = build_payload(model)
+        cache_key = cache_key_for(payload)
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            outcome.update(chain.result(cached, model, cached=True))
+            yield cached
+            return
+        
+        for attempt in chain.tries(model):
+            parts = []
+            started = time.monotonic()
+            try:
+                with client.post("/chat/completions", {**payload, "stream": True},
+                                 read_timeout=chain.read_timeout(), stream=True) as response:
+                    check_response(response, model)
+                    for line in response.iter_lines(decode_unicode=True):
+                        delta = parse_sse_line(line)
+                        if delta:
+                            if not parts:
+                                model_registry.record_first_token(model, time.monotonic() - started)
+                            parts.append(delta)
+                            yield delta
+                content = "".join(parts).strip()
+                if not content:
+                    raise EmptyResponseError(EMPTY_MESSAGE, model=model)
+                model_registry.record_success(model, "response", time.monotonic() - started)
+                store_response(cache_key, content)  # Reached only when the stream completed
+                outcome.update(chain.result(content, model))
+                return
+            except Exception as e:
+                _record_failure(e, model, "first_token" if not parts else "response", started)
+                if parts:
+                    # Text already reached the reader; another model cannot continue it
+                    raise as_openrouter_error(e, model) from e
+                delay = chain.failed(e, model, attempt)
+                if delay is None:
+                    break
+                time.sleep(delay)
+    raise chain.failure()
+
+async def _astream(models: Sequence[str], build_payload: Callable[[str], Dict[str, Any]],
+                   cache_key_for: Callable[[Dict[str, Any]], Optional[str]], read_timeout: float,
+                   outcome: Optional[Dict[str, Any]]) -> AsyncIterator[str]:
+    chain = FallbackChain(models, read_timeout)
+    outcome = outcome if outcome is not None else {}
+    for model in chain.models:
+        payload = build_payload(model)
+        cache_key = cache_key_for(payload)
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            outcome.update(chain.result(cached, model, cached=True))
+            yield cached
+            return
+        
+        for attempt in chain.tries(model):
+            parts = []
+            started = time.monotonic()
+            try:
+                async with get_async_client().stream("/chat/completions", {**payload, "stream": True},
+                                                     chain.read_timeout()) as response:
+                    if response.status_code >= 400:
+                        await response.aread()  # Error body is needed for the message
+                    check_response(response, model)
+                    async for line in response.aiter_lines():
+                        delta = parse_sse_line(line)
+                        if delta:
+                            if not parts:
+                                model_registry.record_first_token(model, time.monotonic() - started)
+                            parts.append(delta)
+                            yield delta
+                content = "".join(parts).strip()
+                if not content:
+                    raise EmptyResponseError(EMPTY_MESSAGE, model=model)
+                model_registry.record_success(model, "response", time.monotonic() - started)
+                store_response(cache_key, content)
+                outcome.update(chain.result(content, model))
+                return
+            except Exception as e:
+                _record_failure(e, model, "first_token" if not parts else "response", started)
+                if parts:
+                    raise as_openrouter_error(e, model) from e
+                delay = chain.failed(e, model, attempt)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+    raise chain.failure()
+
+# ---------------------------------------------------------------------------
+# Hedged requests
+# ---------------------------------------------------------------------------
+
+HEDGE_ENABLED = os.getenv("OPENROUTER_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("OPENROUTER_HEDGE_PERCENTILE", 90))
+HEDGE_MIN_DELAY = float(os.getenv("OPENROUTER_HEDGE_MIN_DELAY", 1.0))          # Seconds
+HEDGE_DEFAULT_DELAY = float(os.getenv("OPENROUTER_HEDGE_DEFAULT_DELAY", 8.0))  # Until enough samples exist
+HEDGE_MIN_SAMPLES = 10
+CANCEL_POLL_INTERVAL = 0.1  # Seconds between checks of a caller's cancelled event while hedging
+
+def _should_hedge(models: Sequence[str], hedge: Optional[bool]) -> bool:
+    return (HEDGE_ENABLED if hedge is None else hedge) and len(models) > 1
+
+def hedge_delay(model: str, phase: str, read_timeout: float) -> float:
+    """
+    Seconds to give the primary model before a backup request is sent
+    
+    The HEDGE_PERCENTILE latency of its recent requests ("response") or first
+    tokens ("first_token"), so only the slowest tail triggers a second call.
+    """
+    window = latency_window(model, phase)
+    if len(window) < HEDGE_MIN_SAMPLES:
+        return min(HEDGE_DEFAULT_DELAY, read_timeout)
+    return min(max(window.percentile(HEDGE_PERCENTILE), HEDGE_MIN_DELAY), read_timeout)
+
+def _hedged(models: Sequence[str], run_leg: Callable, phase: str, read_timeout: float,
+            outcome: Dict[str, Any], cancelled: Optional[threading.Event] = None) -> Iterator[str]:
+    """
+    Race the primary model against the alternates once the hedge delay passes
+    
+    run_leg(leg_models, cancelled, emit) runs in a worker thread, passes text
+    deltas to emit and returns the completion dict. The first leg to produce
+    text (or finish) wins; the other sees `cancelled` set and stops at its
+    next read. A primary that fails early starts the alternates at once.
+    Setting the caller's own cancelled event stops every leg.
+    """
+    events: "queue.Queue" = queue.Queue()
+    cancel_flags: List[threading.Event] = []
+    
+    def start(leg_models: Sequence[str]) -> None:
+        leg = len(cancel_flags)
+        cancelled = threading.Event()
+        cancel_flags.append(cancelled)
+        
+        def run() -> None:
+            try:
+                completion = run_leg(leg_models, cancelled, lambda delta: events.put((leg, "delta", delta)))
+                events.put((leg, "done", completion))
+            except Exception as e:
+                events.put((leg, "error", e))
+        
+        threading.Thread(target=run, daemon=True, name=f"openrouter-hedge-{leg}").start()
+    
+    start(models[:1])
+    hedge_at = time.monotonic() + hedge_delay(models[0], phase, read_timeout)
+    winner = None
+    failed_legs = set()
+    errors: List[OpenRouterError] = []
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=45)
-        response.raise_for_status()
+        while True:
+            waiting_to_hedge = winner is None and len(cancel_flags) == 1
+            timeout = max(0.0, hedge_at - time.monotonic()) if waiting_to_hedge else None
+            if cancelled is not None:
+                timeout = CANCEL_POLL_INTERVAL if timeout is None else min(timeout, CANCEL_POLL_INTERVAL)
+            try:
+                leg, kind, value = events.get(timeout=timeout)
+            except queue.Empty:
+                if cancelled is not None and cancelled.is_set():
+                    raise RequestCancelledError("Request cancelled", model=models[0])
+                if waiting_to_hedge and time.monotonic() >= hedge_at:
+                    start(models[1:])  # Primary is in its slow tail
+                continue
+            
+            if winner is None:
+                if kind == "error":
+                    failed_legs.add(leg)
+                    errors.extend(getattr(value, "errors", [value]))
+                    if len(cancel_flags) == 1:
+                        start(models[1:])
+                    elif len(failed_legs) == len(cancel_flags):
+                        raise AllModelsFailedError(errors)
+                    continue
+                winner = leg
+                for other, cancelled in enumerate(cancel_flags):
+                    if other != leg:
+                        cancelled.set()
+            
+            if leg != winner:
+                continue
+            if kind == "delta":
+                yield value
+            elif kind == "done":
+                outcome.update(value)
+                outcome["fallback_used"] = outcome.get("model") != models[0]
+                outcome["hedge_fired"] = len(cancel_flags) > 1
+                return
+            else:
+                raise value
+    finally:
+        for cancelled in cancel_flags:
+            cancelled.set()
+
+async def _ahedged(models: Sequence[str], run_leg: Callable, phase: str, read_timeout: float,
+                   outcome: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Async variant of _hedged; legs are tasks and the loser is cancelled outright
+    
+    run_leg(leg_models, emit) is a coroutine function returning the completion dict.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    tasks: List[asyncio.Task] = []
+    
+    def start(leg_models: Sequence[str]) -> None:
+        leg = len(tasks)
         
-        result = response.json()
+        async def run() -> None:
+            try:
+                completion = await run_leg(leg_models, lambda delta: events.put_nowait((leg, "delta", delta)))
+                events.put_nowait((leg, "done", completion))
+            except Exception as e:
+                events.put_nowait((leg, "error", e))
         
-        if 'choices' in result and len(result['choices']) > 0:
-            return result['choices'][0]['message']['content'].strip()
-        else:
-            return "I apologize, but I couldn't analyze the image. Please try again."
+        tasks.append(asyncio.create_task(run()))
+    
+    start(models[:1])
+    hedge_at = time.monotonic() + hedge_delay(models[0], phase, read_timeout)
+    winner = None
+    failed_legs = set()
+    errors: List[OpenRouterError] = []
+    try:
+        while True:
+            waiting_to_hedge = winner is None and len(tasks) == 1
+            try:
+                leg, kind, value = await asyncio.wait_for(
+                    events.get(), max(0.0, hedge_at - time.monotonic()) if waiting_to_hedge else None
+                )
+            except asyncio.TimeoutError:
+                start(models[1:])
+                continue
             
-    except requests.exceptions.RequestException as e:
-        return f"Network error occurred while analyzing image: {str(e)}"
-    except json.JSONDecodeError:
-        return "Error: Invalid response format from the vision API."
-    except Exception as e:
-        return f"An unexpected error occurred during image analysis: {str(e)}"
+            if winner is None:
+                if kind == "error":
+                    failed_legs.add(leg)
+                    errors.extend(getattr(value, "errors", [value]))
+                    if len(tasks) == 1:
+                        start(models[1:])
+                    elif len(failed_legs) == len(tasks):
+                        raise AllModelsFailedError(errors)
+                    continue
+                winner = leg
+                for other, task in enumerate(tasks):
+                    if other != leg:
+                        task.cancel()
+            
+            if leg != winner:
+                continue
+            if kind == "delta":
+                yield value
+            elif kind == "done":
+                outcome.update(value)
+                outcome["fallback_used"] = outcome.get("model") != models[0]
+                outcome["hedge_fired"] = len(tasks) > 1
+                return
+            else:
+                raise value
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def _hedged_complete(models: Sequence[str], build_payload: Callable[[str], Dict[str, Any]],
+                     cache_key_for: Callable[[Dict[str, Any]], Optional[str]], read_timeout: float,
+                     cancelled: Optional[threading.Event] = None) -> Dict[str, Any]:
+    outcome: Dict[str, Any] = {}
+    run_leg = lambda leg_models, leg_cancelled, emit: _complete(leg_models, build_payload, cache_key_for, read_timeout,
+                                                                cancelled=leg_cancelled)
+    for _ in _hedged(models, run_leg, "response", read_timeout, outcome, cancelled=cancelled):
+        pass
+    return outcome
+
+async def _ahedged_complete(models: Sequence[str], build_payload: Callable[[str], Dict[str, Any]],
+                            cache_key_for: Callable[[Dict[str, Any]], Optional[str]], read_timeout: float) -> Dict[str, Any]:
+    outcome: Dict[str, Any] = {}
+    
+    async def run_leg(leg_models, emit):
+        return await _acomplete(leg_models, build_payload, cache_key_for, read_timeout)
+    
+    async for _ in _ahedged(models, run_leg, "response", read_timeout, outcome):
+        pass
+    return outcome
+
+def _hedged_stream(models: Sequence[str], build_payload: Callable[[str], Dict[str, Any]],
+                   cache_key_for: Callable[[Dict[str, Any]], Optional[str]], read_timeout: float,
+                   outcome: Optional[Dict[str, Any]]) -> Iterator[str]:
+    def run_leg(leg_models, cancelled, emit):
+        leg_outcome: Dict[str, Any] = {}
+        deltas = _stream(leg_models, build_payload, cache_key_for, read_timeout, leg_outcome)
+        try:
+            for delta in deltas:
+                if cancelled.is_set():
+                    return None
+                emit(delta)
+        finally:
+            deltas.close()  # Closes the HTTP response of a cancelled leg
+        return leg_outcome
+    
+    yield from _hedged(models, run_leg, "first_token", read_timeout, outcome if outcome is not None else {})
+
+async def _ahedged_stream(models: Sequence[str], build_payload: Callable[[str], Dict[str, Any]],
+                          cache_key_for: Callable[[Dict[str, Any]], Optional[str]], read_timeout: float,
+                          outcome: Optional[Dict[str, Any]]) -> AsyncIterator[str]:
+    async def run_leg(leg_models, emit):
+        leg_outcome: Dict[str, Any] = {}
+        async for delta in _astream(leg_models, build_payload, cache_key_for, read_timeout, leg_outcome):
+            emit(delta)
+        return leg_outcome
+    
+    async for delta in _ahedged(models, run_leg, "first_token", read_timeout, outcome if outcome is not None else {}):
+        yield delta
+
+def stream_text(models: Sequence[str], system_prompt: str, user_prompt: str, use_cache: bool = True,
+                outcome: Optional[Dict[str, Any]] = None, hedge: Optional[bool] = None) -> Iterator[str]:
+    """
+    Stream a text completion, yielding text deltas as they arrive
+    
+    Takes the same arguments as complete_text. Falls back to the next model
+    only while nothing has been yielded yet; a failure after the first token
+    is raised. When given, outcome is filled with the same dict complete_text
+    returns once the stream finishes. Hedged streams race on the first token.
+    """
+    build_payload, cache_key_for = _text_request(system_prompt, user_prompt, use_cache)
+    if _should_hedge(models, hedge):
+        yield from _hedged_stream(models, build_payload, cache_key_for, 30, outcome)
+        return
+    yield from _stream(models, build_payload, cache_key_for, 30, outcome)
+
+def stream_vision(models: Sequence[str], system_prompt: str, user_prompt: str, image: Union[bytes, str],
+                  use_cache: bool = True, outcome: Optional[Dict[str, Any]] = None,
+                  hedge: Optional[bool] = None) -> Iterator[str]:
+    """
+    Stream a vision completion, yielding text deltas as they arrive
+    
+    Takes the same arguments as complete_vision, plus outcome (see stream_text).
+    """
+    build_payload, cache_key_for = _vision_request(system_prompt, user_prompt, image, use_cache)
+    if _should_hedge(models, hedge):
+        yield from _hedged_stream(models, build_payload, cache_key_for, 45, outcome)
+        return
+    yield from _stream(models, build_payload, cache_key_for, 45, outcome)
+
+async def astream_text(models: Sequence[str], system_prompt: str, user_prompt: str, use_cache: bool = True,
+                       outcome: Optional[Dict[str, Any]] = None, hedge: Optional[bool] = None) -> AsyncIterator[str]:
+    """Async variant of stream_text"""
+    build_payload, cache_key_for = _text_request(system_prompt, user_prompt, use_cache)
+    run = _ahedged_stream if _should_hedge(models, hedge) else _astream
+    async for delta in run(models, build_payload, cache_key_for, 30, outcome):
+        yield delta
+
+async def astream_vision(models: Sequence[str], system_prompt: str, user_prompt: str, image: Union[bytes, str],
+                         use_cache: bool = True, outcome: Optional[Dict[str, Any]] = None,
+                         hedge: Optional[bool] = None) -> AsyncIterator[str]:
+    """Async variant of stream_vision"""
+    build_payload, cache_key_for = _vision_request(system_prompt, user_prompt, image, use_cache)
+    run = _ahedged_stream if _should_hedge(models, hedge) else _astream
+    async for delta in run(models, build_payload, cache_key_for, 45, outcome):
+        yield delta
 
 def test_openrouter_connection() -> bool:
     """
@@ -147,7 +799,8 @@ def test_openrouter_connection() -> bool:
         response = call_text_model(
             model="mistralai/mistral-small-3.2-24b-instruct:free",
             system_prompt="You are a helpful assistant.",
-            user_prompt="Say 'Hello, OpenRouter is working!' and nothing else."
+            user_prompt="Say 'Hello, OpenRouter is working!' and nothing else.",
+            use_cache=False
         )
         
         return "Hello, OpenRouter is working!" in response
@@ -161,15 +814,8 @@ def get_available_models() -> list:
     Get list of available models from OpenRouter
     Note: This is optional and mainly for debugging
     """
-    url = "https://openrouter.ai/api/v1/models"
-    
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = client.get("/models", read_timeout=10)
         response.raise_for_status()
         
         result = response.json()
@@ -0,0 +1,271 @@
+# utils/openrouter_retry.py - Typed OpenRouter failures, retry policy and model fallback
+import os
+import json
+import random
+import time
+import threading
+import email.utils
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence
+
+import httpx
+import requests
+
+from utils.model_registry import model_registry
+
+MAX_RETRIES = int(os.getenv("OPENROUTER_MAX_RETRIES", 2))                # Extra attempts per model
+BACKOFF_BASE = float(os.getenv("OPENROUTER_BACKOFF_BASE", 0.5))          # Seconds
+BACKOFF_MAX = float(os.getenv("OPENROUTER_BACKOFF_MAX", 8))              # Seconds
+# A Retry-After longer than this moves on to the next model instead of waiting
+MAX_RETRY_AFTER = float(os.getenv("OPENROUTER_MAX_RETRY_AFTER", 10))    # Seconds
+# Upper bound on one completion across all retries and fallback models
+TOTAL_TIMEOUT = float(os.getenv("OPENROUTER_TOTAL_TIMEOUT", 90))         # Seconds
+
+class OpenRouterError(Exception):
+    """
+    A failed OpenRouter completion
+
+    retryable tells the call layer whether the same model may succeed if
+    asked again after a backoff; otherwise it falls back to the next model.
+    """
+
+    def __init__(self, message: str, model: Optional[str] = None, status: Optional[int] = None,
+                 retryable: bool = False):
+        super().__init__(message)
+        self.model = model
+        self.status = status
+        self.retryable = retryable
+
+class RateLimitError(OpenRouterError):
+    """HTTP 429 from OpenRouter or the upstream provider"""
+
+    def __init__(self, message: str, model: Optional[str] = None, retry_after: Optional[float] = None):
+        super().__init__(message, model=model, status=429, retryable=True)
+        self.retry_after = retry_after
+
+class ModelTimeoutError(OpenRouterError):
+    """The model did not answer within the read timeout (stalled provider)"""
+
+    def __init__(self, message: str, model: Optional[str] = None):
+        # Stalls tend to repeat, so go straight to the next model
+        super().__init__(message, model=model, retryable=False)
+
+class CircuitOpenError(OpenRouterError):
+    """Every model in the chain has an open circuit breaker, so nothing was sent"""
+
+class EmptyResponseError(OpenRouterError):
+    """The API answered without any message content"""
+
+class RequestCancelledError(OpenRouterError):
+    """The caller stopped waiting (a losing hedge leg, a timed out branch); nothing was recorded"""
+
+class AllModelsFailedError(OpenRouterError):
+    """Every model in the fallback chain failed; errors holds one entry per attempt"""
+
+    def __init__(self, errors: List[OpenRouterError]):
+        last = errors[-1] if errors else None
+        tried = ", ".join(dict.fromkeys(error.model for error in errors if error.model))
+        super().__init__(f"All models failed ({tried}): {last}", model=last.model if last else None,
+                         status=last.status if last else None)
+        self.errors = errors
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def error_from_status(status: int, message: str, model: Optional[str] = None,
+                      headers: Optional[Mapping[str, str]] = None) -> OpenRouterError:
+    """Typed error for an HTTP status (or an error code inside a 200 body)"""
+    if status == 429:
+        return RateLimitError(f"Rate limited: {message}", model=model,
+                              retry_after=parse_retry_after(headers or {}))
+    if status in (408, 504, 524):
+        return ModelTimeoutError(f"Provider timed out: {message}", model=model)
+    # 502/503 are transient provider outages; other 4xx will fail the same way again
+    return OpenRouterError(f"HTTP {status}: {message}", model=model, status=status,
+                           retryable=status >= 500)
+
+def _error_message(body: Any) -> str:
+    if isinstance(body, dict) and isinstance(body.get("error"), dict):
+        return str(body["error"].get("message", body["error"]))
+    return str(body)[:200]
+
+def check_response(response: Any, model: str) -> None:
+    """Raise a typed error for a failed requests/httpx response"""
+    if response.status_code < 400:
+        return
+    try:
+        message = _error_message(response.json())
+    except Exception:
+        message = ""
+    if not message or message == "{}":
+        message = getattr(response, "reason_phrase", None) or getattr(response, "reason", "") or "no details"
+    raise error_from_status(response.status_code, message, model=model, headers=response.headers)
+
+def check_body(result: Any, model: str) -> None:
+    """OpenRouter reports some upstream failures as an "error" object in a 200 body"""
+    if isinstance(result, dict) and isinstance(result.get("error"), dict):
+        code = result["error"].get("code")
+        status = code if isinstance(code, int) else 502
+        raise error_from_status(status, _error_message(result), model=model)
+
+def as_openrouter_error(error: Exception, model: str) -> OpenRouterError:
+    """Map transport and parsing exceptions from requests/httpx to typed errors"""
+    if isinstance(error, OpenRouterError):
+        if error.model is None:
+            error.model = model
+        return error
+    if isinstance(error, (requests.exceptions.Timeout, httpx.TimeoutException)):
+        return ModelTimeoutError(f"Timed out: {error}", model=model)
+    if isinstance(error, (requests.exceptions.ConnectionError, httpx.TransportError)):
+        return OpenRouterError(f"Network error occurred: {error}", model=model, retryable=True)
+    if isinstance(error, json.JSONDecodeError):
+        return OpenRouterError("Invalid response format from the API", model=model)
+    return OpenRouterError(f"Unexpected error: {error}", model=model)
+
+def retry_delay(error: OpenRouterError, attempt: int) -> Optional[float]:
+    """
+    Seconds to wait before retrying the same model, or None to fall back
+
+    Full-jitter exponential backoff; a Retry-After header sets the minimum
+    wait, and one longer than MAX_RETRY_AFTER skips to the next model.
+    """
+    if not error.retryable or attempt >= MAX_RETRIES:
+        return None
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        if retry_after > MAX_RETRY_AFTER:
+            return None
+        delay = max(delay, retry_after)
+    return delay
+
+class FallbackChain:
+    """
+    Attempt bookkeeping for one completion across an ordered list of models
+
+    Usage (the sync, async and streaming call paths share this loop shape):
+
+        chain = FallbackChain(models, read_timeout=30)
+        for model in chain.models:
+            for attempt in chain.tries(model):
+                try:
+                    ...
+                    return chain.result(content, model)
+                except Exception as e:
+                    delay = chain.failed(e, model, attempt)
+                    if delay is None:
+                        break          # next model
+                    chain.wait(delay)  # or await asyncio.sleep(delay)
+        raise chain.failure()
+
+    cancelled, when given, is checked before every attempt and ends backoff
+    waits early; the call paths then give up through abandon().
+    """
+
+    def __init__(self, models: Sequence[str], read_timeout: float, total_timeout: float = TOTAL_TIMEOUT,
+                 cancelled: Optional[threading.Event] = None):
+        if not models:
+            raise ValueError("At least one model is required")
+        self.requested = list(models)
+        # Skip models whose circuit breaker is open; a half-open probe slot is only
+        # claimed in tries(), so models the chain never reaches keep theirs free
+        self.models = [model for model in models if model_registry.allow_request(model, claim_probe=False)]
+        self.base_read_timeout = read_timeout
+        self.deadline = time.monotonic() + total_timeout
+        self.errors: List[OpenRouterError] = []
+        self.attempts = 0
+        self.refused: List[str] = []
+        self.cancelled = cancelled
+
+    def tries(self, model: str) -> Iterator[int]:
+        """
+        Attempt numbers for model while the overall budget lasts
+
+        The breaker is checked (and a half-open probe slot claimed) just before
+        the first attempt; every attempt then records success or failure.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            if time.monotonic() >= self.deadline or self.is_cancelled():
+                return
+            if attempt == 0 and not model_registry.allow_request(model):
+                self.refused.append(model)  # Another request is probing it
+                return
+            self.attempts += 1
+            yield attempt
+
+    def is_cancelled(self) -> bool:
+        return self.cancelled is not None and self.cancelled.is_set()
+
+    def wait(self, delay: float) -> None:
+        """Backoff sleep that ends as soon as the request is cancelled"""
+        if self.cancelled is None:
+            time.sleep(delay)
+        else:
+            self.cancelled.wait(delay)
+
+    def abandon(self, model: str) -> "RequestCancelledError":
+        """
+        Give up on a cancelled request mid-attempt
+
+        Nobody is waiting for the answer, so no success, failure or latency
+        sample is recorded; only a claimed half-open probe slot is released.
+        """
+        model_registry.release_probe(model)
+        return RequestCancelledError("Request cancelled", model=model)
+
+    def read_timeout(self) -> float:
+        """Per-request read timeout, capped by what is left of the overall budget"""
+        return max(0.1, min(self.base_read_timeout, self.deadline - time.monotonic()))
+
+    def failed(self, error: Exception, model: str, attempt: int) -> Optional[float]:
+        """
+        Record a failed attempt; returns the backoff delay, or None to fall back
+
+        Nothing is printed per attempt (a 429 storm would flood stdout); the
+        model registry counts errors, rate limits and timeouts for /metrics,
+        and failure() prints once if the whole chain fails.
+        """
+        error = as_openrouter_error(error, model)
+        self.errors.append(error)
+        delay = retry_delay(error, attempt)
+        if delay is None or delay >= self.deadline - time.monotonic():
+            return None
+        return delay
+
+    def result(self, content: str, model: str, cached: bool = False) -> Dict[str, Any]:
+        """Completion dict returned by the complete_* functions"""
+        return {
+            "content": content,
+            "model": model,
+            "attempts": self.attempts,
+            "cached": cached,
+            "fallback_used": model != self.requested[0]
+        }
+
+    def failure(self) -> OpenRouterError:
+        """Error to raise once every model has been tried"""
+        if self.is_cancelled():
+            return RequestCancelledError("Request cancelled", model=self.requested[0])
+        error = self._final_error()
+        print(f"OpenRouter request failed after {self.attempts} attempts ({', '.join(self.requested)}): {error}")
+        return error
+
+    def _final_error(self) -> OpenRouterError:
+        if not self.models or (not self.errors and self.refused):
+            return CircuitOpenError(f"Circuit open for all models: {', '.join(self.requested)}",
+                                    model=self.requested[0])
+        if not self.errors:
+            return ModelTimeoutError("Retry budget exhausted before any attempt", model=self.models[0])
+        if len(self.requested) == 1:
+            return self.errors[-1]
+        return AllModelsFailedError(self.errors)
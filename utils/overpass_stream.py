@@ -0,0 +1,261 @@
+# utils/overpass_stream.py - Incremental parsing of large Overpass responses
+"""
+Stream the "elements" array of an Overpass JSON response and keep only the
+k closest candidates while parsing.
+
+Parsing the whole payload with response.json() materializes every element as
+a dict before anything is ranked. Here each element is decoded as soon as its
+bytes arrive, distances are computed a batch at a time, and a bounded heap
+holds the k best, so peak memory tracks k and the batch size instead of the
+response size.
+
+Benchmark against the full-parse path on a recorded dump (or a synthetic one):
+    python -m utils.overpass_stream [overpass_dump.json]
+"""
+import codecs
+import heapq
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from utils.geo import haversine_km
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+def iter_array_items(chunks: Iterable[bytes], key: str = "elements") -> Iterator[Any]:
+    """
+    Yield the items of the top-level JSON array stored under `key`, one at a time
+
+    Args:
+        chunks: Raw response bytes in arbitrary pieces (e.g. response.iter_content())
+        key: Name of the array field to stream
+    """
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunk_iter = iter(chunks)
+    buffer = ""
+    exhausted = False
+
+    def read_more() -> bool:
+        nonlocal buffer, exhausted
+        for chunk in chunk_iter:
+            if chunk:
+                buffer += text_decoder.decode(chunk)
+                return True
+        buffer += text_decoder.decode(b"", final=True)
+        exhausted = True
+        return False
+
+    # Find the start of the array: "<key>" ws ":" ws "["
+    marker = f'"{key}"'
+    search_from = 0
+    while True:
+        found = buffer.find(marker, search_from)
+        if found != -1:
+            pos = found + len(marker)
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) and buffer[pos] != ":":
+                # The name appeared as a string value, not a field name
+                search_from = found + 1
+                continue
+            pos += 1
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                if buffer[pos] != "[":
+                    raise ValueError(f'"{key}" is not a JSON array')
+                buffer = buffer[pos + 1:]
+                break
+        else:
+            # Keep enough text to match a marker split across chunks
+            search_from = max(0, len(buffer) - len(marker))
+        if exhausted or not read_more():
+            if found == -1:
+                return  # No such array in the payload
+            raise ValueError("Truncated JSON before array start")
+
+    pos = 0
+    while True:
+        # Skip separators between items
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE + ",":
+                pos += 1
+            if pos < len(buffer) or exhausted:
+                break
+            buffer = buffer[pos:]
+            pos = 0
+            read_more()
+
+        if pos >= len(buffer):
+            raise ValueError("Truncated JSON inside array")
+        if buffer[pos] == "]":
+            return
+
+        try:
+            item, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Item is split across chunks; drop consumed text and read more
+            if exhausted:
+                raise
+            buffer = buffer[pos:]
+            pos = 0
+            read_more()
+            continue
+
+        if (not exhausted and not isinstance(item, (dict, list, str))
+                and (end == len(buffer) or buffer[end] not in _WHITESPACE + ",]")):
+            # A number or literal may continue in the next chunk
+            buffer = buffer[pos:]
+            pos = 0
+            read_more()
+            continue
+
+        yield item
+        pos = end
+
+def closest_k(items: Iterable[Any], lat: float, lon: float, k: int,
+              coordinates: Callable[[Any], Optional[Tuple[float, float]]],
+              batch_size: int = 512) -> List[Tuple[float, Any, float, float]]:
+    """
+    Keep the k items closest to (lat, lon) from a stream
+
+    Args:
+        items: Any iterable, typically iter_array_items(...)
+        coordinates: Returns (lat, lon) for an item, or None to skip it
+        batch_size: Items buffered per vectorized distance computation
+
+    Returns:
+        (distance_km, item, lat, lon) tuples, closest first
+    """
+    heap: List[Tuple[float, int, Any, float, float]] = []  # max-heap via negated distance
+    batch: List[Any] = []
+    lats: List[float] = []
+    lons: List[float] = []
+    seq = 0
+
+    def flush() -> None:
+        nonlocal seq
+        if not batch:
+            return
+        distances = haversine_km(lat, lon, np.array(lats), np.array(lons))
+        for distance, item, item_lat, item_lon in zip(distances.tolist(), batch, lats, lons):
+            entry = (-distance, seq, item, item_lat, item_lon)
+            seq += 1
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif -distance > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+        batch.clear()
+        lats.clear()
+        lons.clear()
+
+    for item in items:
+        point = coordinates(item)
+        if point is None:
+            continue
+        batch.append(item)
+        lats.append(point[0])
+        lons.append(point[1])
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    ranked = sorted(heap, key=lambda entry: (-entry[0], entry[1]))
+    return [(-neg_distance, item, item_lat, item_lon)
+            for neg_distance, _, item, item_lat, item_lon in ranked]
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def write_synthetic_overpass_dump(path: str, n_elements: int = 200_000,
+                                  lat: float = 28.6139, lon: float = 77.2090) -> None:
+    """Write an Overpass-shaped JSON file with n_elements facilities around (lat, lon)"""
+    rng = np.random.default_rng(42)
+    lats = lat + rng.uniform(-0.135, 0.135, n_elements)
+    lons = lon + rng.uniform(-0.15, 0.15, n_elements)
+    amenities = ["hospital", "clinic", "doctors"]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"version": 0.6, "generator": "synthetic", "elements": [\n')
+        for i in range(n_elements):
+            tags = {
+                "amenity": amenities[i % 3],
+                "name": f"Facility {i}",
+                "addr:street": f"Road {i % 97}",
+                "phone": f"+91-11-{20000000 + i}"
+            }
+            if i % 5 == 0:
+                element = {"type": "way", "id": i, "center": {"lat": lats[i], "lon": lons[i]},
+                           "nodes": list(range(i, i + 6)), "tags": tags}
+            else:
+                element = {"type": "node", "id": i, "lat": lats[i], "lon": lons[i], "tags": tags}
+            f.write(("," if i else "") + json.dumps(element) + "\n")
+        f.write("]}\n")
+
+def _iter_file_chunks(path: str, chunk_size: int = 65536) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+def benchmark_overpass_parsing(path: Optional[str] = None, k: int = 10,
+                               lat: float = 28.6139, lon: float = 77.2090) -> None:
+    """
+    Compare response.json()-style full parsing with the streaming path (time and peak memory)
+
+    Both rank with closest_k and overpass_candidate, so only the parsing differs.
+    """
+    from utils.clinic_finder import overpass_candidate
+
+    cleanup = False
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        write_synthetic_overpass_dump(path)
+        cleanup = True
+
+    try:
+        size_mb = os.path.getsize(path) / 1e6
+
+        def run_full():
+            with open(path, "rb") as f:
+                data = json.loads(f.read())
+            return closest_k(iter(data.get("elements", [])), lat, lon, k, overpass_candidate)
+
+        def run_streaming():
+            return closest_k(iter_array_items(_iter_file_chunks(path)), lat, lon, k, overpass_candidate)
+
+        def measure(run):
+            # Time without tracemalloc (it slows allocations), then measure peak memory separately
+            start = time.perf_counter()
+            result = run()
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return result, elapsed, peak
+
+        full, full_time, full_peak = measure(run_full)
+        streamed, stream_time, stream_peak = measure(run_streaming)
+
+        same = [item["tags"]["name"] for _, item, _, _ in full] == [item["tags"]["name"] for _, item, _, _ in streamed]
+        print(f"Payload: {size_mb:.1f} MB, k={k}")
+        print(f"Full parse:  {full_time * 1000:8.1f} ms, peak {full_peak / 1e6:8.1f} MB")
+        print(f"Streaming:   {stream_time * 1000:8.1f} ms, peak {stream_peak / 1e6:8.1f} MB")
+        print(f"Same top-{k}: {same}")
+    finally:
+        if cleanup:
+            os.remove(path)
+
+if __name__ == "__main__":
+    benchmark_overpass_parsing(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,69 @@
+# utils/rate_limiter.py - Process-wide token-bucket rate limiting per upstream host
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Requests per second and burst size for each upstream host. Nominatim's usage
+# policy allows at most one request per second; Overpass asks for restraint too.
+DEFAULT_RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "nominatim.openstreetmap.org": (float(os.getenv("ECOSYNC_NOMINATIM_RPS", 1.0)), 1),
+    "overpass-api.de": (float(os.getenv("ECOSYNC_OVERPASS_RPS", 0.5)), 1),
+}
+
+class TokenBucket:
+    """
+    Thread-safe token bucket
+
+    Tokens refill continuously at `rate` per second up to `capacity`. Callers
+    block in acquire() until a token is free, so concurrent callers share the
+    budget instead of each sleeping on their own.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Take tokens, waiting for them to refill if necessary
+
+        Returns:
+            True once the tokens were taken, False if timeout expired first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(host: str) -> TokenBucket:
+    """Return the shared token bucket for an upstream host, creating it on first use"""
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            rate, capacity = DEFAULT_RATE_LIMITS.get(host, (1.0, 1))
+            limiter = TokenBucket(rate, capacity)
+            _limiters[host] = limiter
+        return limiter
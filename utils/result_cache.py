@@ -0,0 +1,171 @@
+# utils/result_cache.py - In-process result cache with stale-while-revalidate and singleflight
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+class StaleWhileRevalidateCache:
+    """
+    Bounded in-memory cache for expensive lookups
+
+    - Fresh entries (younger than ttl) are returned directly.
+    - Stale entries (up to ttl + stale_ttl old) are returned immediately while
+      a single background refresh reloads them.
+    - Concurrent misses for the same key wait on one in-flight load
+      (singleflight), so only one upstream request goes out.
+    - Values failing the optional cacheable check (e.g. placeholder results
+      from a failed upstream) are returned but never stored, and never
+      replace a stale entry; the next lookup tries again.
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float, max_entries: int = 256,
+                 refresh_workers: int = 2):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, loaded_at)
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=refresh_workers,
+                                                thread_name_prefix=f"{name}-refresh")
+        self._counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "uncacheable": 0
+        }
+
+    def get(self, key: str, loader: Callable[[], Any],
+            cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Return the value for key, calling loader() only when it must be (re)loaded"""
+        owner = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, loaded_at = entry
+                age = time.time() - loaded_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["stale_hits"] += 1
+                    if key not in self._in_flight:
+                        self._counters["refreshes"] += 1
+                        self._in_flight[key] = self._refresh_pool.submit(self._load, key, loader, cacheable)
+                    return value
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._counters["coalesced"] += 1
+            else:
+                self._counters["misses"] += 1
+                future = Future()
+                self._in_flight[key] = future
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        # This caller owns the load; everyone else waits on the same future, which
+        # is always resolved (a failing loader or cacheable check reaches them too)
+        try:
+            value = loader()
+            self._store(key, value, cacheable)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        return value
+
+    def _load(self, key: str, loader: Callable[[], Any], cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Background refresh: reload and store, keeping the stale value on failure"""
+        try:
+            value = loader()
+            self._store(key, value, cacheable)
+        except Exception as e:
+            print(f"{self.name} refresh failed for {key}: {e}")
+            with self._lock:
+                self._counters["refresh_errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        return value
+
+    def _store(self, key: str, value: Any, cacheable: Optional[Callable[[Any], bool]] = None) -> None:
+        with self._lock:
+            if cacheable is not None and not cacheable(value):
+                self._counters["uncacheable"] += 1
+                return
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        """Drop a single entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters since process start plus current entry count"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["in_flight"] = len(self._in_flight)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = (stats["hits"] + stats["stale_hits"]) / lookups if lookups else 0.0
+        return stats
+
+def check_failing_cacheable() -> None:
+    """
+    A cacheable check that raises must not strand the in-flight load
+
+    The owner and every coalesced waiter get the error, and the next lookup
+    for the key loads again instead of waiting on a dead future.
+    """
+    cache = StaleWhileRevalidateCache("check", ttl=60, stale_ttl=60)
+    release = threading.Event()
+
+    def slow_loader():
+        release.wait(5)
+        return ["clinic"]
+
+    def broken_check(value):
+        raise ValueError("cacheable check failed")
+
+    outcomes = []
+
+    def lookup():
+        try:
+            outcomes.append(cache.get("Chennai", slow_loader, cacheable=broken_check))
+        except ValueError as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=lookup, daemon=True) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)  # Let the waiters coalesce on the owner's load
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert not any(thread.is_alive() for thread in threads), "a waiter is still blocked on the in-flight load"
+    assert len(outcomes) == 4 and all(isinstance(outcome, ValueError) for outcome in outcomes), outcomes
+    assert cache.stats()["in_flight"] == 0
+
+    assert cache.get("Chennai", lambda: ["clinic"]) == ["clinic"], "the key stayed stuck after the failure"
+    print("result cache: failing cacheable check resolves every waiter")
+
+if __name__ == "__main__":
+    check_failing_cacheable()
@@ -0,0 +1,273 @@
+# utils/semantic_cache.py - Near-duplicate question cache for the Eco Chatbot
+"""
+Answer paraphrased questions from earlier answers without another LLM call.
+
+Each normalized question becomes a MinHash signature over word and character
+n-gram shingles. Signatures are split into LSH bands; questions sharing any
+band with a new one are the only candidates, and their Jaccard similarity is
+estimated in one vectorized comparison. Lookup cost depends on the number of
+candidates, not the number of cached entries, so it stays sub-millisecond at
+100k entries.
+
+A changed negation flips the meaning while barely moving the similarity
+("Is this water safe to swim in?" vs "... unsafe ..." is ~0.81), so entries
+only match questions with the same polarity terms (not/no/never, un-/non-
+words).
+
+Changed specifics barely move it either: "Does flooding cause deforestation?"
+vs "Does deforestation cause flooding?" is ~0.89 and "... in the Coral Sea?"
+vs "... in the Red Sea?" ~0.80. A candidate over the threshold is therefore
+only served if both questions have the same content words in the same order,
+up to inflections ("sea level" / "sea levels"); questions that differ only in
+filler words still match.
+
+Checks and benchmark:
+    python -m utils.semantic_cache
+"""
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SEMANTIC_CACHE_ENABLED = os.getenv("ECOSYNC_SEMANTIC_CACHE", "1") != "0"
+SIMILARITY_THRESHOLD = float(os.getenv("ECOSYNC_SEMANTIC_CACHE_THRESHOLD", 0.75))
+MAX_ENTRIES = int(os.getenv("ECOSYNC_SEMANTIC_CACHE_MAX_ENTRIES", 100_000))
+
+NUM_PERMUTATIONS = 64
+BANDS = 16                     # 16 bands x 4 rows: ~50% candidate chance at Jaccard 0.5
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, (1 << 32) - 1, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, (1 << 32) - 1, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "of", "to", "in", "on", "for",
+    "and", "or", "what", "whats", "how", "why", "does", "do", "can", "could", "please",
+    "tell", "me", "about", "explain", "i", "you", "it", "this", "that", "with",
+    "so", "very", "really", "just", "my", "your", "main"
+}
+
+# Negations, including the stems left when "don't", "isn't", ... are split at the apostrophe
+_NEGATIONS = {
+    "not", "no", "never", "nor", "none", "nothing", "without", "cannot", "cant",
+    "don", "dont", "doesn", "doesnt", "isn", "isnt", "aren", "arent", "wasn", "wasnt",
+    "shouldn", "shouldnt", "won", "wont"
+}
+_NEGATING_PREFIXES = ("un", "non")
+
+def polarity_terms(text: str) -> frozenset:
+    """Negations and un-/non- words of a question; a cached answer only serves the same set"""
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    return frozenset(
+        token for token in tokens
+        if token in _NEGATIONS or (len(token) > 4 and token.startswith(_NEGATING_PREFIXES))
+    )
+
+def normalize_question(text: str) -> List[str]:
+    """Lowercase, strip punctuation and filler words"""
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    return [token for token in tokens if token not in _STOPWORDS]
+
+def _same_word(a: str, b: str) -> bool:
+    """Equal, or inflections of one word ("level" / "levels", "cause" / "causes")"""
+    if a == b:
+        return True
+    return min(len(a), len(b)) >= 4 and abs(len(a) - len(b)) <= 2 and (a.startswith(b) or b.startswith(a))
+
+def same_specifics(tokens: List[str], other: List[str]) -> bool:
+    """
+    Whether two normalized questions ask about the same things
+
+    Every content word needs a counterpart at the same position, so a
+    swapped subject and object or a different place breaks the match.
+    """
+    return len(tokens) == len(other) and all(_same_word(a, b) for a, b in zip(tokens, other))
+
+def shingles(tokens: List[str]) -> List[str]:
+    """Word unigrams, word bigrams and character trigrams of each word"""
+    result = list(tokens)
+    result.extend(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    for token in tokens:
+        padded = f"#{token}#"
+        result.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """MinHash signature of a question, or None if nothing meaningful is left"""
+    return _signature(normalize_question(text))
+
+def _signature(tokens: List[str]) -> Optional[np.ndarray]:
+    items = set(shingles(tokens))
+    if not items:
+        return None
+    hashes = np.fromiter((zlib.crc32(item.encode("utf-8")) for item in items),
+                         dtype=np.uint64, count=len(items))
+    # (a * x + b) mod p for every permutation and shingle at once, then min per permutation
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return (permuted & _MAX_HASH).min(axis=1).astype(np.uint32)
+
+def _band_keys(signature: np.ndarray) -> List[Tuple[int, bytes]]:
+    return [(band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes())
+            for band in range(BANDS)]
+
+class SemanticCache:
+    """
+    Bounded MinHash-LSH cache of answers, scoped per namespace (e.g. health_type)
+
+    Entries are evicted oldest-first once max_entries is reached.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, max_entries: int = MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._signatures = np.zeros((max_entries, NUM_PERMUTATIONS), dtype=np.uint32)
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()  # slot -> entry
+        self._buckets: Dict[Tuple[Tuple[str, frozenset], int, bytes], set] = defaultdict(set)
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def lookup(self, namespace: str, question: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached entry closest to question if it clears the threshold
+
+        The returned dict has "answer", "question" and "similarity".
+        """
+        tokens = normalize_question(question)
+        signature = _signature(tokens)
+        if signature is None:
+            return None
+        # Questions with different negations live in separate buckets and never become candidates
+        scope = (namespace, polarity_terms(question))
+
+        with self._lock:
+            candidates = set()
+            for band, key in _band_keys(signature):
+                candidates.update(self._buckets.get((scope, band, key), ()))
+            if not candidates:
+                self._misses += 1
+                return None
+
+            slots = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+            similarity = (self._signatures[slots] == signature).mean(axis=1)
+            # Most similar first; a close match about different things is skipped
+            for best in np.argsort(-similarity, kind="stable"):
+                if similarity[best] < self.threshold:
+                    break
+                slot = int(slots[best])
+                entry = self._entries[slot]
+                if not same_specifics(tokens, entry["tokens"]):
+                    continue
+                self._entries.move_to_end(slot)
+                self._hits += 1
+                return {"answer": entry["answer"], "question": entry["question"],
+                        "similarity": float(similarity[best])}
+            self._misses += 1
+            return None
+
+    def store(self, namespace: str, question: str, answer: str) -> None:
+        """Remember an answer for a question in a namespace"""
+        tokens = normalize_question(question)
+        signature = _signature(tokens)
+        if signature is None or not answer:
+            return
+
+        with self._lock:
+            if not self._free_slots:
+                self._evict_oldest()
+            slot = self._free_slots.pop()
+            self._signatures[slot] = signature
+            scope = (namespace, polarity_terms(question))
+            bands = [(scope, band, key) for band, key in _band_keys(signature)]
+            for bucket in bands:
+                self._buckets[bucket].add(slot)
+            self._entries[slot] = {"question": question, "tokens": tokens, "answer": answer, "bands": bands}
+
+    def _evict_oldest(self) -> None:
+        slot, entry = self._entries.popitem(last=False)
+        for bucket in entry["bands"]:
+            members = self._buckets.get(bucket)
+            if members is not None:
+                members.discard(slot)
+                if not members:
+                    del self._buckets[bucket]
+        self._free_slots.append(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and entry count"""
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "entries": len(self._entries)
+        }
+
+# Shared by all sessions in this process
+chatbot_semantic_cache = SemanticCache()
+
+def get_semantic_cache_stats() -> Dict[str, Any]:
+    """Counters of the chatbot's semantic cache"""
+    return chatbot_semantic_cache.stats()
+
+# (cached question, new question, should the cached answer be served)
+CHECK_PAIRS = [
+    ("What is ocean acidification?", "Could you explain ocean acidification?", True),
+    ("Why are mangrove forests important?", "why are mangrove forests so important", True),
+    ("How does climate change affect sea levels?", "How does climate change affect the sea level?", True),
+    # Negations
+    ("Is this water safe to swim in?", "Is this water unsafe to swim in?", False),
+    ("Is this water safe to swim in?", "Is this water not safe to swim in?", False),
+    ("Should I eat fish from this river?", "Shouldn't I eat fish from this river?", False),
+    # Same words, different specifics
+    ("Does deforestation cause flooding?", "Does flooding cause deforestation?", False),
+    ("What causes coral bleaching in the Red Sea?", "What causes coral bleaching in the Coral Sea?", False),
+    ("What is the air quality in Delhi?", "What is the air quality in Mumbai?", False)
+]
+
+def check_semantic_cache() -> None:
+    """Raise AssertionError if a CHECK_PAIRS question is served the wrong cached answer"""
+    for cached_question, question, should_hit in CHECK_PAIRS:
+        cache = SemanticCache(max_entries=16)
+        cache.store("environmental", cached_question, "cached answer")
+        hit = cache.lookup("environmental", question) is not None
+        assert hit == should_hit, f"{question!r} vs cached {cached_question!r}: hit={hit}, expected {should_hit}"
+    print(f"Semantic cache checks passed ({len(CHECK_PAIRS)} pairs)")
+
+def benchmark_semantic_cache(n_entries: int = 100_000, n_queries: int = 1000) -> None:
+    """Fill a cache with n_entries synthetic questions and time lookups"""
+    topics = ["ocean acidification", "coral bleaching", "plastic pollution", "deforestation",
+              "climate change", "air quality", "biodiversity loss", "overfishing", "wetlands",
+              "renewable energy", "soil erosion", "mangrove forests", "sea level rise"]
+    forms = ["what is {t} in region {i}", "effects of {t} near site {i}",
+             "how does {t} affect species {i}", "solutions for {t} in city {i}"]
+
+    cache = SemanticCache(max_entries=n_entries)
+    start = time.perf_counter()
+    for i in range(n_entries):
+        question = forms[i % len(forms)].format(t=topics[i % len(topics)], i=i)
+        cache.store("environmental", question, f"answer {i}")
+    fill_time = time.perf_counter() - start
+
+    # Paraphrases of the "what is" entries, so every lookup goes through candidate scoring
+    queries = [f"Could you explain {topics[i % len(topics)]} in region {i}?"
+               for i in range(0, n_queries * len(forms), len(forms))]
+    start = time.perf_counter()
+    hits = sum(1 for question in queries if cache.lookup("environmental", question))
+    per_query_ms = (time.perf_counter() - start) / n_queries * 1000
+
+    print(f"Filled {n_entries} entries in {fill_time:.1f} s")
+    print(f"Lookup: {per_query_ms:.3f} ms/query ({hits}/{n_queries} hits)")
+
+if __name__ == "__main__":
+    check_semantic_cache()
+    benchmark_semantic_cache()
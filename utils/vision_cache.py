@@ -0,0 +1,228 @@
+# utils/vision_cache.py - Perceptual-hash cache of vision agent analyses
+"""
+Re-uploads of the same photo, or a re-saved, resized or lightly cropped copy,
+reuse the earlier analysis instead of another 45 s vision call.
+
+Images are keyed by a 64-bit difference hash (dHash) of the preprocessed
+JPEG. Near-duplicates differ in a few bits, so lookups accept any entry
+within HAMMING_THRESHOLD bits for the same (agent, health_type, prompt).
+The hash is split into 8 one-byte bands stored in indexed columns: two
+hashes within 7 bits of each other must agree on at least one band
+(pigeonhole), so SQLite only returns those candidates and NumPy computes
+their exact distances.
+"""
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+from io import BytesIO
+from typing import Any, Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+from utils.disk_cache import CACHE_DIR
+from utils.llm_cache import cache_enabled_for
+
+VISION_CACHE_ENABLED = os.getenv("ECOSYNC_VISION_CACHE", "1") != "0"
+VISION_CACHE_TTL = float(os.getenv("ECOSYNC_VISION_CACHE_TTL", 30 * 24 * 3600))
+VISION_CACHE_MAX_ENTRIES = int(os.getenv("ECOSYNC_VISION_CACHE_MAX_ENTRIES", 2000))
+HAMMING_THRESHOLD = int(os.getenv("ECOSYNC_VISION_CACHE_HAMMING", 6))   # Bits out of 64
+
+BANDS = 8
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def dhash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """64-bit difference hash: is each pixel brighter than its right neighbour, on a 9x8 grayscale thumbnail"""
+    image = Image.open(BytesIO(image_bytes))
+    image.draft("L", (hash_size * 4, hash_size * 4))  # JPEG: decode at 1/8 scale
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int(np.packbits(bits.ravel()).view(">u8")[0])
+
+def safe_dhash(image_bytes: bytes) -> Optional[int]:
+    """dHash of an image, or None if it cannot be decoded"""
+    try:
+        return dhash(image_bytes)
+    except Exception as e:
+        print(f"Could not hash image for the vision cache: {e}")
+        return None
+
+def hamming_distances(hashes: np.ndarray, image_hash: int) -> np.ndarray:
+    """Bit distance from image_hash to each uint64 in hashes"""
+    xor = hashes.astype(np.uint64) ^ np.uint64(image_hash)
+    return _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+def _bands(image_hash: int):
+    return [(image_hash >> (8 * band)) & 0xFF for band in range(BANDS)]
+
+def _signed(value: int) -> int:
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+class PerceptualCache:
+    """
+    SQLite-backed, bounded cache of analyses keyed by scope and perceptual hash
+
+    Shared across sessions, processes and restarts like DiskCache; least
+    recently used entries are evicted beyond max_entries.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int, threshold: int = HAMMING_THRESHOLD,
+                 path: Optional[str] = None):
+        if threshold >= BANDS:
+            raise ValueError(f"threshold must be below {BANDS} bits for the band index to find every match")
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.path = path or os.path.join(CACHE_DIR, f"{name}.sqlite3")
+        self._local = threading.local()
+        self._hits = 0
+        self._misses = 0
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        band_columns = ", ".join(f"b{band} INTEGER NOT NULL" for band in range(BANDS))
+        with self._connect() as conn:
+            conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS {self.name} (
+                    id INTEGER PRIMARY KEY,
+                    scope TEXT NOT NULL,
+                    phash INTEGER NOT NULL,
+                    {band_columns},
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            for band in range(BANDS):
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {self.name}_b{band} ON {self.name} (scope, b{band})")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.name}_last_access ON {self.name} (last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, scope: str, image_hash: int) -> Optional[Dict[str, Any]]:
+        """Closest entry within threshold bits: {"value": ..., "distance": ...}, or None"""
+        bands = _bands(image_hash)
+        band_filter = " OR ".join(f"b{band} = ?" for band in range(BANDS))
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    f"SELECT id, phash, value FROM {self.name} "
+                    f"WHERE scope = ? AND expires_at > ? AND ({band_filter})",
+                    (scope, time.time(), *bands)
+                ).fetchall()
+                if not rows:
+                    self._misses += 1
+                    return None
+                hashes = np.array([row[1] for row in rows], dtype=np.int64).view(np.uint64)
+                distances = hamming_distances(hashes, image_hash)
+                best = int(np.argmin(distances))
+                if distances[best] > self.threshold:
+                    self._misses += 1
+                    return None
+                conn.execute(f"UPDATE {self.name} SET last_access = ? WHERE id = ?", (time.time(), rows[best][0]))
+            self._hits += 1
+            return {"value": json.loads(rows[best][2]), "distance": int(distances[best])}
+        except sqlite3.Error as e:
+            print(f"{self.name} cache read error: {e}")
+            self._misses += 1
+            return None
+
+    def store(self, scope: str, image_hash: int, value: Any) -> None:
+        """Remember value for an image hash, evicting least recently used entries when full"""
+        now = time.time()
+        columns = ", ".join(f"b{band}" for band in range(BANDS))
+        placeholders = ", ".join("?" for _ in range(BANDS))
+        try:
+            with self._connect() as conn:
+                conn.execute(f"DELETE FROM {self.name} WHERE scope = ? AND phash = ?", (scope, _signed(image_hash)))
+                conn.execute(
+                    f"INSERT INTO {self.name} (scope, phash, {columns}, value, expires_at, last_access) "
+                    f"VALUES (?, ?, {placeholders}, ?, ?, ?)",
+                    (scope, _signed(image_hash), *_bands(image_hash), json.dumps(value), now + self.ttl, now)
+                )
+                count = conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+                if count > self.max_entries:
+                    conn.execute(f"DELETE FROM {self.name} WHERE expires_at <= ?", (now,))
+                    conn.execute(
+                        f"""DELETE FROM {self.name} WHERE id IN (
+                            SELECT id FROM {self.name} ORDER BY last_access ASC
+                            LIMIT MAX(0, (SELECT COUNT(*) FROM {self.name}) - ?)
+                        )""",
+                        (self.max_entries,)
+                    )
+        except sqlite3.Error as e:
+            print(f"{self.name} cache write error: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus the current entry count"""
+        try:
+            entries = self._connect().execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "entries": entries
+        }
+
+vision_result_cache = PerceptualCache("vision_results", ttl=VISION_CACHE_TTL, max_entries=VISION_CACHE_MAX_ENTRIES)
+
+def vision_cache_enabled_for(agent: str) -> bool:
+    """Global switch plus the per-agent opt-out shared with the LLM response cache"""
+    return VISION_CACHE_ENABLED and cache_enabled_for(agent)
+
+def vision_cache_scope(agent: str, health_type: str, prompt: str) -> str:
+    """Everything besides the image that determines an analysis"""
+    return hashlib.sha256(f"{agent}\0{health_type}\0{prompt}".encode("utf-8")).hexdigest()
+
+def lookup_vision_result(agent: str, health_type: str, prompt: str, image_hash: int) -> Optional[Dict[str, Any]]:
+    """Cached {"response", "model", "distance"} for this image or a near-duplicate"""
+    cached = vision_result_cache.lookup(vision_cache_scope(agent, health_type, prompt), image_hash)
+    if cached is None:
+        return None
+    return {**cached["value"], "distance": cached["distance"]}
+
+def store_vision_result(agent: str, health_type: str, prompt: str, image_hash: int,
+                        response: str, model: Optional[str]) -> None:
+    """Remember a successful analysis (the model's text, before clinic suggestions)"""
+    vision_result_cache.store(vision_cache_scope(agent, health_type, prompt), image_hash,
+                              {"response": response, "model": model})
+
+def get_vision_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and entry count of the vision result cache"""
+    return vision_result_cache.stats()
+
+def find_cached_analysis(agent: str, health_type: str, prompt: str, image: bytes):
+    """
+    Hash the image and look up an earlier analysis in one call
+
+    Returns (image_hash, cached); image_hash is None when the cache is off for
+    the agent or the image could not be decoded, and is needed to store the
+    fresh analysis afterwards.
+    """
+    if not vision_cache_enabled_for(agent):
+        return None, None
+    image_hash = safe_dhash(image)
+    if image_hash is None:
+        return None, None
+    return image_hash, lookup_vision_result(agent, health_type, prompt, image_hash)
+
+def vision_cache_metadata(cached: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Agent metadata fields describing a vision cache hit"""
+    if cached is None:
+        return {"vision_cache_hit": False}
+    return {"vision_cache_hit": True, "model": cached.get("model"), "vision_cache_distance": cached["distance"]}